@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from abc import ABC
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Generic, List, Optional, Sequence, Type, TypeVar
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel
+
+from clean_arch.application.repositories import BaseRepo, T_BaseEntity, T_BaseFilter
+from clean_arch.domain.entities import Page
+from clean_arch.utils.context import TaskLocal
+
+_T = TypeVar('_T', bound='CachedRepo[Any, Any]')
+
+
+class CacheStats(BaseModel):
+    """Counters of a cache backend, use `model_dump()` to export them"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class CacheBackend(ABC):
+    """Storage of the cached values. The values are json compatible."""
+
+    stats: CacheStats
+
+    async def get_many(self, keys: Sequence[str]) -> list[Optional[Any]]:
+        """Returns the values of the keys, None for the missing ones"""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tag: Optional[str] = None) -> None:
+        """Sets the value of the key, `ttl` is in seconds. The keys of a `tag` are deleted by `delete_tag`"""
+        raise NotImplementedError
+
+    async def add(self, key: str, value: Any) -> bool:
+        """Sets the value of a missing key, returns False if the key exists"""
+        raise NotImplementedError
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    async def delete_tag(self, tag: str) -> None:
+        """Deletes the keys set with the tag"""
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process cache of at most `max_size` keys, the least recently used keys are evicted first"""
+
+    def __init__(self, max_size: int = 10000) -> None:
+        if max_size <= 0:
+            raise ValueError('max_size must be positive')
+        self.max_size = max_size
+        self.stats = CacheStats()
+        self._values: OrderedDict[str, tuple[Optional[float], Any, Optional[str]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    async def get_many(self, keys: Sequence[str]) -> list[Optional[Any]]:
+        now = time.monotonic()
+        results: list[Optional[Any]] = []
+        for key in keys:
+            if (item := self._values.get(key)) is None:
+                results.append(None)
+                continue
+            expires_at, value, _ = item
+            if expires_at is not None and expires_at <= now:
+                self._pop(key)
+                self.stats.evictions += 1
+                results.append(None)
+                continue
+            self._values.move_to_end(key)
+            results.append(value)
+        return results
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tag: Optional[str] = None) -> None:
+        self._pop(key)
+        self._values[key] = (time.monotonic() + ttl if ttl is not None else None, value, tag)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._values) > self.max_size:
+            self._pop(next(iter(self._values)))
+            self.stats.evictions += 1
+
+    async def add(self, key: str, value: Any) -> bool:
+        [current] = await self.get_many([key])
+        if current is not None:
+            return False
+        await self.set(key, value)
+        return True
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self._pop(key)
+
+    async def delete_tag(self, tag: str) -> None:
+        for key in self._tags.pop(tag, ()):
+            self._values.pop(key, None)
+
+    def _pop(self, key: str) -> None:
+        if (item := self._values.pop(key, None)) is not None and item[2] is not None:
+            keys = self._tags[item[2]]
+            keys.discard(key)
+            if not keys:
+                del self._tags[item[2]]
+
+
+class _CacheSession:
+    """State of a session of `CachedRepo`"""
+
+    def __init__(self) -> None:
+        self.invalidated: set[UUID] = set()
+        self.invalidate_all = False
+        self.dirty = False
+
+    def reset(self) -> None:
+        self.invalidated = set()
+        self.invalidate_all = self.dirty = False
+
+
+class CachedRepo(BaseRepo[T_BaseEntity, T_BaseFilter], Generic[T_BaseEntity, T_BaseFilter]):
+    """Read-through cache of a repository, the writes invalidate the cached values on commit.
+    The invalidation rules are described in README.md, a shared backend should be given a `ttl`.
+
+    example:
+        repo = CachedRepo(SQLExampleRepo(session_factory), LRUCacheBackend(), ttl=60)
+        async with repo:
+            entity = await repo.get(uuid)
+    """
+
+    _state = TaskLocal[_CacheSession](default_factory=_CacheSession)
+    """Outside of a session every access returns a new state, so nothing is kept between the calls"""
+
+    _depth = TaskLocal[int](default_factory=int)
+    """Number of the entered contexts, the nested contexts share the state of the outermost one"""
+
+    def __init__(
+        self,
+        repo: BaseRepo[T_BaseEntity, T_BaseFilter],
+        backend: CacheBackend,
+        entity_cls: Optional[Type[T_BaseEntity]] = None,
+        ttl: Optional[float] = None,
+        namespace: Optional[str] = None,
+    ) -> None:
+        entity_cls = entity_cls or getattr(repo, 'entity_cls', None)
+        if entity_cls is None:
+            raise ValueError('entity_cls is required for repositories without entity_cls')
+        self._repo = repo
+        self._backend = backend
+        self._entity_cls: Type[T_BaseEntity] = entity_cls
+        self._ttl = ttl
+        self._namespace = namespace or type(repo).__name__
+
+    def __getattr__(self, name: str) -> Any:
+        # the custom methods of the repository are not cached
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._repo, name)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._backend.stats
+
+    def get_filter_for_get_str(self, obj_id: str) -> T_BaseFilter:
+        return self._repo.get_filter_for_get_str(obj_id)
+
+    async def _get_generations(self) -> tuple[str, str]:
+        """Returns the generation tokens of the queries and the entities, read by every call,
+        so the commits of the other sessions are seen at once
+        """
+        keys = [f'{self._namespace}:gen:queries', f'{self._namespace}:gen:entities']
+        tokens = await self._backend.get_many(keys)
+        for i, (key, token) in enumerate(zip(keys, tokens)):
+            if token is None:
+                # the token created by a concurrent session wins
+                token = uuid4().hex
+                if not await self._backend.add(key, token):
+                    token = (await self._backend.get_many([key]))[0] or token
+                tokens[i] = token
+        return str(tokens[0]), str(tokens[1])
+
+    async def _rotate(self, name: str, generation: str) -> None:
+        """Replaces the generation token, the keys of the previous generation are deleted"""
+        await self._backend.set(f'{self._namespace}:gen:{name}', uuid4().hex)
+        await self._backend.delete_tag(self._tag(generation))
+
+    def _tag(self, generation: str) -> str:
+        return f'{self._namespace}:{generation}'
+
+    def _hash(self, *models: Optional[BaseModel]) -> str:
+        """Returns a hash of the set values of the models, used in the keys of the queries"""
+        dumps = [f'{type(model).__name__}{model.model_dump_json(exclude_unset=True)}' for model in models if model]
+        return hashlib.sha1(':'.join(dumps).encode()).hexdigest()
+
+    async def _get_cached(self, key: str) -> Optional[Any]:
+        [value] = await self._backend.get_many([key])
+        if value is None:
+            self._backend.stats.misses += 1
+        else:
+            self._backend.stats.hits += 1
+        return value
+
+    async def get(self, obj_id: int | str | UUID, fields: Optional[Sequence[str]] = None) -> Optional[T_BaseEntity]:
+        if self._state.dirty or fields is not None:
+            return await self._repo.get(obj_id, fields)
+
+        queries, entities = await self._get_generations()
+        if isinstance(obj_id, str):
+            key = f'{self._namespace}:{queries}:get:str:{obj_id}'
+            if (data := await self._get_cached(key)) is not None:
+                return self._entity_cls.model_validate(data)
+            entity = await self._repo.get(obj_id)
+            if entity is not None:
+                await self._backend.set(key, entity.model_dump(mode='json'), self._ttl, self._tag(queries))
+            return entity
+
+        if isinstance(obj_id, int):
+            # ids never change, so the id is cached as a pointer to the uuid
+            pointer_key = f'{self._namespace}:{entities}:get:id:{obj_id}'
+            if (uuid := await self._get_cached(pointer_key)) is not None:
+                obj_id = UUID(uuid)
+
+        if isinstance(obj_id, UUID):
+            if (data := await self._get_cached(self._entity_key(entities, obj_id))) is not None:
+                return self._entity_cls.model_validate(data)
+
+        entity = await self._repo.get(obj_id)
+        if entity is not None and (uuid := getattr(entity, 'uuid', None)) is not None:
+            await self._backend.set(
+                self._entity_key(entities, uuid), entity.model_dump(mode='json'), self._ttl, self._tag(entities)
+            )
+            if isinstance(obj_id, int):
+                await self._backend.set(pointer_key, str(uuid), self._ttl, self._tag(entities))
+        return entity
+
+    def _entity_key(self, generation: str, uuid: UUID) -> str:
+        return f'{self._namespace}:{generation}:get:uuid:{uuid}'
+
+    async def get_many(self, obj_ids: Sequence[int | UUID]) -> list[Optional[T_BaseEntity]]:
+        if self._state.dirty:
+            return await self._repo.get_many(obj_ids)
+
+        _, entities = await self._get_generations()
+        ids = [obj_id for obj_id in obj_ids if isinstance(obj_id, int)]
+        pointer_keys = [f'{self._namespace}:{entities}:get:id:{obj_id}' for obj_id in ids]
+        pointers: dict[int | UUID, Any] = dict(zip(ids, await self._backend.get_many(pointer_keys))) if ids else {}
+        resolved = [UUID(pointers[obj_id]) if pointers.get(obj_id) else obj_id for obj_id in obj_ids]
+
+        uuids = [obj_id for obj_id in resolved if isinstance(obj_id, UUID)]
+        datas = await self._backend.get_many([self._entity_key(entities, uuid) for uuid in uuids]) if uuids else []
+        cached: dict[int | UUID, Any] = {uuid: data for uuid, data in zip(uuids, datas) if data is not None}
+        missing = list(dict.fromkeys(obj_id for obj_id in resolved if obj_id not in cached))
+        self._backend.stats.hits += len(resolved) - len(missing)
+        self._backend.stats.misses += len(missing)
+
+        fetched = dict(zip(missing, await self._repo.get_many(missing))) if missing else {}
+        for obj_id, entity in fetched.items():
+            if entity is None or (uuid := getattr(entity, 'uuid', None)) is None:
+                continue
+            await self._backend.set(
+                self._entity_key(entities, uuid), entity.model_dump(mode='json'), self._ttl, self._tag(entities)
+            )
+            if isinstance(obj_id, int):
+                await self._backend.set(
+                    f'{self._namespace}:{entities}:get:id:{obj_id}', str(uuid), self._ttl, self._tag(entities)
+                )
+
+        return [
+            self._entity_cls.model_validate(cached[obj_id]) if obj_id in cached else fetched.get(obj_id)
+            for obj_id in resolved
+        ]
+
+    async def list(
+        self, page: Page, entity_filter: Optional[T_BaseFilter] = None, fields: Optional[Sequence[str]] = None
+    ) -> List[T_BaseEntity]:
+        if self._state.dirty or fields is not None:
+            return await self._repo.list(page, entity_filter, fields)
+
+        queries, _ = await self._get_generations()
+        key = f'{self._namespace}:{queries}:list:{self._hash(page, entity_filter)}'
+        if (datas := await self._get_cached(key)) is not None:
+            return [self._entity_cls.model_validate(data) for data in datas]
+        results = await self._repo.list(page, entity_filter)
+        await self._backend.set(
+            key, [entity.model_dump(mode='json') for entity in results], self._ttl, self._tag(queries)
+        )
+        return results
+
+    async def list_with_count(
+        self, page: Page, entity_filter: Optional[T_BaseFilter] = None, fields: Optional[Sequence[str]] = None
+    ) -> tuple[List[T_BaseEntity], int]:
+        if self._state.dirty or fields is not None:
+            return await self._repo.list_with_count(page, entity_filter, fields)
+
+        # the values are shared with `list` and `count`
+        queries, _ = await self._get_generations()
+        list_key = f'{self._namespace}:{queries}:list:{self._hash(page, entity_filter)}'
+        count_key = f'{self._namespace}:{queries}:count:{self._hash(entity_filter)}'
+        datas, total = await self._backend.get_many([list_key, count_key])
+        if datas is not None and total is not None:
+            self._backend.stats.hits += 1
+            return [self._entity_cls.model_validate(data) for data in datas], int(total)
+        self._backend.stats.misses += 1
+        results, total = await self._repo.list_with_count(page, entity_filter)
+        await self._backend.set(
+            list_key, [entity.model_dump(mode='json') for entity in results], self._ttl, self._tag(queries)
+        )
+        await self._backend.set(count_key, total, self._ttl, self._tag(queries))
+        return results, total
+
+    def iter(
+        self,
+        entity_filter: Optional[T_BaseFilter] = None,
+        batch_size: int = 1000,
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T_BaseEntity]:
+        return self._repo.iter(entity_filter, batch_size, fields)
+
+    async def count(self, entity_filter: Optional[T_BaseFilter] = None) -> int:
+        if self._state.dirty:
+            return await self._repo.count(entity_filter)
+
+        queries, _ = await self._get_generations()
+        key = f'{self._namespace}:{queries}:count:{self._hash(entity_filter)}'
+        if (total := await self._get_cached(key)) is not None:
+            return int(total)
+        total = await self._repo.count(entity_filter)
+        await self._backend.set(key, total, self._ttl, self._tag(queries))
+        return total
+
+    def _written(self, entities: Sequence[T_BaseEntity]) -> None:
+        state = self._state
+        state.dirty = True
+        state.invalidated.update(uuid for entity in entities if (uuid := getattr(entity, 'uuid', None)) is not None)
+
+    async def add(self, entity: T_BaseEntity) -> T_BaseEntity:
+        result = await self._repo.add(entity)
+        self._written([result])
+        return result
+
+    async def add_many(self, entities: Sequence[T_BaseEntity], chunk_size: Optional[int] = None) -> List[T_BaseEntity]:
+        results = await self._repo.add_many(entities, chunk_size)
+        self._written(results)
+        return results
+
+    async def update(
+        self,
+        entity: T_BaseEntity,
+        entity_filter: Optional[T_BaseFilter] = None,
+        model_dump: Optional[dict[str, Any]] = None,
+    ) -> int:
+        result = await self._repo.update(entity, entity_filter, model_dump)
+        self._written([entity])
+        return result
+
+    async def update_many(
+        self,
+        entities: Sequence[T_BaseEntity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        result = await self._repo.update_many(entities, model_dump, chunk_size)
+        self._written(entities)
+        return result
+
+    async def upsert_many(
+        self,
+        entities: Sequence[T_BaseEntity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[T_BaseEntity]:
+        results = await self._repo.upsert_many(entities, model_dump, chunk_size)
+        self._written(results)
+        return results
+
+    async def update_by_filter(self, entity_filter: T_BaseFilter, values: dict[str, Any]) -> int:
+        result = await self._repo.update_by_filter(entity_filter, values)
+        self._state.dirty = self._state.invalidate_all = True
+        return result
+
+    async def remove(self, entity_filter: T_BaseFilter) -> int:
+        result = await self._repo.remove(entity_filter)
+        self._state.dirty = self._state.invalidate_all = True
+        return result
+
+    async def commit(self) -> None:
+        await self._repo.commit()
+        if self._depth > 1:
+            return
+        state = self._state
+        if state.dirty:
+            queries, entities = await self._get_generations()
+            if state.invalidate_all:
+                await self._rotate('entities', entities)
+            elif state.invalidated:
+                await self._backend.delete([self._entity_key(entities, uuid) for uuid in state.invalidated])
+            await self._rotate('queries', queries)
+        state.reset()
+
+    async def __aenter__(self: _T) -> _T:
+        await self._repo.__aenter__()
+        if not self._depth:
+            self._state = _CacheSession()
+        self._depth += 1
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        try:
+            await self._repo.__aexit__(exc_type, exc, tb)
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                del self._state
+                del self._depth
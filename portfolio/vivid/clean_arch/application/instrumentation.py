@@ -0,0 +1,369 @@
+"""
+Opt-in instrumentation of the repositories and the queries, the collected metrics are described in README.md.
+
+example:
+    metrics = RepoMetrics(slow_call_threshold=0.5)
+    count_sql_round_trips(engine)
+    repo = instrument(SQLExampleRepo(async_sessionmaker(engine)), metrics)
+    async with repo:
+        entities = await repo.list(LimitOffset(), ExampleEntityFilter(status='new'))
+    text = metrics.render_prometheus()
+"""
+from __future__ import annotations
+
+import inspect
+import logging
+import reprlib
+import time
+from bisect import bisect_left
+from collections.abc import AsyncIterator
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Generic, Optional, Sequence, TypeVar, cast
+
+from pydantic import BaseModel
+
+from clean_arch.utils.context import TaskLocal
+
+logger = logging.getLogger(__name__)
+
+_O = TypeVar('_O')
+_T = TypeVar('_T', bound='Instrumented[Any]')
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Upper bounds of the buckets of the latency histograms in seconds"""
+
+
+class Histogram:
+    """Counts of the observed values by buckets, rendered as a cumulative Prometheus histogram"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        """Counts of the values of each bucket, the last one is of the values above all the bounds"""
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """Returns (upper bound, count of the values <= bound), the last bound is infinity
+
+        >>> histogram = Histogram([0.1, 1.0])
+        >>> for value in (0.05, 0.1, 0.5, 3.0):
+        ...     histogram.observe(value)
+        >>> histogram.cumulative()
+        [(0.1, 2), (1.0, 3), (inf, 4)]
+        """
+        results, total = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            results.append((bound, total))
+        return results
+
+
+class CallStats:
+    """Aggregates of the calls of a method"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.latency = Histogram(buckets)
+        self.rows = 0
+        """Rows returned or affected"""
+        self.round_trips = 0
+        self.errors = 0
+
+
+class _Call:
+    """Round trips of a running call, counted by the backends with `count_round_trip`"""
+
+    __slots__ = ('round_trips',)
+
+    def __init__(self) -> None:
+        self.round_trips = 0
+
+
+_current_call: ContextVar[Optional[_Call]] = ContextVar('clean_arch_current_call', default=None)
+
+
+def count_round_trip(amount: int = 1) -> None:
+    """Counts round trips to a backend in the running instrumented call, does nothing outside of the calls"""
+    if (call := _current_call.get()) is not None:
+        call.round_trips += amount
+
+
+class RepoMetrics:
+    """Metrics of the instrumented objects by their names and methods,
+    the calls taking at least `slow_call_threshold` seconds are logged as warnings with their arguments
+    """
+
+    def __init__(
+        self,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        slow_call_threshold: Optional[float] = None,
+        prefix: str = 'clean_arch',
+    ) -> None:
+        self.buckets = tuple(buckets)
+        self.slow_call_threshold = slow_call_threshold
+        self.prefix = prefix
+        self.calls: dict[tuple[str, str], CallStats] = {}
+        """Stats of the calls by (name, method)"""
+        self.sessions: dict[str, CallStats] = {}
+        """Stats of the sessions by name: the hold time and the round trips of the outermost contexts"""
+
+    def observe_call(
+        self,
+        name: str,
+        method: str,
+        seconds: float,
+        rows: int,
+        round_trips: int,
+        error: bool = False,
+        args: Sequence[Any] = (),
+        kwargs: Optional[dict[str, Any]] = None,
+    ) -> None:
+        if (stats := self.calls.get((name, method))) is None:
+            stats = self.calls[(name, method)] = CallStats(self.buckets)
+        stats.latency.observe(seconds)
+        stats.rows += rows
+        stats.round_trips += round_trips
+        stats.errors += error
+
+        if self.slow_call_threshold is not None and seconds >= self.slow_call_threshold:
+            logger.warning(
+                'Slow call %s.%s(%s) took %.3fs: %d rows, %d round trips%s',
+                name,
+                method,
+                render_arguments(args, kwargs or {}),
+                seconds,
+                rows,
+                round_trips,
+                ', failed' if error else '',
+            )
+
+    def observe_session(self, name: str, seconds: float, round_trips: int, error: bool = False) -> None:
+        if (stats := self.sessions.get(name)) is None:
+            stats = self.sessions[name] = CallStats(self.buckets)
+        stats.latency.observe(seconds)
+        stats.round_trips += round_trips
+        stats.errors += error
+
+    def render_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format"""
+        lines: list[str] = []
+        calls = [({'name': name, 'method': method}, stats) for (name, method), stats in sorted(self.calls.items())]
+        sessions = [({'name': name}, stats) for name, stats in sorted(self.sessions.items())]
+
+        _render_histogram(lines, f'{self.prefix}_call_duration_seconds', 'Duration of the calls.', calls)
+        for attr, help_text in (
+            ('rows', 'Rows returned or affected by the calls.'),
+            ('round_trips', 'Round trips to the backends of the calls.'),
+            ('errors', 'Calls raised an exception.'),
+        ):
+            _render_counter(lines, f'{self.prefix}_call_{attr}_total', help_text, calls, attr)
+        _render_histogram(lines, f'{self.prefix}_session_duration_seconds', 'Hold time of the sessions.', sessions)
+        _render_counter(
+            lines, f'{self.prefix}_session_round_trips_total', 'Round trips of the sessions.', sessions, 'round_trips'
+        )
+        return '\n'.join(lines) + '\n'
+
+
+def _render_labels(labels: dict[str, str], **extra: str) -> str:
+    items = {**labels, **extra}.items()
+    escaped = ((key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _render_number(value: float) -> str:
+    return '+Inf' if value == float('inf') else str(value)
+
+
+def _render_histogram(
+    lines: list[str], metric: str, help_text: str, series: Sequence[tuple[dict[str, str], CallStats]]
+) -> None:
+    lines.append(f'# HELP {metric} {help_text}')
+    lines.append(f'# TYPE {metric} histogram')
+    for labels, stats in series:
+        for bound, count in stats.latency.cumulative():
+            lines.append(f'{metric}_bucket{_render_labels(labels, le=_render_number(bound))} {count}')
+        lines.append(f'{metric}_sum{_render_labels(labels)} {_render_number(stats.latency.sum)}')
+        lines.append(f'{metric}_count{_render_labels(labels)} {stats.latency.count}')
+
+
+def _render_counter(
+    lines: list[str], metric: str, help_text: str, series: Sequence[tuple[dict[str, str], CallStats]], attr: str
+) -> None:
+    lines.append(f'# HELP {metric} {help_text}')
+    lines.append(f'# TYPE {metric} counter')
+    for labels, stats in series:
+        lines.append(f'{metric}{_render_labels(labels)} {getattr(stats, attr)}')
+
+
+_repr = reprlib.Repr()
+_repr.maxstring = _repr.maxother = 200
+
+
+def render_arguments(args: Sequence[Any], kwargs: dict[str, Any]) -> str:
+    """Renders the arguments of a call for the log, the models as json of their set fields
+
+    >>> class ExampleFilter(BaseModel):
+    ...     status: Optional[str] = None
+    ...     score: int = 0
+    >>> render_arguments([ExampleFilter(status='new')], {'batch_size': 10})
+    'ExampleFilter({"status":"new"}), batch_size=10'
+    """
+
+    def render(value: Any) -> str:
+        if isinstance(value, BaseModel):
+            return f'{type(value).__name__}({value.model_dump_json(exclude_unset=True)})'
+        return _repr.repr(value)
+
+    return ', '.join([render(arg) for arg in args] + [f'{key}={render(value)}' for key, value in kwargs.items()])
+
+
+def count_rows(method: str, result: Any) -> int:
+    """Returns the number of rows returned or affected by a call of the `method` with the `result`
+
+    >>> count_rows('list_with_count', ([1, 2], 10)), count_rows('remove', 3), count_rows('count', 10)
+    (2, 3, 1)
+    """
+    if result is None:
+        return 0
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], list):
+        result = result[0]
+    if isinstance(result, list):
+        return sum(1 for item in result if item is not None)
+    if isinstance(result, int) and not isinstance(result, bool) and method != 'count':
+        return result
+    return 1
+
+
+class Instrumented(Generic[_O]):
+    """Proxy of a repository or a query recording its public async methods, async iterators and the outermost
+    context to `metrics` under `name`, the class name by default
+    """
+
+    _depth = TaskLocal[int](default_factory=int)
+    """Number of the entered contexts, only the outermost one is measured"""
+
+    _session = TaskLocal[tuple[float, _Call, Optional[_Call]]]()
+    """Start time, round trips and the parent call of the session"""
+
+    def __init__(self, target: _O, metrics: RepoMetrics, name: Optional[str] = None) -> None:
+        self._target = target
+        self._metrics = metrics
+        self._name = name or type(target).__name__
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._target, name)
+        if name.startswith('_') or not callable(value):
+            return value
+        wrapper = self._wrap_async(name, value) if inspect.iscoroutinefunction(value) else self._wrap(name, value)
+        # cached as an attribute, so __getattr__ is called once per method
+        self.__dict__[name] = wrapper
+        return wrapper
+
+    def _wrap_async(self, method: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            call, parent = _Call(), _current_call.get()
+            token = _current_call.set(call)
+            started, error, result = time.perf_counter(), True, None
+            try:
+                result = await fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _current_call.reset(token)
+                seconds = time.perf_counter() - started
+                if parent is not None:
+                    parent.round_trips += call.round_trips
+                self._metrics.observe_call(
+                    self._name, method, seconds, count_rows(method, result), call.round_trips, error, args, kwargs
+                )
+
+        return wrapper
+
+    def _wrap(self, method: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            result = fn(*args, **kwargs)
+            if isinstance(result, AsyncIterator):
+                return self._iterate(method, result, args, kwargs)
+            return result
+
+        return wrapper
+
+    async def _iterate(
+        self, method: str, iterator: AsyncIterator[Any], args: Sequence[Any], kwargs: dict[str, Any]
+    ) -> AsyncIterator[Any]:
+        call, seconds, rows, error = _Call(), 0.0, 0, True
+        try:
+            while True:
+                # the call is current only while fetching, not while the consumer handles the items
+                parent = _current_call.get()
+                token = _current_call.set(call)
+                started, round_trips = time.perf_counter(), call.round_trips
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _current_call.reset(token)
+                    seconds += time.perf_counter() - started
+                    if parent is not None:
+                        parent.round_trips += call.round_trips - round_trips
+                rows += 1
+                yield item
+            error = False
+        except GeneratorExit:
+            # the consumer stopped early, the iterator is closed to release its cursor
+            error = False
+            if (aclose := getattr(iterator, 'aclose', None)) is not None:
+                await aclose()
+            raise
+        finally:
+            self._metrics.observe_call(self._name, method, seconds, rows, call.round_trips, error, args, kwargs)
+
+    async def __aenter__(self: _T) -> _T:
+        depth = self._depth
+        self._depth = depth + 1
+        if depth:
+            await self._target.__aenter__()
+            return self
+
+        call = _Call()
+        self._session = (time.perf_counter(), call, _current_call.get())
+        _current_call.set(call)
+        try:
+            await self._target.__aenter__()
+        except BaseException:
+            _current_call.set(self._session[2])
+            del self._session
+            self._depth = depth
+            raise
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        depth = self._depth - 1
+        try:
+            await self._target.__aexit__(exc_type, exc, tb)  # type: ignore[attr-defined]
+        finally:
+            self._depth = depth
+            if not depth:
+                started, call, parent = self._session
+                del self._session
+                # set instead of reset by a token, the session may exit in a copy of the context it entered in
+                _current_call.set(parent)
+                if parent is not None:
+                    parent.round_trips += call.round_trips
+                self._metrics.observe_session(
+                    self._name, time.perf_counter() - started, call.round_trips, exc_type is not None
+                )
+
+
+def instrument(target: _O, metrics: RepoMetrics, name: Optional[str] = None) -> _O:
+    """Returns the `Instrumented` proxy of a repository or a query, typed as the target"""
+    return cast(_O, Instrumented(target, metrics, name))
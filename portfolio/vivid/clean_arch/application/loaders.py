@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Generic, Optional, Sequence
+from uuid import UUID
+
+from clean_arch.application.repositories import BaseRORepo, T_BaseEntity
+from clean_arch.utils.batching import chunked
+
+
+class EntityLoader(Generic[T_BaseEntity]):
+    """Coalesces `load` calls issued in the same iteration of the event loop into `get_many` calls of the repository.
+    The batches are fetched one by one, so the session of the repository is not used concurrently.
+
+    A loader is scoped to a single session: a batch is fetched in the context of the first `load` call of the batch,
+    so it uses the session of that task for all the callers. Create a loader inside the session, e.g. per request,
+    and do not share it between the tasks with their own sessions.
+
+    example:
+        loader = EntityLoader(repo)
+        async with repo:
+            entities = await asyncio.gather(*(loader.load(obj_id) for obj_id in obj_ids))
+
+    A batch dispatched while the previous one is fetched waits for it:
+
+    >>> class Repo:
+    ...     def __init__(self):
+    ...         self.started, self.active, self.max_active = asyncio.Event(), 0, 0
+    ...     async def get_many(self, obj_ids):
+    ...         self.started.set()
+    ...         self.active += 1
+    ...         self.max_active = max(self.max_active, self.active)
+    ...         await asyncio.sleep(0.01)
+    ...         self.active -= 1
+    ...         return [f'entity-{obj_id}' for obj_id in obj_ids]
+    >>> async def load_two_batches(repo):
+    ...     loader = EntityLoader(repo)
+    ...     first = asyncio.ensure_future(loader.load(1))
+    ...     await repo.started.wait()
+    ...     return await asyncio.gather(first, loader.load(2)), repo.max_active
+    >>> asyncio.run(load_two_batches(Repo()))
+    (['entity-1', 'entity-2'], 1)
+    """
+
+    def __init__(self, repo: BaseRORepo[T_BaseEntity, Any], max_batch_size: int = 1000) -> None:
+        if max_batch_size <= 0:
+            raise ValueError('max_batch_size must be positive')
+        self._repo = repo
+        self._max_batch_size = max_batch_size
+        self._pending: dict[int | UUID, asyncio.Future[Optional[T_BaseEntity]]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._lock = asyncio.Lock()
+
+    async def load(self, obj_id: int | UUID) -> Optional[T_BaseEntity]:
+        """Returns an entity by id or uuid, None if it is missing"""
+        if (future := self._pending.get(obj_id)) is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            future = self._pending[obj_id] = loop.create_future()
+        # the future may be shared by several callers, so cancellation of one of them should not cancel it
+        return await asyncio.shield(future)
+
+    async def load_many(self, obj_ids: Sequence[int | UUID]) -> list[Optional[T_BaseEntity]]:
+        return list(await asyncio.gather(*(self.load(obj_id) for obj_id in obj_ids)))
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._load(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load(self, batch: dict[int | UUID, asyncio.Future[Optional[T_BaseEntity]]]) -> None:
+        async with self._lock:
+            await self._fetch(batch)
+
+    async def _fetch(self, batch: dict[int | UUID, asyncio.Future[Optional[T_BaseEntity]]]) -> None:
+        for chunk in chunked(list(batch), self._max_batch_size):
+            try:
+                entities = await self._repo.get_many(chunk)
+            except Exception as err:
+                for obj_id in chunk:
+                    if not batch[obj_id].done():
+                        batch[obj_id].set_exception(err)
+                continue
+            for obj_id, entity in zip(chunk, entities):
+                if not batch[obj_id].done():
+                    batch[obj_id].set_result(entity)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from abc import ABC
-from typing import Any, Generic, Optional, TypeVar
+from typing import Any, AsyncIterator, Generic, List, Optional, Sequence, TypeVar
 from uuid import UUID
 
 from clean_arch.domain.entities import (
@@ -9,7 +9,7 @@ from clean_arch.domain.entities import (
     BaseEntityModel,
     EntityFilterModel,
     EntityModel,
-    LimitOffset,
+    Page,
 )
 
 T_BaseEntity = TypeVar('T_BaseEntity', bound=BaseEntityModel)
@@ -19,7 +19,12 @@ T_Filter = TypeVar('T_Filter', bound=EntityFilterModel)
 
 
 class BaseRORepo(ABC, Generic[T_BaseEntity, T_BaseFilter]):
-    """Base Read Only Repository Mixin"""
+    """Base Read Only Repository Mixin
+
+    `fields` of `get`, `list` and `iter` load only the given fields of the entities,
+    the entities have only these fields set, see `BaseEntityModel.model_construct_fields`.
+    Keyset pages need the fields of the ordering and `id` to get the next page.
+    """
 
     def get_filter_for_get_str(self, obj_id: str) -> T_BaseFilter:
         """To be used in get method when the obj_id is a string.
@@ -27,12 +32,44 @@ class BaseRORepo(ABC, Generic[T_BaseEntity, T_BaseFilter]):
         """
         raise NotImplementedError
 
-    async def get(self, obj_id: int | str | UUID) -> Optional[T_BaseEntity]:
+    async def get(self, obj_id: int | str | UUID, fields: Optional[Sequence[str]] = None) -> Optional[T_BaseEntity]:
         """Returns an entity from the repository or raises NotExists"""
         raise NotImplementedError
 
-    async def list(self, page: LimitOffset, entity_filter: Optional[T_BaseFilter] = None) -> list[T_BaseEntity]:
-        """Returns a list of entities from the repository"""
+    async def get_many(self, obj_ids: Sequence[int | UUID]) -> list[Optional[T_BaseEntity]]:
+        """Returns entities by ids and uuids in the order of `obj_ids`, None for the missing ones.
+        The entities are fetched by a single request to the storage where possible,
+        see `EntityLoader` to batch concurrent `get` calls.
+        """
+        raise NotImplementedError
+
+    async def list(
+        self, page: Page, entity_filter: Optional[T_BaseFilter] = None, fields: Optional[Sequence[str]] = None
+    ) -> list[T_BaseEntity]:
+        """Returns a list of entities from the repository.
+        With `KeysetPage` the entities are ordered by `order_by` of the filter and `id`,
+        use `KeysetPage.next_page` to get the next page.
+        """
+        raise NotImplementedError
+
+    async def list_with_count(
+        self, page: Page, entity_filter: Optional[T_BaseFilter] = None, fields: Optional[Sequence[str]] = None
+    ) -> tuple[List[T_BaseEntity], int]:
+        """Returns a page of entities and the number of all the entities of the filter, like `list` and `count`.
+        The backends evaluate the filter once where possible.
+        """
+        return await self.list(page, entity_filter, fields), await self.count(entity_filter)
+
+    def iter(
+        self,
+        entity_filter: Optional[T_BaseFilter] = None,
+        batch_size: int = 1000,
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T_BaseEntity]:
+        """Iterates over entities from the repository fetching them in batches of `batch_size` items,
+        so the memory usage does not depend on the number of entities.
+        `order_by` of the filter is applied only by the backends able to stream ordered entities.
+        """
         raise NotImplementedError
 
     async def count(self, entity_filter: Optional[T_BaseFilter] = None) -> int:
@@ -47,6 +84,12 @@ class BaseWORepo(ABC, Generic[T_BaseEntity, T_BaseFilter]):
         """Adds entity to the repository"""
         raise NotImplementedError
 
+    async def add_many(self, entities: Sequence[T_BaseEntity], chunk_size: Optional[int] = None) -> list[T_BaseEntity]:
+        """Adds entities to the repository in batches of `chunk_size` items.
+        Raises `already_exists_err` if any of the entities already exists.
+        """
+        raise NotImplementedError
+
     async def update(
         self,
         entity: T_BaseEntity,
@@ -56,6 +99,26 @@ class BaseWORepo(ABC, Generic[T_BaseEntity, T_BaseFilter]):
         """Updates entity in the repository"""
         raise NotImplementedError
 
+    async def update_many(
+        self,
+        entities: Sequence[T_BaseEntity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        """Updates entities (matched by uuid) in the repository in batches of `chunk_size` items"""
+        raise NotImplementedError
+
+    async def upsert_many(
+        self,
+        entities: Sequence[T_BaseEntity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> list[T_BaseEntity]:
+        """Adds entities to the repository or updates the existing ones (matched by uuid).
+        `model_dump` defines the values written for the existing entities.
+        """
+        raise NotImplementedError
+
     async def update_by_filter(self, entity_filter: T_BaseFilter, values: dict[str, Any]) -> int:
         """Updates entities in the repository"""
         raise NotImplementedError
@@ -65,13 +128,20 @@ class BaseWORepo(ABC, Generic[T_BaseEntity, T_BaseFilter]):
         raise NotImplementedError
 
     async def commit(self) -> None:
-        """Commits write operations to the repository"""
+        """Commits write operations to the repository.
+        Inside a nested context the commit is left to the outermost context.
+        """
 
 
 _T_Repo = TypeVar('_T_Repo', bound='ContextManagerRepo')
 
 
 class ContextManagerRepo:
+    """Repository used as an async context manager.
+    A context entered inside another context of the same task reuses its session, the writes of the inner block
+    are rolled back if it raises and committed by the outermost context otherwise.
+    """
+
     async def __aenter__(self: _T_Repo) -> _T_Repo:
         return self
 
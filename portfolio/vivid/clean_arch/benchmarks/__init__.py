@@ -0,0 +1,9 @@
+"""
+Benchmarks of the clean_arch repositories and utils.
+
+Every module is runnable from the directory containing `clean_arch`, e.g.:
+    python -m clean_arch.benchmarks.redis_ids --redis-url redis://localhost:6379/15
+
+Without `--redis-url` the Redis benchmarks use fakeredis, which has no network round trips,
+so the numbers are only comparable to each other.
+"""
@@ -0,0 +1,136 @@
+"""
+Codecs of the Redis repositories on entities with a text, tags and attributes: the average size of a value in bytes,
+the memory of a key reported by Redis (MEMORY USAGE, not supported by fakeredis), values encoded and decoded
+per second, and rows per second of `list` of all the entities. The codecs of the missing packages are skipped.
+
+The Redis repository uses fakeredis by default.
+
+    python -m clean_arch.benchmarks.codecs [--redis-url URL] [--rows 10000] [--repeat 3] [--compress-min-size 1024]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any, Optional
+
+from redis.exceptions import ResponseError
+
+from clean_arch.benchmarks.common import BenchEntityAlreadyExists, delete_prefix, make_redis, measure, print_table
+from clean_arch.domain.entities import EntityFilterModel, EntityModel, LimitOffset
+from clean_arch.infra.redis.codecs import Codec, decode
+from clean_arch.infra.redis.repositories import RedisGenericSimpleRepo
+
+CODECS = [
+    ('json', None),
+    ('orjson', None),
+    ('msgpack', None),
+    ('json', 'zlib'),
+    ('orjson', 'zstd'),
+    ('orjson', 'lz4'),
+    ('msgpack', 'zstd'),
+    ('msgpack', 'lz4'),
+]
+"""Serializers and compressions of the measured codecs"""
+
+MEMORY_SAMPLE = 100
+"""Keys of which the memory is asked from Redis"""
+
+
+class DocumentEntity(EntityModel):
+    title: str
+    status: str = 'draft'
+    score: int = 0
+    text: str = ''
+    tags: list[str] = []
+    attributes: dict[str, Any] = {}
+
+
+class DocumentEntityFilter(EntityFilterModel):
+    status: Optional[str] = None
+
+
+class RedisDocumentRepo(RedisGenericSimpleRepo[DocumentEntity, DocumentEntityFilter]):
+    entity_cls = DocumentEntity
+    filter_cls = DocumentEntityFilter
+    already_exists_err = BenchEntityAlreadyExists
+
+
+def make_documents(amount: int) -> list[DocumentEntity]:
+    words = ('order', 'shipped', 'customer', 'invoice', 'pending', 'warehouse', 'refund', 'delivery')
+    return [
+        DocumentEntity(
+            title=f'document-{i}',
+            score=i % 100,
+            text=' '.join(words[(i + j) % len(words)] for j in range(i % 50 + 100)),
+            tags=[words[(i + j) % len(words)] for j in range(5)],
+            attributes={'version': i % 7, 'size': i * 13, 'owner': f'user-{i % 40}', 'public': i % 2 == 0},
+        )
+        for i in range(amount)
+    ]
+
+
+async def memory_per_key(client: Any, keys: list[Any]) -> Optional[float]:
+    try:
+        usages = [await client.memory_usage(key) for key in keys[:MEMORY_SAMPLE]]
+    except ResponseError:
+        return None
+    return sum(usages) / len(usages)
+
+
+async def main(redis_url: Optional[str], rows: int, repeat: int, compress_min_size: int) -> None:
+    documents = make_documents(rows)
+    datas = [document.model_dump(mode='json') for document in documents]
+    client = make_redis(redis_url)
+
+    table = []
+    for serializer, compression in CODECS:
+        try:
+            codec = Codec(serializer, compression, compress_min_size)
+        except RuntimeError as err:
+            print(f'skipped: {err}')
+            continue
+
+        values = [codec.encode(data) for data in datas]
+
+        async def encode() -> None:
+            for data in datas:
+                codec.encode(data)
+
+        async def decode_all() -> None:
+            for value in values:
+                decode(value)
+
+        repo = type('RedisCodecRepo', (RedisDocumentRepo,), {'codec': codec})(client, prefix='bench_codecs')
+        await delete_prefix(client, 'bench_codecs')
+        async with repo:
+            await repo.add_many(documents)
+            await repo.commit()
+
+        async def read() -> None:
+            async with repo:
+                await repo.list(LimitOffset().inf)
+
+        keys = [f'bench_codecs:{document.uuid}' for document in documents]
+        memory = await memory_per_key(client, keys)
+        table.append(
+            [
+                f'{serializer}+{compression}' if compression else serializer,
+                sum(len(value) for value in values) / len(values),
+                '' if memory is None else memory,
+                rows / await measure(encode, repeat),
+                rows / await measure(decode_all, repeat),
+                rows / await measure(read, repeat),
+            ]
+        )
+    await delete_prefix(client, 'bench_codecs')
+    print_table(['codec', 'bytes/value', 'memory/key', 'encode/s', 'decode/s', 'list rows/s'], table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--redis-url', default=None)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--compress-min-size', type=int, default=1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.redis_url, args.rows, args.repeat, args.compress_min_size))
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable, Optional
+from uuid import UUID, uuid4
+
+from redis.asyncio.client import Redis
+from sqlalchemy import Integer, String, Uuid
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from clean_arch.domain.entities import EntityFilterModel, EntityModel
+from clean_arch.domain.exceptions import DomainException
+from clean_arch.infra.mock.repositories import MockGenericRepo, MockStore
+from clean_arch.infra.redis.repositories import RedisGenericSimpleRepo
+from clean_arch.infra.sql.repositories import SQLGenericRepo
+from clean_arch.utils.batching import chunked
+
+
+class BenchEntity(EntityModel):
+    name: str
+    status: str = 'new'
+    score: int = 0
+
+
+class BenchEntityFilter(EntityFilterModel):
+    name: Optional[str] = None
+    status: Optional[str] = None
+    score: Optional[int] = None
+
+
+class BenchEntityAlreadyExists(DomainException):
+    pass
+
+
+class RedisBenchRepo(RedisGenericSimpleRepo[BenchEntity, BenchEntityFilter]):
+    entity_cls = BenchEntity
+    filter_cls = BenchEntityFilter
+    already_exists_err = BenchEntityAlreadyExists
+
+
+class MockBenchRepo(MockGenericRepo[BenchEntity, BenchEntityFilter]):
+    entity_cls = BenchEntity
+    filter_cls = BenchEntityFilter
+    already_exists_err = BenchEntityAlreadyExists
+    _mock_store: MockStore[BenchEntity] = MockStore()
+
+
+class SQLBenchBase(DeclarativeBase):
+    pass
+
+
+class SQLBenchEntity(SQLBenchBase):
+    __tablename__ = 'bench_entities'
+
+    id: Mapped[int] = mapped_column(Integer(), primary_key=True, autoincrement=True)
+    uuid: Mapped[UUID] = mapped_column(Uuid(), default=uuid4, index=True, unique=True)
+    name: Mapped[str] = mapped_column(String())
+    status: Mapped[str] = mapped_column(String(), index=True)
+    score: Mapped[int] = mapped_column(Integer(), default=0)
+
+
+class SQLBenchRepo(SQLGenericRepo[SQLBenchEntity, BenchEntity, BenchEntityFilter]):
+    sql_entity_cls = SQLBenchEntity
+    entity_cls = BenchEntity
+    filter_cls = BenchEntityFilter
+    already_exists_err = BenchEntityAlreadyExists
+
+
+def make_entities(amount: int) -> list[BenchEntity]:
+    statuses = ('new', 'active', 'done')
+    return [BenchEntity(name=f'name-{i}', status=statuses[i % 3], score=i % 100) for i in range(amount)]
+
+
+def make_redis(url: Optional[str] = None) -> Redis:
+    if url:
+        return Redis.from_url(url)
+    try:
+        import fakeredis
+    except ImportError as err:
+        raise RuntimeError('fakeredis is not installed. Install fakeredis or pass a Redis url.') from err
+    return fakeredis.FakeAsyncRedis()
+
+
+async def delete_prefix(client: Redis, prefix: str) -> None:
+    """Deletes the keys of a benchmark, so the other keys of a real Redis are kept"""
+    keys = [key async for key in client.scan_iter(match=f'{prefix}:*')]
+    for chunk in chunked(keys, 1000):
+        await client.delete(*chunk)
+
+
+async def make_sql(url: str) -> Callable[[], AsyncSession]:
+    """Returns a session factory of a database with empty tables of the benchmarks"""
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLBenchBase.metadata.drop_all)
+        await conn.run_sync(SQLBenchBase.metadata.create_all)
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def measure(fn: Callable[[], Awaitable[Any]], repeat: int = 1) -> float:
+    """Returns the best wall time of `repeat` runs in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def print_table(headers: list[str], rows: list[list[Any]]) -> None:
+    cells = [headers] + [[f'{cell:.1f}' if isinstance(cell, float) else str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for row in cells:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
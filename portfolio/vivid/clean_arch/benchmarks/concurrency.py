@@ -0,0 +1,105 @@
+"""
+Requests per second of a repository shared by concurrent tasks with the task-scoped sessions
+compared to the previous lock serializing the sessions of a repository, at concurrency 1, 16 and 128.
+A request opens a session, gets an entity, lists a page and commits.
+
+The SQL repository uses a SQLite file by default, the mock repository simulates the latency of commit.
+
+    python -m clean_arch.benchmarks.concurrency [--database-url URL] [--requests 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Optional
+
+from clean_arch.benchmarks.common import (
+    BenchEntityFilter,
+    MockBenchRepo,
+    SQLBenchRepo,
+    make_entities,
+    make_sql,
+    print_table,
+)
+from clean_arch.domain.entities import LimitOffset
+
+
+class LockedMixin:
+    """The previous sessions: a single lock acquired for the whole session"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._session_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> Any:
+        await self._session_lock.acquire()
+        try:
+            return await super().__aenter__()  # type: ignore[misc]
+        except BaseException:
+            self._session_lock.release()
+            raise
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        try:
+            await super().__aexit__(exc_type, exc, tb)  # type: ignore[misc]
+        finally:
+            self._session_lock.release()
+
+
+class LockedSQLBenchRepo(LockedMixin, SQLBenchRepo):
+    pass
+
+
+class LockedMockBenchRepo(LockedMixin, MockBenchRepo):
+    pass
+
+
+async def requests_per_second(repo: Any, concurrency: int, requests: int) -> float:
+    async with repo:
+        entities = await repo.list(LimitOffset(limit=100))
+    entity_filter = BenchEntityFilter(status='new', order_by='-score')
+    queue = iter(range(requests))
+
+    async def worker() -> None:
+        for i in queue:
+            async with repo:
+                await repo.get(entities[i % len(entities)].uuid)
+                await repo.list(LimitOffset(limit=20), entity_filter)
+                await repo.commit()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main(database_url: Optional[str], requests: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        make_session = await make_sql(database_url or f'sqlite+aiosqlite:///{os.path.join(directory, "bench.db")}')
+        async with SQLBenchRepo(make_session) as sql_repo:
+            await sql_repo.add_many(make_entities(1000))
+            await sql_repo.commit()
+        store = {entity.uuid: entity for entity in make_entities(1000)}
+
+        rows = []
+        for concurrency in (1, 16, 128):
+            rows.append(
+                [
+                    concurrency,
+                    await requests_per_second(LockedSQLBenchRepo(make_session), concurrency, requests),
+                    await requests_per_second(SQLBenchRepo(make_session), concurrency, requests),
+                    await requests_per_second(LockedMockBenchRepo(dict(store)), concurrency, requests),
+                    await requests_per_second(MockBenchRepo(dict(store)), concurrency, requests),
+                ]
+            )
+        print_table(['concurrency', 'sql lock req/s', 'sql req/s', 'mock lock req/s', 'mock req/s'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.database_url, args.requests))
@@ -0,0 +1,92 @@
+"""
+Rows per second of `list` of all the entities with the hydration modes of the repositories.
+The rows are read once before measuring, so the SQL numbers include the query and the ORM,
+the models_validate numbers include only building the entities of the fetched rows.
+
+The SQL repository uses a SQLite file by default, the Redis repository uses fakeredis by default.
+
+    python -m clean_arch.benchmarks.hydration [--database-url URL] [--redis-url URL] [--rows 10000] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+from typing import Any, Optional
+
+from sqlalchemy import select
+
+from clean_arch.benchmarks.common import (
+    RedisBenchRepo,
+    SQLBenchEntity,
+    SQLBenchRepo,
+    delete_prefix,
+    make_entities,
+    make_redis,
+    make_sql,
+    measure,
+    print_table,
+)
+from clean_arch.domain.entities import LimitOffset
+from clean_arch.utils.validation import Hydration
+
+
+async def list_rows_per_second(repo: Any, rows: int, repeat: int) -> float:
+    async def read() -> None:
+        async with repo:
+            await repo.list(LimitOffset().inf)
+
+    return rows / await measure(read, repeat)
+
+
+async def validate_rows_per_second(repo: Any, datas: list[Any], repeat: int) -> float:
+    async def validate() -> None:
+        await repo.models_validate(datas)
+
+    return len(datas) / await measure(validate, repeat)
+
+
+async def main(database_url: Optional[str], redis_url: Optional[str], rows: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        make_session = await make_sql(database_url or f'sqlite+aiosqlite:///{os.path.join(directory, "bench.db")}')
+        async with SQLBenchRepo(make_session) as sql_repo:
+            await sql_repo.add_many(make_entities(rows))
+            await sql_repo.commit()
+        async with make_session() as session:
+            sql_entities = list(await session.scalars(select(SQLBenchEntity)))
+
+        redis_repo = RedisBenchRepo(make_redis(redis_url), prefix='bench_hydration')
+        async with redis_repo:
+            await redis_repo.add_many(make_entities(rows))
+            await redis_repo.commit()
+        redis_datas = [data async for data in redis_repo._client.scan_iter(match='bench_hydration:*')]
+        redis_datas = await redis_repo._client.mget([key for key in redis_datas if redis_repo.is_entity_key(key)])
+
+        table = []
+        for hydration in Hydration:
+            sql_repo = SQLBenchRepo(make_session)
+            sql_repo.hydration = hydration
+            redis_repo.hydration = hydration
+            table.append(
+                [
+                    hydration.value,
+                    await list_rows_per_second(sql_repo, rows, repeat),
+                    await validate_rows_per_second(sql_repo, sql_entities, repeat),
+                    await list_rows_per_second(redis_repo, rows, repeat),
+                    await validate_rows_per_second(redis_repo, redis_datas, repeat),
+                ]
+            )
+        await delete_prefix(redis_repo._client, 'bench_hydration')
+        headers = ['hydration', 'sql list rows/s', 'sql validate rows/s', 'redis list rows/s', 'redis validate rows/s']
+        print_table(headers, table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--redis-url', default=None)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.database_url, args.redis_url, args.rows, args.repeat))
@@ -0,0 +1,79 @@
+"""
+Session cost of MockGenericRepo with the journal based sessions compared to the previous deepcopy of the store
+on session open and commit, for 1k, 10k and 100k stored entities. Reads compare the copied and the frozen entities.
+
+    python -m clean_arch.benchmarks.mock_sessions [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from copy import deepcopy
+from typing import Any
+
+from clean_arch.benchmarks.common import BenchEntity, MockBenchRepo, make_entities, measure, print_table
+from clean_arch.domain.entities import LimitOffset
+from clean_arch.infra.mock.repositories import MockStore
+
+
+class DeepCopyMockBenchRepo(MockBenchRepo):
+    """The previous sessions: a deepcopy of the whole store on session open and commit"""
+
+    async def commit(self) -> None:
+        await super().commit()
+        self._local_store = deepcopy(self._store)
+
+    async def __aenter__(self) -> DeepCopyMockBenchRepo:
+        await super().__aenter__()
+        self._local_store = deepcopy(self._store)
+        return self
+
+
+class FrozenMockBenchRepo(MockBenchRepo):
+    frozen_entities = True
+
+
+def make_store(amount: int) -> dict[Any, BenchEntity]:
+    return {entity.uuid: entity for entity in make_entities(amount)}
+
+
+async def session_seconds(repo: MockBenchRepo, repeat: int) -> float:
+    entity = next(iter(repo._store.values()))
+
+    async def session() -> None:
+        async with repo:
+            await repo.update(entity.model_copy(update={'status': 'done'}))
+            await repo.commit()
+
+    return await measure(session, repeat)
+
+
+async def list_seconds(repo: MockBenchRepo, repeat: int) -> float:
+    async def read() -> None:
+        async with repo:
+            await repo.list(LimitOffset().inf)
+
+    return await measure(read, repeat)
+
+
+async def main(repeat: int) -> None:
+    rows = []
+    for amount in (1_000, 10_000, 100_000):
+        store = make_store(amount)
+        rows.append(
+            [
+                amount,
+                await session_seconds(DeepCopyMockBenchRepo(MockStore(store)), repeat) * 1000,
+                await session_seconds(MockBenchRepo(MockStore(store)), repeat) * 1000,
+                await list_seconds(MockBenchRepo(MockStore(store)), repeat) * 1000,
+                await list_seconds(FrozenMockBenchRepo(MockStore(store)), repeat) * 1000,
+            ]
+        )
+    print_table(['entities', 'deepcopy session ms', 'journal session ms', 'list ms', 'frozen list ms'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,121 @@
+"""
+Operations per second of the Redis repository storing the entities as json strings and as hashes,
+on entities with a text, tags and attributes: `get`, `get` of a single field, `update` of a single field,
+`update_by_filter` of a single field of ~1% of the entities, and the bytes sent to Redis by an update.
+The json string is replaced as a whole, so the string repository updates all the fields of the entity.
+
+The Redis repository uses fakeredis by default.
+
+    python -m clean_arch.benchmarks.redis_hashes [--redis-url URL] [--rows 10000] [--calls 1000] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any, Optional
+
+from clean_arch.benchmarks.codecs import DocumentEntity, DocumentEntityFilter, make_documents
+from clean_arch.benchmarks.common import BenchEntityAlreadyExists, delete_prefix, make_redis, measure, print_table
+from clean_arch.infra.redis.repositories import RedisGenericHashRepo, RedisGenericSimpleRepo
+
+
+class ScoreFilter(DocumentEntityFilter):
+    score: Optional[int] = None
+
+
+class RedisDocumentRepo(RedisGenericSimpleRepo[DocumentEntity, ScoreFilter]):
+    entity_cls = DocumentEntity
+    filter_cls = ScoreFilter
+    already_exists_err = BenchEntityAlreadyExists
+    sorted_indexed_fields = ('score',)
+
+
+class RedisHashDocumentRepo(RedisGenericHashRepo[DocumentEntity, ScoreFilter]):
+    entity_cls = DocumentEntity
+    filter_cls = ScoreFilter
+    already_exists_err = BenchEntityAlreadyExists
+    sorted_indexed_fields = ('score',)
+
+
+async def sent_bytes(client: Any, fn: Any) -> int:
+    """Returns the bytes of the commands sent by `fn`"""
+    total = 0
+    connection_class = client.connection_pool.connection_class
+    send_packed_command = connection_class.send_packed_command
+
+    async def counting(connection: Any, command: Any, *args: Any, **kwargs: Any) -> Any:
+        nonlocal total
+        total += sum(len(part) for part in ([command] if isinstance(command, bytes) else command))
+        return await send_packed_command(connection, command, *args, **kwargs)
+
+    connection_class.send_packed_command = counting
+    try:
+        await fn()
+    finally:
+        connection_class.send_packed_command = send_packed_command
+    return total
+
+
+async def main(redis_url: Optional[str], rows: int, calls: int, repeat: int) -> None:
+    documents = make_documents(rows)
+    client = make_redis(redis_url)
+
+    table = []
+    storages: list[tuple[str, Any, Any]] = [
+        ('string', RedisDocumentRepo, None),
+        ('hash', RedisHashDocumentRepo, {'include': {'status'}}),
+    ]
+    for name, repo_cls, model_dump in storages:
+        await delete_prefix(client, 'bench_hashes')
+        repo: Any = repo_cls(client, prefix='bench_hashes')
+        async with repo:
+            await repo.add_many(documents)
+            await repo.commit()
+
+        async def get() -> None:
+            async with repo:
+                for i in range(calls):
+                    await repo.get(documents[i % rows].uuid)
+
+        async def get_field() -> None:
+            async with repo:
+                for i in range(calls):
+                    await repo.get(documents[i % rows].uuid, fields=['title'])
+
+        async def update() -> None:
+            for i in range(calls):
+                document = documents[i % rows]
+                document.status = f'status-{i}'
+                async with repo:
+                    await repo.update(document, model_dump=model_dump)
+                    await repo.commit()
+
+        async def update_by_filter() -> None:
+            for i in range(calls // 100 or 1):
+                async with repo:
+                    await repo.update_by_filter(ScoreFilter(score=i % 100), {'status': f'status-{i}'})
+                    await repo.commit()
+
+        table.append(
+            [
+                name,
+                calls / await measure(get, repeat),
+                calls / await measure(get_field, repeat),
+                calls / await measure(update, repeat),
+                (calls // 100 or 1) / await measure(update_by_filter, repeat),
+                await sent_bytes(client, update) / calls,
+            ]
+        )
+    await delete_prefix(client, 'bench_hashes')
+    headers = ['storage', 'get/s', 'get field/s', 'update/s', 'update_by_filter/s', 'update bytes sent']
+    print_table(headers, table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--redis-url', default=None)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.redis_url, args.rows, args.calls, args.repeat))
@@ -0,0 +1,63 @@
+"""
+Add throughput of RedisGenericSimpleRepo with the lock based id allocation
+compared to the INCR/INCRBY based RedisIdAllocator, for 1, 8 and 64 concurrent writers.
+Every writer has its own repository, like separate processes would.
+
+    python -m clean_arch.benchmarks.redis_ids [--redis-url URL] [--adds 2000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Optional
+
+from redis.asyncio.client import Redis
+
+from clean_arch.benchmarks.common import RedisBenchRepo, make_entities, make_redis, measure, print_table
+
+
+class LockedIdRedisBenchRepo(RedisBenchRepo):
+    """The previous id allocation: INCR guarded by a distributed lock"""
+
+    async def _get_id(self) -> int:
+        async with self._client.lock(f'{self._prefix}:id:lock', timeout=5):
+            return await self._client.incr(f'{self._prefix}:id', amount=1)
+
+
+async def run_writers(client: Redis, writers: int, adds: int, block_size: Optional[int]) -> float:
+    prefix = f'bench-ids-{writers}-{block_size}'
+    if keys := [key async for key in client.scan_iter(match=f'{prefix}:*')]:
+        await client.delete(*keys)
+
+    if block_size is None:
+        repos: list[RedisBenchRepo] = [LockedIdRedisBenchRepo(client, prefix) for _ in range(writers)]
+    else:
+        repos = [RedisBenchRepo(client, prefix, id_block_size=block_size) for _ in range(writers)]
+
+    async def write(repo: RedisBenchRepo) -> None:
+        async with repo:
+            for entity in make_entities(adds // writers):
+                await repo.add(entity)
+            await repo.commit()
+
+    seconds = await measure(lambda: asyncio.gather(*(write(repo) for repo in repos)))
+    return (adds // writers) * writers / seconds
+
+
+async def main(redis_url: Optional[str], adds: int) -> None:
+    client = make_redis(redis_url)
+    rows = []
+    for writers in (1, 8, 64):
+        row: list[object] = [writers]
+        for block_size in (None, 1, 100):
+            row.append(await run_writers(client, writers, adds, block_size))
+        rows.append(row)
+    print_table(['writers', 'lock adds/s', 'incr adds/s', 'block=100 adds/s'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--redis-url', default=None)
+    parser.add_argument('--adds', type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.redis_url, args.adds))
@@ -0,0 +1,63 @@
+"""
+Time of `multikeysort` compared to the previous `cmp_to_key` implementation,
+for full sorts and pages of 20 items out of 1k, 10k and 100k entities.
+
+    python -m clean_arch.benchmarks.sort [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import timeit
+from functools import cmp_to_key
+from operator import attrgetter
+from typing import Any, Callable
+
+from clean_arch.benchmarks.common import make_entities, print_table
+from clean_arch.utils.sort import multikeysort
+
+
+def cmp_multikeysort(items: list[Any], columns: str) -> list[Any]:
+    """The previous implementation: a comparator building the getters on every comparison"""
+
+    def get_comparers() -> list[tuple[Callable[[Any], Any], int]]:
+        comparers: list[tuple[Callable[[Any], Any], int]] = []
+        for col in columns.split(','):
+            col = col.strip()
+            if col.startswith('-'):
+                comparers.append((attrgetter(col[1:]), -1))
+            else:
+                comparers.append((attrgetter(col), 1))
+        return comparers
+
+    def custom_compare(left: Any, right: Any) -> int:
+        for fn, reverse in get_comparers():
+            result = (fn(left) > fn(right)) - (fn(left) < fn(right))
+            if result != 0:
+                return result * reverse
+        return 0
+
+    return sorted(items, key=cmp_to_key(custom_compare))
+
+
+def main(repeat: int) -> None:
+    columns = '-score,status,name'
+    rows = []
+    for amount in (1_000, 10_000, 100_000):
+        items = make_entities(amount)
+        assert multikeysort(items, columns) == cmp_multikeysort(items, columns)
+        assert multikeysort(items, columns, limit=20) == cmp_multikeysort(items, columns)[:20]
+        timings = [
+            lambda: cmp_multikeysort(items, columns),
+            lambda: multikeysort(items, columns),
+            lambda: cmp_multikeysort(items, columns)[:20],
+            lambda: multikeysort(items, columns, limit=20),
+        ]
+        rows.append([amount] + [min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000 for fn in timings])
+    print_table(['entities', 'cmp ms', 'sort ms', 'cmp top 20 ms', 'top 20 ms'], rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.repeat)
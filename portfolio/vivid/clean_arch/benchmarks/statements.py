@@ -0,0 +1,119 @@
+"""
+Per-call time of `get`, `list` and `count` of `SQLGenericRepo` with and without the statement cache,
+in microseconds: the time of building the statement alone and of the whole call.
+
+The repository uses a SQLite file by default.
+
+    python -m clean_arch.benchmarks.statements [--database-url URL] [--rows 1000] [--calls 2000] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.sql.functions import count
+
+from clean_arch.benchmarks.common import (
+    BenchEntityFilter,
+    SQLBenchRepo,
+    make_entities,
+    make_sql,
+    measure,
+    print_table,
+)
+from clean_arch.domain.entities import KeysetPage, LimitOffset
+
+
+class StatementsBenchFilter(BenchEntityFilter):
+    score__gte: Optional[int] = None
+    status__in: Optional[list[str]] = None
+
+
+class CachedRepo(SQLBenchRepo):
+    filter_cls = StatementsBenchFilter
+
+
+class UncachedRepo(SQLBenchRepo):
+    filter_cls = StatementsBenchFilter
+    statement_cache_size = 0
+
+
+def build_statement(repo: SQLBenchRepo, kind: str, entity_filter: Any, page: Any) -> Any:
+    """Builds the statement like the repository methods do, with the cache if the repository has one"""
+    if (statement := repo.get_statement(kind, entity_filter, page)) is not None:
+        return statement
+    if kind == 'count':
+        return repo.apply_filter(select(count()).select_from(repo.sql_entity_cls), entity_filter)
+    if isinstance(page, KeysetPage):
+        return repo.apply_keyset(repo.apply_filter(repo.get_select(), entity_filter), page, entity_filter)
+    query = repo.apply_filter(repo.get_select(), entity_filter)
+    return repo.apply_order_by(page.paginate(query) if page else query, entity_filter)
+
+
+async def per_call(fn: Callable[[int], Awaitable[Any]], calls: int, repeat: int) -> float:
+    async def run() -> None:
+        for i in range(calls):
+            await fn(i)
+
+    return await measure(run, repeat) / calls * 1e6
+
+
+async def main(database_url: Optional[str], rows: int, calls: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        make_session = await make_sql(database_url or f'sqlite+aiosqlite:///{os.path.join(directory, "bench.db")}')
+        async with UncachedRepo(make_session) as writer:
+            entities = await writer.add_many(make_entities(rows))
+            await writer.commit()
+
+        uuids = [entity.uuid for entity in entities]
+        statuses = (['new'], ['new', 'done'], ['active'])
+        cases: list[tuple[str, str, Callable[[int], Any], Callable[[int], Any]]] = [
+            ('get', 'get', lambda i: BenchEntityFilter(uuid=uuids[i % rows]), lambda i: None),
+            (
+                'list',
+                'list',
+                lambda i: StatementsBenchFilter(score__gte=i % 90, status__in=statuses[i % 3], order_by='-score'),
+                lambda i: LimitOffset(limit=20, offset=i % 5 * 20),
+            ),
+            ('list keyset', 'list', lambda i: StatementsBenchFilter(status=statuses[i % 3][0]), lambda i: KeysetPage()),
+            ('count', 'count', lambda i: StatementsBenchFilter(score__gte=i % 90), lambda i: None),
+        ]
+
+        table = []
+        for name, kind, make_filter, make_page in cases:
+            row: list[Any] = [name]
+            for repo_cls in (UncachedRepo, CachedRepo):
+                repo: SQLBenchRepo = repo_cls(make_session)
+
+                async def build(i: int) -> None:
+                    build_statement(repo, kind, make_filter(i), make_page(i))
+
+                async def call(i: int) -> None:
+                    if kind == 'get':
+                        await repo.get(uuids[i % rows])
+                    elif kind == 'list':
+                        await repo.list(make_page(i), make_filter(i))
+                    else:
+                        await repo.count(make_filter(i))
+
+                row.append(await per_call(build, calls, repeat))
+                async with repo:
+                    row.append(await per_call(call, calls, repeat))
+            table.append(row)
+
+        print_table(['query', 'build us', 'call us', 'cached build us', 'cached call us'], table)
+        print(f'statement cache: {CachedRepo.get_statement_cache().stats!r}')  # type: ignore[union-attr]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.database_url, args.rows, args.calls, args.repeat))
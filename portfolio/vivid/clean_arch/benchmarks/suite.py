@@ -0,0 +1,304 @@
+"""
+The same workloads against the SQL, Redis and mock repositories at 1k and 100k entities:
+operations per second, p50 and p99 latency in milliseconds and the peak memory allocated by an operation in KiB.
+Every operation runs in its own session, the writes commit. A workload runs `--ops` operations,
+or less if it takes more than `--max-seconds`. The memory is measured by a separate run of a few operations,
+since tracemalloc slows down the code.
+
+The SQL repository uses a SQLite file by default, the Redis repository uses fakeredis by default.
+
+`--save` stores the results as json, `--compare` prints the changes of ops/s against stored results
+and exits with 1 if any workload is slower than the baseline by more than `--threshold`.
+
+    python -m clean_arch.benchmarks.suite [--database-url URL] [--redis-url URL] [--sizes 1000,100000]
+        [--backends sql,redis,mock] [--ops 200] [--max-seconds 5] [--no-memory] [--save FILE] [--compare FILE]
+
+`baselines/suite-1k.json` holds the results of the default backends at 1k entities, with the python and the platform
+of the run. The ops/s depend on the machine, and the workloads of a few microseconds vary by tens of percent
+between runs, so compare against a baseline saved on the same machine, e.g. by the parent commit of a change.
+The file is refreshed when the workloads or the defaults change:
+
+    python -m clean_arch.benchmarks.suite --sizes 1000 --save clean_arch/benchmarks/baselines/suite-1k.json
+    python -m clean_arch.benchmarks.suite --sizes 1000 --compare clean_arch/benchmarks/baselines/suite-1k.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from clean_arch.benchmarks.common import (
+    BenchEntity,
+    BenchEntityFilter,
+    MockBenchRepo,
+    RedisBenchRepo,
+    SQLBenchRepo,
+    delete_prefix,
+    make_entities,
+    make_redis,
+    make_sql,
+    print_table,
+)
+from clean_arch.domain.entities import LimitOffset
+from clean_arch.infra.mock.repositories import MockStore
+
+MIN_OPS = 5
+"""Operations of a workload run even if they take more than `--max-seconds`"""
+
+MEMORY_OPS = 10
+"""Max operations of the run measuring the memory, one runs even if it takes more than `--max-seconds`"""
+
+BULK_SIZE = 1000
+"""Entities added by an operation of the bulk add"""
+
+
+class Dataset:
+    """Seeded entities, the workloads pick the entities by the number of the operation"""
+
+    def __init__(self, entities: list[BenchEntity]) -> None:
+        self.entities = entities
+        self.added = 0
+
+    def pick(self, i: int) -> BenchEntity:
+        # a stride spreads the picks over the whole dataset
+        return self.entities[i * 7919 % len(self.entities)]
+
+    def make_new(self, amount: int) -> list[BenchEntity]:
+        entities = [BenchEntity(name=f'new-{self.added + i}') for i in range(amount)]
+        self.added += amount
+        return entities
+
+
+class Workload(NamedTuple):
+    name: str
+    run: Callable[[Any, Dataset, int], Awaitable[Any]]
+    """Runs the i-th operation inside a session of the repository"""
+
+
+async def add(repo: Any, dataset: Dataset, i: int) -> None:
+    await repo.add(dataset.make_new(1)[0])
+    await repo.commit()
+
+
+async def bulk_add(repo: Any, dataset: Dataset, i: int) -> None:
+    await repo.add_many(dataset.make_new(BULK_SIZE))
+    await repo.commit()
+
+
+async def update_by_filter(repo: Any, dataset: Dataset, i: int) -> None:
+    await repo.update_by_filter(BenchEntityFilter(name=dataset.pick(i).name), {'score': i % 100})
+    await repo.commit()
+
+
+STATUSES = ('new', 'active', 'done')
+
+WORKLOADS = [
+    Workload('get by id', lambda repo, dataset, i: repo.get(dataset.pick(i).id)),
+    Workload('get by uuid', lambda repo, dataset, i: repo.get(dataset.pick(i).uuid)),
+    Workload(
+        'filtered list',
+        lambda repo, dataset, i: repo.list(LimitOffset(limit=20), BenchEntityFilter(status=STATUSES[i % 3])),
+    ),
+    Workload(
+        'ordered list',
+        lambda repo, dataset, i: repo.list(
+            LimitOffset(limit=20, offset=i % 10 * 20), BenchEntityFilter(order_by='-score,name')
+        ),
+    ),
+    Workload('count', lambda repo, dataset, i: repo.count(BenchEntityFilter(status=STATUSES[i % 3]))),
+    Workload('update_by_filter', update_by_filter),
+    Workload('add', add),
+    Workload('bulk add', bulk_add),
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Returns the nearest-rank percentile of the sorted `values`
+
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 0.5), percentile([1.0, 2.0, 3.0, 4.0], 0.99)
+    (2.0, 4.0)
+    """
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+async def run_workload(repo: Any, workload: Workload, dataset: Dataset, ops: int, max_seconds: float) -> list[float]:
+    """Returns the latencies of the operations in seconds"""
+    latencies = []
+    deadline = time.perf_counter() + max_seconds
+    for i in range(ops):
+        started = time.perf_counter()
+        async with repo:
+            await workload.run(repo, dataset, i)
+        latencies.append(time.perf_counter() - started)
+        if len(latencies) >= MIN_OPS and time.perf_counter() > deadline:
+            break
+    return latencies
+
+
+async def measure_memory(repo: Any, workload: Workload, dataset: Dataset, max_seconds: float) -> float:
+    """Returns the max peak of the memory allocated by an operation in KiB"""
+    peak = 0
+    deadline = time.perf_counter() + max_seconds
+    tracemalloc.start()
+    try:
+        for i in range(MEMORY_OPS):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            async with repo:
+                await workload.run(repo, dataset, i)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+            if time.perf_counter() > deadline:
+                break
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+async def run_backend(
+    name: str, repo: Any, size: int, ops: int, max_seconds: float, memory: bool
+) -> list[dict[str, Any]]:
+    async with repo:
+        entities = await repo.add_many(make_entities(size))
+        await repo.commit()
+    dataset = Dataset(entities)
+
+    results = []
+    for workload in WORKLOADS:
+        latencies = sorted(await run_workload(repo, workload, dataset, ops, max_seconds))
+        results.append(
+            {
+                'backend': name,
+                'size': size,
+                'workload': workload.name,
+                'ops': len(latencies),
+                'ops_per_second': len(latencies) / sum(latencies),
+                'p50_ms': percentile(latencies, 0.5) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'peak_kib': await measure_memory(repo, workload, dataset, max_seconds) if memory else None,
+            }
+        )
+    return results
+
+
+def compare(results: list[dict[str, Any]], path: str, threshold: float) -> bool:
+    """Prints the changes of ops/s against the baseline, returns False if any workload regressed"""
+    with open(path) as file:
+        baseline = {(row['backend'], row['size'], row['workload']): row for row in json.load(file)['results']}
+
+    table, passed = [], True
+    for row in results:
+        if (base := baseline.get((row['backend'], row['size'], row['workload']))) is None:
+            continue
+        change = row['ops_per_second'] / base['ops_per_second'] - 1
+        regressed = change < -threshold
+        passed = passed and not regressed
+        table.append(
+            [
+                row['backend'],
+                row['size'],
+                row['workload'],
+                base['ops_per_second'],
+                row['ops_per_second'],
+                f'{change:+.1%}',
+                'REGRESSION' if regressed else '',
+            ]
+        )
+    print_table(['backend', 'size', 'workload', 'baseline ops/s', 'ops/s', 'change', ''], table)
+    return passed
+
+
+async def main(
+    database_url: Optional[str],
+    redis_url: Optional[str],
+    sizes: list[int],
+    backends: list[str],
+    ops: int,
+    max_seconds: float,
+    memory: bool,
+    save: Optional[str],
+    baseline: Optional[str],
+    threshold: float,
+) -> int:
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            for backend in backends:
+                if backend == 'sql':
+                    url = database_url or f'sqlite+aiosqlite:///{os.path.join(directory, "bench.db")}'
+                    repo: Any = SQLBenchRepo(await make_sql(url))
+                elif backend == 'redis':
+                    client = make_redis(redis_url)
+                    await delete_prefix(client, 'bench_suite')
+                    repo = RedisBenchRepo(client, prefix='bench_suite')
+                elif backend == 'mock':
+                    repo = MockBenchRepo(store=MockStore())
+                else:
+                    raise ValueError(f'Unknown backend: {backend}')
+
+                try:
+                    results += await run_backend(backend, repo, size, ops, max_seconds, memory)
+                finally:
+                    if backend == 'redis':
+                        await delete_prefix(client, 'bench_suite')
+
+    table = [
+        [
+            row['backend'],
+            row['size'],
+            row['workload'],
+            row['ops'],
+            row['ops_per_second'],
+            row['p50_ms'],
+            row['p99_ms'],
+            '' if row['peak_kib'] is None else row['peak_kib'],
+        ]
+        for row in results
+    ]
+    print_table(['backend', 'size', 'workload', 'ops', 'ops/s', 'p50 ms', 'p99 ms', 'peak KiB'], table)
+
+    if save:
+        with open(save, 'w') as file:
+            json.dump({'python': sys.version, 'platform': platform.platform(), 'results': results}, file, indent=2)
+    if baseline:
+        print()
+        return 0 if compare(results, baseline, threshold) else 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--redis-url', default=None)
+    parser.add_argument('--sizes', default='1000,100000', help='comma separated numbers of the seeded entities')
+    parser.add_argument('--backends', default='sql,redis,mock')
+    parser.add_argument('--ops', type=int, default=200, help='max operations of a workload')
+    parser.add_argument('--max-seconds', type=float, default=5.0, help='time budget of a workload')
+    parser.add_argument('--no-memory', action='store_true', help='skip measuring the memory')
+    parser.add_argument('--save', default=None, help='json file to store the results as a baseline')
+    parser.add_argument('--compare', default=None, help='json file of the baseline results')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed drop of ops/s, 0.2 is 20%%')
+    args = parser.parse_args()
+    sys.exit(
+        asyncio.run(
+            main(
+                args.database_url,
+                args.redis_url,
+                [int(size) for size in args.sizes.split(',')],
+                args.backends.split(','),
+                args.ops,
+                args.max_seconds,
+                not args.no_memory,
+                args.save,
+                args.compare,
+                args.threshold,
+            )
+        )
+    )
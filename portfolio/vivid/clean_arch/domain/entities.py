@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-from typing import Optional, Protocol, TypeVar
+import base64
+import json
+from functools import lru_cache
+from typing import Any, Optional, Protocol, Sequence, Type, TypeVar, Union
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from pydantic_core import to_jsonable_python
+
+from clean_arch.utils.filters import Condition, parse_filter_key
+from clean_arch.utils.sort import parse_order_by
 
 INF = -1
 
 _T = TypeVar('_T', bound='SelectProtocol')
+_E = TypeVar('_E', bound='BaseEntityModel')
 
 
 class SelectProtocol(Protocol):
@@ -35,9 +43,100 @@ class LimitOffset(BaseModel):
         return self.model_copy(update={'limit': INF})
 
 
+@lru_cache(maxsize=None)
+def _get_field_adapter(model_cls: Type[BaseModel], field: str) -> TypeAdapter[Any]:
+    return TypeAdapter(model_cls.model_fields[field].annotation or Any)
+
+
+class KeysetPage(BaseModel):
+    """Keyset (cursor) pagination.
+
+    Items are ordered by the `order_by` of the filter with `id` as a tiebreaker,
+    the cursor holds the values of these columns of the last item of the previous page,
+    so the cost of a page does not depend on its depth. The columns should not contain nulls.
+
+    Example:
+        page = KeysetPage(limit=100)
+        while page is not None:
+            items = await repo.list(page, entity_filter)
+            page = page.next_page(items, entity_filter.order_by)
+    """
+
+    limit: int = 20
+    cursor: Optional[str] = None
+    """Opaque cursor of the previous page, None for the first page"""
+
+    @staticmethod
+    def get_order_by(order_by: Optional[str] = None) -> str:
+        """Returns the order of the pages: `order_by` with the `id` tiebreaker"""
+        if not order_by:
+            return 'id'
+        if any(name == 'id' for name, _ in parse_order_by(order_by)):
+            return order_by
+        return f'{order_by},id'
+
+    def next_cursor(self, items: Sequence[Any], order_by: Optional[str] = None) -> Optional[str]:
+        """Returns the cursor of the page following the `items`, None if `items` is the last page"""
+        if self.limit <= 0 or len(items) < self.limit:
+            return None
+        order_by = self.get_order_by(order_by)
+        values = [getattr(items[-1], name) for name, _ in parse_order_by(order_by)]
+        data = json.dumps([order_by, to_jsonable_python(values)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def next_page(self, items: Sequence[Any], order_by: Optional[str] = None) -> Optional['KeysetPage']:
+        """Returns the page following the `items`, None if `items` is the last page"""
+        cursor = self.next_cursor(items, order_by)
+        return None if cursor is None else self.model_copy(update={'cursor': cursor})
+
+    def get_cursor_values(self, entity_cls: Type[BaseModel], order_by: Optional[str] = None) -> Optional[list[Any]]:
+        """Returns the values of the order columns stored in the cursor, typed by the fields of `entity_cls`"""
+        if self.cursor is None:
+            return None
+        order_by = self.get_order_by(order_by)
+        try:
+            cursor_order_by, values = json.loads(base64.urlsafe_b64decode(self.cursor.encode()))
+        except (ValueError, TypeError) as err:
+            raise ValueError(f'Invalid cursor: {self.cursor}') from err
+        if cursor_order_by != order_by or len(values) != len(parse_order_by(order_by)):
+            raise ValueError(f'The cursor does not match the ordering: {order_by}')
+        return [
+            _get_field_adapter(entity_cls, name).validate_python(value)
+            for (name, _), value in zip(parse_order_by(order_by), values)
+        ]
+
+
+Page = Union[LimitOffset, KeysetPage]
+
+
 class BaseEntityModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
+    @classmethod
+    def check_fields(cls, fields: Sequence[str]) -> None:
+        """Raises ValueError if any of the fields is not a field of the entity"""
+        if unknown := [field for field in fields if field not in cls.model_fields]:
+            raise ValueError(f'Unknown fields of {cls.__name__}: {", ".join(unknown)}')
+
+    @classmethod
+    def model_construct_fields(cls: Type[_E], values: dict[str, Any]) -> _E:
+        """Returns a partial entity having only the fields of the values, which are not validated.
+        The rest of the fields are not set, so accessing them raises AttributeError, and `model_dump` skips them.
+        """
+        entity = cls.model_construct(_fields_set=set(values), **values)
+        for field in cls.model_fields.keys() - values.keys():
+            entity.__dict__.pop(field, None)
+        return entity
+
+    @classmethod
+    def model_validate_fields(cls: Type[_E], data: dict[str, Any], fields: Sequence[str]) -> _E:
+        """Returns a partial entity of the `fields` of the data, validating only these fields,
+        see `model_construct_fields`
+        """
+        return cls.model_construct_fields(
+            {field: _get_field_adapter(cls, field).validate_python(data.get(field)) for field in fields}
+        )
+
 
 class EntityModel(BaseEntityModel):
     id: Optional[int] = None
@@ -45,18 +144,48 @@ class EntityModel(BaseEntityModel):
 
 
 class BaseEntityFilterModel(BaseModel):
+    """Filter of the entities by the set fields.
+    The fields named `{field}__{operator}` compare the field by the operator of `clean_arch.utils.filters`,
+    e.g. `score__gte`, `status__in`, `deleted_at__isnull`, `name__startswith`.
+
+    Example:
+        class ExampleEntityFilter(EntityFilterModel):
+            rating__gte: Optional[int] = None
+            status__in: Optional[list[str]] = None
+    """
 
     order_by: Optional[str] = None
     """Simple ordering of the items. Use comma separated values. Prefix with '-' for descending order.
     Example: 'name,-created_at'
     """
 
+    def get_conditions(self, mode: str = 'python') -> list[Condition]:
+        """Returns (field, operator, value) of the set fields, the values are dumped in the `mode`.
+        The operators with None values are skipped, except `eq` and `ne`, which compare to null.
+        """
+        keys = self.model_fields_set - self.get_excluded_for_filter_keys()
+        conditions: list[Condition] = []
+        for key, value in self.model_dump(mode=mode, include=keys).items():
+            field, operator = parse_filter_key(key)
+            if value is not None or operator in ('eq', 'ne'):
+                conditions.append((field, operator, value))
+        return conditions
+
     @classmethod
     def get_excluded_for_filter_keys(cls) -> set[str]:
         """Returns a set of keys that should not be used for filtering"""
         return {'order_by'}
 
+    @classmethod
+    def get_indexed_keys(cls) -> set[str]:
+        """Returns a set of keys with unique or hash indexes in the storage, used for the lookups in memory"""
+        return set()
+
 
 class EntityFilterModel(BaseEntityFilterModel):
     id: Optional[int] = None
     uuid: Optional[UUID] = None
+
+    @classmethod
+    def get_indexed_keys(cls) -> set[str]:
+        return super().get_indexed_keys() | {'id', 'uuid'}
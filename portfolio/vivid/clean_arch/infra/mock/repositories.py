@@ -3,111 +3,354 @@ from __future__ import annotations
 import asyncio
 from copy import deepcopy
 from itertools import count
-from typing import Any, Dict, Generic, Optional, Type, TypeVar
+from typing import Any, AsyncIterator, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar
 from uuid import UUID
 
 from clean_arch.application.repositories import BaseRepo, T_Entity, T_Filter
-from clean_arch.domain.entities import LimitOffset
+from clean_arch.domain.entities import KeysetPage, Page
 from clean_arch.domain.exceptions import DomainException
-from clean_arch.utils.sort import multikeysort
+from clean_arch.utils.context import TaskLocal
+from clean_arch.utils.filters import compile_filter
+from clean_arch.utils.sort import keyset_paginate, multikeysort
 
 _get_id = count(1).__next__
 
 
+class MockIndex(Generic[T_Entity]):
+    """Hash indexes of the entities: {field: {value: {uuid: None}}}, the members keep the order of insertion"""
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        self.fields = tuple(fields)
+        self.version = -1
+        """Version of the store the index was built for"""
+        self._values: Dict[str, Dict[Any, Dict[UUID, None]]] = {field: {} for field in self.fields}
+
+    def add(self, entity: T_Entity) -> None:
+        for field in self.fields:
+            self._values[field].setdefault(getattr(entity, field), {})[entity.uuid] = None
+
+    def remove(self, entity: T_Entity) -> None:
+        for field in self.fields:
+            members = self._values[field].get(getattr(entity, field), {})
+            members.pop(entity.uuid, None)
+            if not members:
+                self._values[field].pop(getattr(entity, field), None)
+
+    def rebuild(self, entities: Iterable[T_Entity]) -> None:
+        self._values = {field: {} for field in self.fields}
+        for entity in entities:
+            self.add(entity)
+
+    def find(self, values: Dict[str, Any]) -> List[UUID]:
+        """Returns uuids of the entities having all the values of the indexed fields"""
+        members = sorted((self._values[field].get(value, {}) for field, value in values.items()), key=len)
+        return [uuid for uuid in members[0] if all(uuid in other for other in members[1:])]
+
+
+class MockStore(Dict[UUID, T_Entity]):
+    """Store of the entities that counts its changes and keeps the indexes of the repositories using it,
+    so the indexes are rebuilt after the store is changed outside of the repositories.
+    The plain dicts declared as `_mock_store` are replaced by it.
+
+    >>> store = MockStore()
+    >>> store['a'] = 1
+    >>> store.pop('a'), store.version
+    (1, 2)
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.version = 0
+        """Number of the changes of the store"""
+        self.indexes: Dict[Tuple[str, ...], MockIndex[T_Entity]] = {}
+        """Indexes of the store by the indexed fields"""
+
+    def __setitem__(self, key: UUID, value: T_Entity) -> None:
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key: UUID) -> None:
+        super().__delitem__(key)
+        self.version += 1
+
+    def __ior__(self, other: Any) -> MockStore[T_Entity]:  # type: ignore[override,misc]
+        self.update(other)
+        return self
+
+    def pop(self, *args: Any) -> Any:
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self) -> Tuple[UUID, T_Entity]:
+        self.version += 1
+        return super().popitem()
+
+    def clear(self) -> None:
+        super().clear()
+        self.version += 1
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def setdefault(self, key: UUID, default: Any = None) -> Any:
+        self.version += 1
+        return super().setdefault(key, default)
+
+
 class BaseMockStore(Generic[T_Entity]):
 
-    _lock: asyncio.Lock
     _mock_store: Dict[UUID, T_Entity]
     _store: Dict[UUID, T_Entity]
-    _local_store: Dict[UUID, T_Entity]
-    _local_removed_store: Dict[UUID, T_Entity]
+    _dict_index: Optional[MockIndex[T_Entity]] = None
+    """Index of a plain dict store, built by the first lookup of a session"""
+    _local_store: TaskLocal[Dict[UUID, T_Entity]] = TaskLocal()
+    _local_removed_store: TaskLocal[Dict[UUID, T_Entity]] = TaskLocal()
+    _local_index: TaskLocal[MockIndex[T_Entity]] = TaskLocal()
+    _checkpoints: TaskLocal[Tuple[Tuple[Dict[UUID, T_Entity], Dict[UUID, T_Entity]], ...]] = TaskLocal()
+    """The journal at the start of every nested context, a tuple rebound on change,
+    so the tasks started inside a block don't change the checkpoints of their parent
+    """
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        store = cls.__dict__.get('_mock_store')
+        if isinstance(store, dict) and not isinstance(store, MockStore):
+            cls._mock_store = MockStore(store)
+
+    @property
+    def _indexed_fields(self) -> Tuple[str, ...]:
+        return ()
 
 
 _T = TypeVar('_T', bound=BaseMockStore[Any])
 
 
 class MockGenericRepo(BaseMockStore[T_Entity], BaseRepo[T_Entity, T_Filter]):
+    """In-memory implementation of a generic repository for tests.
+    A session keeps a journal of the changes on top of the shared store, applied to the store on commit.
+    """
 
     entity_cls: Type[T_Entity]
     filter_cls: Type[T_Filter]
     already_exists_err: Type[DomainException]
 
+    frozen_entities: bool = False
+    """The callers don't mutate the entities, so the entities are returned without copies"""
+
     def __init__(self, store: Optional[Dict[UUID, T_Entity]] = None) -> None:
-        self._lock = asyncio.Lock()
         if store is None:
             self._store = self._mock_store
         else:
             self._store = store
 
+    def _copy(self, entity: T_Entity, fields: Optional[Sequence[str]] = None) -> T_Entity:
+        """Returns the entity to the caller, only the `fields` of it if given"""
+        if fields is not None:
+            values = {field: getattr(entity, field) for field in fields}
+            return self.entity_cls.model_construct_fields(values if self.frozen_entities else deepcopy(values))
+        return entity if self.frozen_entities else entity.model_copy(deep=True)
+
+    def _get_entity(self, uuid: UUID) -> Optional[T_Entity]:
+        """Returns the stored entity as seen by the session, without a copy"""
+        if uuid in self._local_removed_store:
+            return None
+        return self._local_store.get(uuid) or self._store.get(uuid)
+
+    @property
+    def _indexed_fields(self) -> Tuple[str, ...]:
+        # the store is keyed by uuid, so it is not indexed
+        return tuple(sorted(self.filter_cls.get_indexed_keys() - {'uuid'}))
+
+    def _get_store_index(self) -> MockIndex[T_Entity]:
+        """Returns the index of the store, it is rebuilt if the store was changed outside of the repositories"""
+        if not isinstance(self._store, MockStore):
+            if self._dict_index is None:
+                self._dict_index = MockIndex(self._indexed_fields)
+                self._dict_index.rebuild(self._store.values())
+            return self._dict_index
+        index = self._store.indexes.get(self._indexed_fields)
+        if index is None:
+            index = self._store.indexes[self._indexed_fields] = MockIndex(self._indexed_fields)
+        if index.version != self._store.version:
+            index.rebuild(self._store.values())
+            index.version = self._store.version
+        return index
+
+    def _find_indexed(self, entity_filter: T_Filter) -> Optional[List[UUID]]:
+        """Returns uuids of the candidates matching the indexed `eq` and `in` conditions of the filter,
+        or None if the filter has no such conditions. The rest of the conditions are not checked.
+        """
+        indexed = entity_filter.get_indexed_keys()
+        values: Dict[str, Any] = {}
+        options: List[Tuple[str, Any]] = []
+        for field, operator, value in entity_filter.get_conditions():
+            if field in indexed and operator == 'eq':
+                values[field] = value
+            elif field in indexed and operator == 'in':
+                options.append((field, value))
+        if not values and not options:
+            return None
+        if 'uuid' in values:
+            uuid = values['uuid']
+            return [uuid] if uuid is not None else []
+
+        store_index, local_index = self._get_store_index(), self._local_index
+        # the stale candidates of the store index are dropped by the filter after merging with the journal
+        candidates: Optional[List[UUID]] = None
+        if values:
+            candidates = list(dict.fromkeys(store_index.find(values) + local_index.find(values)))
+        for field, field_options in options:
+            if field == 'uuid':
+                found = dict.fromkeys(field_options)
+            else:
+                found = dict.fromkeys(
+                    uuid
+                    for option in field_options
+                    for uuid in store_index.find({field: option}) + local_index.find({field: option})
+                )
+            candidates = list(found) if candidates is None else [uuid for uuid in candidates if uuid in found]
+        return candidates
+
+    def _iter_entities(self) -> Iterator[T_Entity]:
+        """Iterates the store merged with the journal of the session, without copies"""
+        for uuid, item in self._store.items():
+            if uuid not in self._local_removed_store:
+                yield self._local_store.get(uuid, item)
+        for uuid, item in self._local_store.items():
+            if uuid not in self._store:
+                yield item
+
     def apply_filter(
         self,
         item: T_Entity,
         entity_filter: T_Filter,
     ) -> bool:
-        result = True
-        excluded_keys = entity_filter.get_excluded_for_filter_keys()
-        for field in entity_filter.model_fields_set:
-            if field in excluded_keys:
-                continue
-            result &= getattr(item, field) == getattr(entity_filter, field)
-            if not result:
-                break
-        return result
+        return compile_filter(entity_filter.get_conditions())(item)
 
     def apply_order_by(
         self,
         items: list[T_Entity],
         entity_filter: Optional[T_Filter] = None,
+        limit: Optional[int] = None,
     ) -> Any:
+        """Orders the items by the filter, only the first `limit` items are ordered and returned if given"""
         if items and entity_filter and entity_filter.order_by is not None:
-            items = multikeysort(items, entity_filter.order_by)
+            items = multikeysort(items, entity_filter.order_by, limit=limit)
         return items
 
-    async def get(self, obj_id: int | str | UUID) -> Optional[T_Entity]:
+    def apply_keyset(
+        self,
+        items: list[T_Entity],
+        page: KeysetPage,
+        entity_filter: Optional[T_Filter] = None,
+    ) -> Any:
+        order_by = page.get_order_by(entity_filter.order_by if entity_filter else None)
+        return keyset_paginate(items, order_by, page.get_cursor_values(self.entity_cls, order_by), page.limit)
+
+    async def get(self, obj_id: int | str | UUID, fields: Optional[Sequence[str]] = None) -> Optional[T_Entity]:
         if not isinstance(obj_id, (int, str, UUID)):
             raise ValueError(f'Unsupported obj_id type: {type(obj_id)}')
+        if fields is not None:
+            self.entity_cls.check_fields(fields)
 
         if isinstance(obj_id, UUID):
-            entity = self._local_store.get(obj_id) or self._store.get(obj_id)
-        elif isinstance(obj_id, int):
-            entity_filter = self.filter_cls(id=obj_id)
-            entities = await self.list(LimitOffset(limit=1), entity_filter)
-            entity = entities[0] if entities else None
+            entity = self._get_entity(obj_id)
         else:
-            entity_filter = self.get_filter_for_get_str(obj_id)
-            entities = await self.list(LimitOffset(limit=1), entity_filter)
+            if isinstance(obj_id, int):
+                entity_filter = self.filter_cls(id=obj_id)
+            else:
+                entity_filter = self.get_filter_for_get_str(obj_id)
+            entities = self._find(entity_filter)
             entity = entities[0] if entities else None
         if entity is None:
             return None
-        return entity.model_copy(deep=True)
-
-    async def list(self, page: LimitOffset, entity_filter: Optional[T_Filter] = None) -> list[T_Entity]:
-        _store = {**self._store, **self._local_store}
-        results = list(_store.values())
-        if entity_filter is not None:
-            results = [item for item in _store.values() if self.apply_filter(item, entity_filter)]
-
+        return self._copy(entity, fields)
+
+    async def get_many(self, obj_ids: Sequence[int | UUID]) -> list[Optional[T_Entity]]:
+        results: list[Optional[T_Entity]] = []
+        for obj_id in obj_ids:
+            if isinstance(obj_id, UUID):
+                entity = self._get_entity(obj_id)
+            elif isinstance(obj_id, int):
+                entities = self._find(self.filter_cls(id=obj_id))
+                entity = entities[0] if entities else None
+            else:
+                raise ValueError(f'Unsupported obj_id type: {type(obj_id)}')
+            results.append(self._copy(entity) if entity is not None else None)
+        return results
+
+    def _find(self, entity_filter: Optional[T_Filter] = None) -> list[T_Entity]:
+        if entity_filter is None:
+            return list(self._iter_entities())
+        predicate = compile_filter(entity_filter.get_conditions())
+        if (uuids := self._find_indexed(entity_filter)) is not None:
+            items = (self._get_entity(uuid) for uuid in uuids)
+            return [item for item in items if item is not None and predicate(item)]
+        return [item for item in self._iter_entities() if predicate(item)]
+
+    async def list(
+        self, page: Page, entity_filter: Optional[T_Filter] = None, fields: Optional[Sequence[str]] = None
+    ) -> list[T_Entity]:
+        return self._paginate(self._find(entity_filter), page, entity_filter, fields)
+
+    async def list_with_count(
+        self, page: Page, entity_filter: Optional[T_Filter] = None, fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[T_Entity], int]:
+        results = self._find(entity_filter)
+        return self._paginate(results, page, entity_filter, fields), len(results)
+
+    def _paginate(
+        self,
+        results: List[T_Entity],
+        page: Page,
+        entity_filter: Optional[T_Filter] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[T_Entity]:
+        if fields is not None:
+            self.entity_cls.check_fields(fields)
+        if isinstance(page, KeysetPage):
+            return [self._copy(item, fields) for item in self.apply_keyset(results, page, entity_filter)]
+
+        results = self.apply_order_by(results, entity_filter, page.offset + page.limit if page.limit > 0 else None)
         if page.offset > 0:
             results = results[page.offset :]  # noqa: E203
         if page.limit > 0:
             results = results[: page.limit]
-        return self.apply_order_by([item.model_copy(deep=True) for item in results], entity_filter)
+        return [self._copy(item, fields) for item in results]
+
+    async def iter(
+        self,
+        entity_filter: Optional[T_Filter] = None,
+        batch_size: int = 1000,
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T_Entity]:
+        if fields is not None:
+            self.entity_cls.check_fields(fields)
+        # only references are collected, the entities are copied lazily
+        items = self.apply_order_by(self._find(entity_filter), entity_filter)
+        for i, item in enumerate(items, start=1):
+            yield self._copy(item, fields)
+            if i % batch_size == 0:
+                await asyncio.sleep(0)
 
     async def count(self, entity_filter: Optional[T_Filter] = None) -> int:
-        _store = {**self._store, **self._local_store}
         if not entity_filter:
-            return len(_store.values())
-        cnt = 0
-        for item in _store.values():
-            if self.apply_filter(item, entity_filter):
-                cnt += 1
-        return cnt
+            return sum(1 for _ in self._iter_entities())
+        return len(self._find(entity_filter))
+
+    def _put(self, entity: T_Entity) -> None:
+        if (old := self._local_store.get(entity.uuid)) is not None:
+            self._local_index.remove(old)
+        self._local_store[entity.uuid] = entity
+        self._local_index.add(entity)
+        self._local_removed_store.pop(entity.uuid, None)
 
     async def add(self, entity: T_Entity) -> T_Entity:
         entity.id = _get_id()
-        if entity.uuid in self._local_store:
+        if self._get_entity(entity.uuid) is not None:
             raise self.already_exists_err(f'{self.entity_cls.__name__} already exists: {entity.uuid}')
-        self._local_store[entity.uuid] = entity
+        self._put(entity)
 
         result = await self.get(entity.uuid)
         if result is None:
@@ -115,60 +358,128 @@ class MockGenericRepo(BaseMockStore[T_Entity], BaseRepo[T_Entity, T_Filter]):
 
         return result
 
+    async def add_many(self, entities: Sequence[T_Entity], chunk_size: Optional[int] = None) -> List[T_Entity]:
+        seen: set[UUID] = set()
+        for entity in entities:
+            if entity.uuid in seen or self._get_entity(entity.uuid) is not None:
+                raise self.already_exists_err(f'{self.entity_cls.__name__} already exists: {entity.uuid}')
+            seen.add(entity.uuid)
+
+        results: List[T_Entity] = []
+        for entity in entities:
+            entity.id = _get_id()
+            self._put(entity)
+            results.append(self._copy(entity))
+        return results
+
     async def update(
         self, entity: T_Entity, entity_filter: Optional[T_Filter] = None, model_dump: Optional[dict[str, Any]] = None
     ) -> int:
         model_dump = model_dump or {'exclude': {'id', 'uuid'}}
 
-        entity_filter = entity_filter or self.filter_cls()
-        entities = await self.list(LimitOffset().inf, entity_filter.model_copy(update={'uuid': entity.uuid}))
-        if not entities:
-            return 0
-
-        _store = {**self._store, **self._local_store}
-        if entity.uuid not in _store:
+        item = self._get_entity(entity.uuid)
+        if item is None or entity_filter is not None and not self.apply_filter(item, entity_filter):
             return 0
 
-        self._local_store[entity.uuid] = _store[entity.uuid].model_copy(update=entity.model_dump(**model_dump))
+        self._put(item.model_copy(update=entity.model_dump(**model_dump)))
 
         return 1
 
+    async def update_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
+
+        updated = 0
+        for entity in entities:
+            if (item := self._get_entity(entity.uuid)) is None:
+                continue
+            self._put(item.model_copy(update=entity.model_dump(**model_dump)))
+            updated += 1
+        return updated
+
+    async def upsert_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[T_Entity]:
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
+
+        results: List[T_Entity] = []
+        for entity in entities:
+            if (existing := self._get_entity(entity.uuid)) is not None:
+                item = existing.model_copy(update=entity.model_dump(**model_dump))
+            else:
+                item = entity
+                item.id = _get_id()
+            self._put(item)
+            results.append(self._copy(item))
+        return results
+
     async def update_by_filter(self, entity_filter: T_Filter, values: dict[str, Any]) -> int:
-        entities = await self.list(LimitOffset().inf, entity_filter)
-        _store = {**self._store, **self._local_store}
+        entities = self._find(entity_filter)
 
         for entity in entities:
-            self._local_store[entity.uuid] = _store[entity.uuid].model_copy(update=values)
+            self._put(entity.model_copy(update=values))
 
         return len(entities)
 
     async def remove(self, entity_filter: T_Filter) -> int:
-        entities = await self.list(LimitOffset().inf, entity_filter)
+        entities = self._find(entity_filter)
 
         for entity in entities:
-            self._local_removed_store[entity.uuid] = self._local_store.pop(entity.uuid)
+            if (local := self._local_store.pop(entity.uuid, None)) is not None:
+                self._local_index.remove(local)
+            self._local_removed_store[entity.uuid] = entity
 
         return len(entities)
 
     async def commit(self) -> None:
-        self._store.update(self._local_store)
+        if self._checkpoints:
+            return
+        index = self._get_store_index()
         for uuid in self._local_removed_store:
-            self._store.pop(uuid)
-        self._local_store = deepcopy(self._store)
-        self._local_removed_store = {}
+            if (old := self._store.pop(uuid, None)) is not None:
+                index.remove(old)
+        for uuid, entity in self._local_store.items():
+            if (old := self._store.get(uuid)) is not None:
+                index.remove(old)
+            self._store[uuid] = entity
+            index.add(entity)
+        if isinstance(self._store, MockStore):
+            index.version = self._store.version
+        self._local_store.clear()
+        self._local_removed_store.clear()
+        self._local_index.rebuild(())
         await asyncio.sleep(0.001)  # simulating an async delay
 
     async def __aenter__(self: _T) -> _T:
-        await self._lock.acquire()
         if hasattr(self, '_local_store'):
-            raise RuntimeError('Already in a session')
-        self._local_store: Dict[UUID, T_Entity] = deepcopy(self._store)
-        self._local_removed_store: Dict[UUID, T_Entity] = {}
+            self._checkpoints = (*self._checkpoints, (dict(self._local_store), dict(self._local_removed_store)))
+            return self
+        self._local_store = {}
+        self._local_removed_store = {}
+        self._local_index = MockIndex(self._indexed_fields)
+        self._checkpoints = ()
+        if not isinstance(self._store, MockStore):
+            self._dict_index = None
         return self
 
     async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
-        try:
-            del self._local_store
-            del self._local_removed_store
-        finally:
-            self._lock.release()
+        if self._checkpoints:
+            self._checkpoints, (local_store, local_removed_store) = self._checkpoints[:-1], self._checkpoints[-1]
+            if exc_type is not None:
+                self._local_store.clear()
+                self._local_store.update(local_store)
+                self._local_removed_store.clear()
+                self._local_removed_store.update(local_removed_store)
+                self._local_index.rebuild(local_store.values())
+            return
+        del self._local_store
+        del self._local_removed_store
+        del self._local_index
+        del self._checkpoints
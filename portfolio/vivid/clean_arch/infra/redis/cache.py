@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Optional, Sequence
+
+from redis.asyncio.client import Redis
+
+from clean_arch.application.caching import CacheBackend, CacheStats
+from clean_arch.utils.batching import chunked
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared by the processes, the keys are `{prefix}:{key}`, the tags are sets `{prefix}:tag:{tag}`.
+    Expiration and eviction are done by Redis, so they are not counted in `stats.evictions`.
+
+    example:
+        repo = CachedRepo(SQLExampleRepo(session_factory), RedisCacheBackend(client), ttl=60)
+    """
+
+    def __init__(self, client: Redis, prefix: str = 'cache') -> None:
+        self._client = client
+        self._prefix = prefix
+        self.stats = CacheStats()
+
+    async def get_many(self, keys: Sequence[str]) -> list[Optional[Any]]:
+        values = await self._client.mget([f'{self._prefix}:{key}' for key in keys])
+        return [json.loads(value) if value is not None else None for value in values]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tag: Optional[str] = None) -> None:
+        px = math.ceil(ttl * 1000) if ttl is not None else None
+        if tag is None:
+            await self._client.set(f'{self._prefix}:{key}', json.dumps(value), px=px)
+            return
+        pipeline = self._client.pipeline(transaction=False)
+        await pipeline.set(f'{self._prefix}:{key}', json.dumps(value), px=px)
+        await pipeline.sadd(self._tag_key(tag), f'{self._prefix}:{key}')
+        if px is not None:
+            # the keys of a tag are set with the same ttl, so the set expires with the last of them
+            await pipeline.pexpire(self._tag_key(tag), px)
+        await pipeline.execute()
+
+    async def add(self, key: str, value: Any) -> bool:
+        return bool(await self._client.set(f'{self._prefix}:{key}', json.dumps(value), nx=True))
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        if keys:
+            await self._client.delete(*[f'{self._prefix}:{key}' for key in keys])
+
+    async def delete_tag(self, tag: str) -> None:
+        keys = [key async for key in self._client.sscan_iter(self._tag_key(tag), count=1000)]
+        for chunk in chunked(keys, 1000):
+            await self._client.delete(*chunk)
+        await self._client.delete(self._tag_key(tag))
+
+    def _tag_key(self, tag: str) -> str:
+        return f'{self._prefix}:tag:{tag}'
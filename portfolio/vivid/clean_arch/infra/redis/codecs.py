@@ -0,0 +1,145 @@
+"""
+Wire formats of the entities stored by the Redis repositories, the format of the values is described in README.md.
+"""
+from __future__ import annotations
+
+import importlib
+import json
+import zlib
+from typing import Any, Callable, Optional
+
+_HEADER = 0x80
+_HEADER_MASK = 0xF0
+
+_SERIALIZER_IDS = {'json': 0, 'orjson': 0, 'msgpack': 1}
+_COMPRESSION_IDS = {None: 0, 'zlib': 1, 'zstd': 2, 'lz4': 3}
+_PACKAGES = {'orjson': 'orjson', 'msgpack': 'msgpack', 'zstandard': 'zstandard', 'lz4.frame': 'lz4'}
+
+
+def _import(module: str) -> Any:
+    try:
+        return importlib.import_module(module)
+    except ImportError as err:
+        package = _PACKAGES[module]
+        raise RuntimeError(f'{package} is not installed. Install {package} to use it in the codec.') from err
+
+
+def _get_dumps(serializer: str) -> Callable[[Any], bytes | str]:
+    if serializer == 'json':
+        return json.dumps
+    if serializer == 'orjson':
+        return _import('orjson').dumps
+    if serializer == 'msgpack':
+        return _import('msgpack').packb
+    raise ValueError(f'Unknown serializer: {serializer}')
+
+
+def _get_compress(compression: str) -> Callable[[bytes], bytes]:
+    if compression == 'zlib':
+        return zlib.compress
+    if compression == 'zstd':
+        return _import('zstandard').compress
+    if compression == 'lz4':
+        return _import('lz4.frame').compress
+    raise ValueError(f'Unknown compression: {compression}')
+
+
+def _decompress(compression_id: int, body: bytes) -> bytes:
+    if compression_id == 0:
+        return body
+    if compression_id == 1:
+        return zlib.decompress(body)
+    if compression_id == 2:
+        return _import('zstandard').decompress(body)
+    return _import('lz4.frame').decompress(body)
+
+
+_loads_json: Callable[[bytes | str], Any]
+try:
+    import orjson
+
+    _loads_json = orjson.loads
+except ImportError:
+    _loads_json = json.loads
+
+
+class Codec:
+    """Encodes the json dumps of the entities: `serializer` is 'json', 'orjson' or 'msgpack',
+    `compression` is None, 'zlib', 'zstd' or 'lz4', the values shorter than `compress_min_size` bytes aren't compressed.
+
+    >>> codec = Codec(compression='zlib', compress_min_size=64)
+    >>> codec.encode({'name': 'a'})
+    '{"name": "a"}'
+    >>> value = codec.encode({'name': 'a' * 100})
+    >>> hex(value[0]), len(value), decode(value) == {'name': 'a' * 100}
+    ('0x84', 24, True)
+    """
+
+    def __init__(self, serializer: str = 'json', compression: Optional[str] = None, compress_min_size: int = 1024):
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_min_size = compress_min_size
+        self._dumps = _get_dumps(serializer)
+        self._compress = _get_compress(compression) if compression is not None else None
+        serializer_id = _SERIALIZER_IDS[serializer]
+        self._header = bytes((_HEADER | _COMPRESSION_IDS[compression] << 2 | serializer_id,))
+        self._plain_header = bytes((_HEADER | serializer_id,)) if serializer_id else b''
+
+    @property
+    def script_readable(self) -> bool:
+        """Whether the values are plain JSON readable by the Lua scripts"""
+        return self.serializer != 'msgpack' and self.compression is None
+
+    @property
+    def binary(self) -> bool:
+        """Whether the values are not text, so they can't be read by the clients with `decode_responses`"""
+        return not self.script_readable
+
+    def encode(self, data: Any) -> bytes | str:
+        value = self._dumps(data)
+        if self._compress is not None and len(value) >= self.compress_min_size:
+            body = value.encode() if isinstance(value, str) else value
+            return self._header + self._compress(body)
+        if self._plain_header and isinstance(value, bytes):
+            return self._plain_header + value
+        return value
+
+    def __repr__(self) -> str:
+        return (
+            f'{self.__class__.__name__}({self.serializer!r}, compression={self.compression!r}, '
+            f'compress_min_size={self.compress_min_size})'
+        )
+
+
+def _split(value: bytes) -> tuple[int, bytes]:
+    """Returns the serializer id and the decompressed body of a value with the header"""
+    header = value[0]
+    if header & _HEADER_MASK != _HEADER or header & 0b11 > 1:
+        raise ValueError(f'Unknown codec header: {header:#x}')
+    return header & 0b11, _decompress(header >> 2 & 0b11, value[1:])
+
+
+def decode(value: bytes | str) -> Any:
+    """Decodes a value written by any of the codecs
+
+    >>> decode('{"id": 1}'), decode(b'{"id": 1}')
+    ({'id': 1}, {'id': 1})
+    """
+    if isinstance(value, str) or not value or value[0] < _HEADER:
+        return _loads_json(value)
+    serializer_id, body = _split(value)
+    if serializer_id == 1:
+        return _import('msgpack').unpackb(body)
+    return _loads_json(body)
+
+
+def json_body(value: bytes | str) -> Optional[bytes | str]:
+    """Returns the JSON text of a value, None if the value is not JSON
+
+    >>> json_body(Codec(compression='zlib', compress_min_size=0).encode({'id': 1}))
+    b'{"id": 1}'
+    """
+    if isinstance(value, str) or not value or value[0] < _HEADER:
+        return value
+    serializer_id, body = _split(value)
+    return body if serializer_id == 0 else None
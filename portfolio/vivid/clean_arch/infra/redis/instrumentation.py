@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any
+
+from redis.asyncio.client import Redis
+
+from clean_arch.application.instrumentation import count_round_trip
+
+
+def count_redis_round_trips(client: Redis) -> None:
+    """Counts the commands and the pipelines sent by the client as the round trips of the instrumented calls.
+
+    The connections of the pool are replaced by a subclass counting the sent packets,
+    so the connections opened before the call are not counted.
+    """
+    pool = client.connection_pool
+    connection_cls: Any = pool.connection_class
+    if getattr(connection_cls, 'counts_round_trips', False):
+        return
+
+    class RoundTripCountingConnection(connection_cls):
+        counts_round_trips = True
+
+        async def send_packed_command(self, *args: Any, **kwargs: Any) -> None:
+            count_round_trip()
+            await super().send_packed_command(*args, **kwargs)
+
+    RoundTripCountingConnection.__name__ = f'RoundTripCounting{connection_cls.__name__}'
+    pool.connection_class = RoundTripCountingConnection
@@ -1,143 +1,718 @@
 from __future__ import annotations
 
-import asyncio
 import json
-from typing import Any, Optional, Type, TypeVar
+from itertools import chain
+from typing import Any, AsyncIterator, List, Optional, Sequence, Type, TypeVar
 from uuid import UUID
 
 from redis.asyncio.client import Pipeline, Redis
+from redis.commands.core import AsyncScript
 
 from clean_arch.application.repositories import BaseRepo, ContextManagerRepo, T_Entity, T_Filter
-from clean_arch.domain.entities import LimitOffset
+from clean_arch.domain.entities import KeysetPage, LimitOffset, Page
 from clean_arch.domain.exceptions import DomainException
-from clean_arch.utils.sort import multikeysort
+from clean_arch.infra.redis.codecs import Codec, decode, json_body
+from clean_arch.infra.redis.ids import RedisIdAllocator
+from clean_arch.infra.redis.scripts import FILTER_SCRIPT, HASH_ADD_SCRIPT, HASH_FILTER_SCRIPT, HASH_UPDATE_SCRIPT
+from clean_arch.utils.batching import chunked
+from clean_arch.utils.context import TaskLocal
+from clean_arch.utils.filters import Condition, compile_filter
+from clean_arch.utils.sort import keyset_paginate, multikeysort, parse_order_by
+from clean_arch.utils.validation import Hydration, get_list_adapter
 
 _T = TypeVar('_T', bound='RedisRepo')
 
 
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _decode_all(values: Sequence[Any]) -> list[str]:
+    """Decodes the members returned by the sorted set commands, typed as unions of their options"""
+    return [_decode(value) for value in values]
+
+
+def _encode(value: bytes | str) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+
+def _hash_to_json(mapping: dict[str, bytes | str]) -> bytes:
+    """Joins the json values of the fields of a hash into a json object, the fields are names of attributes"""
+    return b'{' + b','.join(b'"%s":%s' % (field.encode(), _encode(value)) for field, value in mapping.items()) + b'}'
+
+
+_SCORE_BOUNDS = {'gt': (0, True), 'gte': (0, False), 'lt': (1, True), 'lte': (1, False)}
+"""Position of the bound in ZRANGEBYSCORE and whether it is exclusive, by operator"""
+
+
+def _is_scalar(value: Any) -> bool:
+    return not isinstance(value, (list, dict))
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_script_condition(field: str, operator: str, value: Any) -> bool:
+    """Lua compares the strings by the locale, so only the numbers are compared by the script"""
+    if operator in ('gt', 'gte', 'lt', 'lte'):
+        return _is_number(value)
+    if operator == 'in':
+        return all(_is_scalar(option) for option in value)
+    return _is_scalar(value)
+
+
 class RedisRepo(ContextManagerRepo):
+    """Every asyncio task has its own session pipeline, a nested context reuses the pipeline of the outer one"""
+
     _client: Redis
-    _pipeline: Pipeline
+    _session_pipeline = TaskLocal[Pipeline]()
 
-    def __init__(self, client: Redis, prefix: str = '', ttl: Optional[int] = None):
+    _overlay = TaskLocal[dict[str, Any]](default_factory=dict)
+    """The values of the keys written in the current session, the writes are sent on commit"""
+
+    _created = TaskLocal[dict[str, tuple[int, int]]](default_factory=dict)
+    """The keys of the entities added in the current session: the position of SET NX in the pipeline and the id"""
+
+    _checkpoints = TaskLocal[tuple[tuple[int, dict[str, Any], dict[str, tuple[int, int]]], ...]](default_factory=tuple)
+    """The pipeline length and the writes of the session at the start of every nested context,
+    a tuple rebound on change, so the tasks started inside a block don't change the checkpoints of their parent
+    """
+
+    def __init__(self, client: Redis, prefix: str = '', ttl: Optional[int] = None, id_block_size: int = 1):
+        """`id_block_size` is the number of ids reserved at once by the process, see `RedisIdAllocator`"""
         self._client = client
-        self._lock = asyncio.Lock()
         self._prefix = prefix or self.__class__.__name__
         self._ttl = ttl
+        self._ids = RedisIdAllocator(client, f'{self._prefix}:id', block_size=id_block_size)
+        self._scripts: dict[str, AsyncScript] = {}
+
+    @property
+    def _pipeline(self) -> Pipeline:
+        """The pipeline of the current session, the writes outside of a session raise RuntimeError"""
+        try:
+            return self._session_pipeline
+        except AttributeError:
+            raise RuntimeError('Not in a session') from None
 
     async def commit(self) -> None:
-        await self._pipeline.execute()
+        if self._checkpoints:
+            return
+        await self._execute()
+
+    async def _execute(self) -> list[Any]:
+        """Sends the writes of the session in a single MULTI/EXEC"""
+        try:
+            return await self._pipeline.execute()
+        finally:
+            self._clear_writes()
+
+    async def _discard(self) -> None:
+        await self._pipeline.reset()
+        self._clear_writes()
+
+    def _clear_writes(self) -> None:
+        self._overlay.clear()
+        self._created.clear()
+
+    async def _mget(self, keys: Sequence[bytes | str]) -> list[Any]:
+        """MGET that sees the writes of the current session"""
+        names = [_decode(key) for key in keys]
+        remote = [key for key in names if key not in self._overlay]
+        values = iter(await self._client.mget(remote) if remote else ())
+        return [self._overlay[key] if key in self._overlay else next(values) for key in names]
+
+    async def _set(self, key: str, value: Any, **kwargs: Any) -> None:
+        """Queues SET to the session pipeline"""
+        await self._pipeline.set(key, value, ex=self._ttl, **kwargs)
+        self._overlay[key] = value
 
     async def _get_id(self) -> int:
-        async with self._client.lock(f'{self._prefix}:id:lock', timeout=5):
-            return await self._client.incr(f'{self._prefix}:id', amount=1)
+        return await self._ids.get_id()
+
+    async def _get_ids(self, amount: int) -> list[int]:
+        return await self._ids.get_ids(amount)
+
+    def _get_script(self, source: str) -> AsyncScript:
+        if source not in self._scripts:
+            self._scripts[source] = self._client.register_script(source)
+        return self._scripts[source]
+
+    def _rollback_to(self, position: int, overlay: dict[str, Any], created: dict[str, tuple[int, int]]) -> None:
+        del self._pipeline.command_stack[position:]
+        # mutated in place, so the tasks started by the session see the same writes
+        self._overlay.clear()
+        self._overlay.update(overlay)
+        self._created.clear()
+        self._created.update(created)
 
     async def __aenter__(self: _T) -> _T:
-        await self._lock.acquire()
-        if hasattr(self, '_pipeline'):
-            raise RuntimeError('Already in a session')
-        self._pipeline = self._client.pipeline()
+        if hasattr(self, '_session_pipeline'):
+            self._checkpoints = (*self._checkpoints, (len(self._pipeline), dict(self._overlay), dict(self._created)))
+            return self
+        self._session_pipeline = self._client.pipeline()
+        self._overlay = {}
+        self._created = {}
+        self._checkpoints = ()
         return self
 
     async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self._checkpoints:
+            self._checkpoints, checkpoint = self._checkpoints[:-1], self._checkpoints[-1]
+            if exc_type is not None:
+                self._rollback_to(*checkpoint)
+            return
         try:
             await self._pipeline.__aexit__(exc_type, exc, tb)
-            del self._pipeline
         finally:
-            self._lock.release()
+            del self._session_pipeline
+            del self._overlay
+            del self._created
+            del self._checkpoints
 
 
 class RedisGenericSimpleRepo(RedisRepo, BaseRepo[T_Entity, T_Filter]):
     """Implementation of a generic repository for Redis that uses only simple commands.
-    This implementation lacks of integrity compared to SQL."""
+    This implementation lacks of integrity compared to SQL. The indexes, the sessions and the migration
+    of the stored entities are described in README.md.
+
+    example:
+        class RedisExampleRepo(RedisGenericSimpleRepo[ExampleEntity, ExampleEntityFilter]):
+            entity_cls = ExampleEntity
+            filter_cls = ExampleEntityFilter
+            already_exists_err = ExampleEntityAlreadyExists
+            indexed_fields = ('status', 'lang')
+            sorted_indexed_fields = ('rating',)
+    """
 
     entity_cls: Type[T_Entity]
     filter_cls: Type[T_Filter]
     already_exists_err: Type[DomainException]
 
+    indexed_fields: tuple[str, ...] = ()
+    """Fields indexed by sets of uuids `{prefix}:idx:{field}:{value}`"""
+
+    sorted_indexed_fields: tuple[str, ...] = ()
+    """Numeric fields indexed by sorted sets of uuids `{prefix}:zidx:{field}` scored by the value"""
+
+    bulk_chunk_size: int = 1000
+    """Max number of keys fetched by a single MGET and ids reserved at once by the bulk methods"""
+
+    hydration: Hydration = Hydration.VALIDATE
+    """How `models_validate` builds the entities of the documents, `CONSTRUCT` works like `BATCH`"""
+
+    codec: Codec = Codec()
+    """Wire format of the entities, plain JSON by default, the binary codecs need a client without `decode_responses`"""
+
+    server_side_filter: bool = False
+    """Evaluate the filters by a Lua script inside Redis, so only the matching entities are sent over the wire"""
+
+    _filter_script: str = FILTER_SCRIPT
+    """Lua script of `server_side_filter` for the format of the stored entities"""
+
+    _ids_built: bool = False
+    """Whether the sorted set of the ids is known to have all the stored entities"""
+
+    def __init__(self, client: Redis, prefix: str = '', ttl: Optional[int] = None, id_block_size: int = 1):
+        super().__init__(client, prefix, ttl, id_block_size)
+        if self.codec.binary and client.get_connection_kwargs().get('decode_responses'):
+            raise ValueError(f'{self.codec!r} writes binary values, the client must not decode the responses')
+
     def apply_filter(
         self,
         item: T_Entity,
         entity_filter: T_Filter,
     ) -> bool:
-        result = True
-        excluded_keys = entity_filter.get_excluded_for_filter_keys()
-        for field in entity_filter.model_fields_set:
-            if field in excluded_keys:
-                continue
-            result &= getattr(item, field) == getattr(entity_filter, field)
-            if not result:
-                break
-        return result
+        return compile_filter(entity_filter.get_conditions())(item)
 
     def apply_order_by(
         self,
         items: list[T_Entity],
         entity_filter: Optional[T_Filter] = None,
+        limit: Optional[int] = None,
     ) -> Any:
+        """Orders the items by the filter, only the first `limit` items are ordered and returned if given"""
         if items and entity_filter and entity_filter.order_by is not None:
-            items = multikeysort(items, entity_filter.order_by)
+            items = multikeysort(items, entity_filter.order_by, limit=limit)
         return items
 
+    def apply_keyset(
+        self,
+        items: list[T_Entity],
+        page: KeysetPage,
+        entity_filter: Optional[T_Filter] = None,
+    ) -> Any:
+        order_by = page.get_order_by(entity_filter.order_by if entity_filter else None)
+        return keyset_paginate(items, order_by, page.get_cursor_values(self.entity_cls, order_by), page.limit)
+
+    def paginate(self, items: list[T_Entity], page: Page, entity_filter: Optional[T_Filter] = None) -> list[T_Entity]:
+        if isinstance(page, KeysetPage):
+            return self.apply_keyset(items, page, entity_filter)
+        items = self.apply_order_by(items, entity_filter, page.offset + page.limit if page.limit > 0 else None)
+        if page.offset > 0:
+            items = items[page.offset :]  # noqa: E203
+        if page.limit > 0:
+            items = items[: page.limit]
+        return items
+
+    def is_entity_key(self, key: bytes | str) -> bool:
+        """Entity keys are `{prefix}:{uuid}`, the rest of the keys under the prefix are service ones"""
+        if isinstance(key, bytes):
+            key = key.decode()
+        suffix = key[len(self._prefix) + 1 :]  # noqa: E203
+        return ':' not in suffix and suffix not in ('id', 'ids')
+
+    async def _scan_entity_keys(self) -> list[bytes | str]:
+        return [key async for key in self._client.scan_iter(match=f'{self._prefix}:*') if self.is_entity_key(key)]
+
+    def _get_script_conditions(self, entity_filter: Optional[T_Filter]) -> Optional[list[Condition]]:
+        """Returns the conditions of the filter evaluated by the Lua script, None if the script should not be used"""
+        if not self.server_side_filter or not self.codec.script_readable or entity_filter is None:
+            return None
+        conditions = [
+            condition for condition in entity_filter.get_conditions(mode='json') if _is_script_condition(*condition)
+        ]
+        return conditions or None
+
+    async def _get_by_keys(
+        self,
+        keys: Sequence[bytes | str],
+        entity_filter: Optional[T_Filter] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T_Entity]:
+        conditions = self._get_script_conditions(entity_filter)
+        remote, pending = self._split_pending(keys)
+        results: list[T_Entity] = []
+        for chunk in chunked(remote, self.bulk_chunk_size):
+            if conditions is not None:
+                datas = await self._get_script(self._filter_script)(keys=chunk, args=[json.dumps(conditions), 'list'])
+            else:
+                datas = await self._client.mget(chunk)
+            results.extend(await self._validate_filtered(datas, entity_filter, fields))
+        results.extend(await self._validate_filtered([self._overlay[key] for key in pending], entity_filter, fields))
+        return results
+
+    async def _validate_filtered(
+        self, datas: Sequence[Any], entity_filter: Optional[T_Filter], fields: Optional[Sequence[str]] = None
+    ) -> list[T_Entity]:
+        """Validates the entities matching the filter, only the `fields` of them if given"""
+        datas = [data for data in datas if data is not None]
+        if fields is None:
+            items = await self.models_validate(datas)
+        else:
+            items = [self._validate_fields(data, fields) for data in datas]
+        if entity_filter is None:
+            return items
+        predicate = compile_filter(entity_filter.get_conditions())
+        return [item for item in items if predicate(item)]
+
+    def _validate_fields(self, data: str | bytes | dict[Any, Any], fields: Sequence[str]) -> T_Entity:
+        """Validates the `fields` of the stored entity into a partial entity, the rest of the json is not validated"""
+        return self.entity_cls.model_validate_fields(decode(data) if isinstance(data, (str, bytes)) else data, fields)
+
+    def _get_loaded_fields(
+        self, entity_filter: Optional[T_Filter], fields: Optional[Sequence[str]]
+    ) -> Optional[list[str]]:
+        """Returns the fields validated to get the `fields` of the entities:
+        the `fields`, the fields of the conditions and the ordering of the filter, and `id`
+        """
+        if fields is None:
+            return None
+        self.entity_cls.check_fields(fields)
+        loaded = dict.fromkeys([*fields, 'id'])
+        if entity_filter is not None:
+            loaded.update(dict.fromkeys(field for field, _, _ in entity_filter.get_conditions()))
+            if entity_filter.order_by:
+                loaded.update(dict.fromkeys(name for name, _ in parse_order_by(entity_filter.order_by)))
+        return list(loaded)
+
+    def _project(self, items: list[T_Entity], fields: Optional[Sequence[str]]) -> list[T_Entity]:
+        """Drops the fields loaded for the filter and the ordering from the partial entities"""
+        if fields is None:
+            return items
+        keep = set(fields)
+        projected: list[T_Entity] = []
+        for item in items:
+            if item.model_fields_set != keep:
+                item = self.entity_cls.model_construct_fields({field: getattr(item, field) for field in fields})
+            projected.append(item)
+        return projected
+
+    async def _read(self, keys: Sequence[bytes | str], fields: Optional[Sequence[str]] = None) -> list[Any]:
+        """Returns the stored values of the entity keys seen by the current session, None for the missing ones.
+        The whole values are read, `fields` are the ones needed by the caller.
+        """
+        return await self._mget(keys)
+
+    def _split_pending(self, keys: Sequence[bytes | str]) -> tuple[list[str], list[str]]:
+        """Splits the keys into the stored ones and the ones written in the current session"""
+        remote: list[str] = []
+        pending: list[str] = []
+        for key in keys:
+            key = _decode(key)
+            (pending if key in self._overlay else remote).append(key)
+        return remote, pending
+
+    def _pending_keys(self, keys: Sequence[bytes | str] = ()) -> list[str]:
+        """Returns the keys of the entities written in the current session except the given ones"""
+        known = {_decode(key) for key in keys}
+        return [key for key in self._overlay if self.is_entity_key(key) and key not in known]
+
+    @property
+    def _ids_key(self) -> str:
+        return f'{self._prefix}:ids'
+
+    async def _build_ids(self) -> None:
+        """Indexes the entities stored before the sorted set of the ids was maintained, once per prefix"""
+        if self._ids_built:
+            return
+        if not await self._client.exists(f'{self._ids_key}:built'):
+            await self.rebuild_indexes()
+            await self._client.set(f'{self._ids_key}:built', 1)
+        self._ids_built = True
+
+    async def _queue_ids_built(self, obj_id: int) -> None:
+        """The first id of the counter is added by a version maintaining the sorted set of the ids from the start"""
+        if obj_id == 1:
+            await self._pipeline.set(f'{self._ids_key}:built', 1)
+
+    def _index_key(self, field: str, value: Any) -> str:
+        return f'{self._prefix}:idx:{field}:{json.dumps(value)}'
+
+    def _sorted_index_key(self, field: str) -> str:
+        return f'{self._prefix}:zidx:{field}'
+
+    async def _reindex(
+        self,
+        pipeline: Pipeline,
+        uuid: UUID | str,
+        old: Optional[dict[str, Any]],
+        new: Optional[dict[str, Any]],
+    ) -> None:
+        """Queues updates of the indexes of an entity to the pipeline.
+        `old` and `new` are json dumps of the entity, None for a new and a removed entity respectively.
+        """
+        member = str(uuid)
+        if old is None and new is not None:
+            # NX keeps the id of an existing entity if the new one turns out to be a duplicate
+            await pipeline.zadd(self._ids_key, {member: new['id']}, nx=True)
+        elif new is None and old is not None:
+            await pipeline.zrem(self._ids_key, member)
+
+        for field in self.indexed_fields:
+            if old is not None and new is not None and old.get(field) == new.get(field):
+                continue
+            if old is not None:
+                await pipeline.srem(self._index_key(field, old.get(field)), member)
+            if new is not None:
+                await pipeline.sadd(self._index_key(field, new.get(field)), member)
+
+        for field in self.sorted_indexed_fields:
+            if old is not None and new is not None and old.get(field) == new.get(field):
+                continue
+            if new is not None and new.get(field) is not None:
+                await pipeline.zadd(self._sorted_index_key(field), {member: float(new[field])})
+            elif old is not None:
+                await pipeline.zrem(self._sorted_index_key(field), member)
+
+    async def _find_page(self, page: Page, entity_filter: Optional[T_Filter] = None) -> Optional[list[str]]:
+        """Returns ordered uuids of the page using the sorted sets, or None if the page can't be served by them:
+        a filter with conditions or ttl, unsent writes, other orders or a field with null values
+        """
+        if self._ttl is not None or self._overlay:
+            return None
+        if entity_filter is not None and entity_filter.model_fields_set - entity_filter.get_excluded_for_filter_keys():
+            return None
+
+        order_by = parse_order_by(entity_filter.order_by) if entity_filter and entity_filter.order_by else []
+        if len(order_by) > 1:
+            return None
+        field, descending = order_by[0] if order_by else ('id', False)
+        if field != 'id' and field not in self.sorted_indexed_fields:
+            return None
+        await self._build_ids()
+
+        members: list[Any]
+        if isinstance(page, KeysetPage):
+            if field != 'id':
+                return None
+            values = page.get_cursor_values(
+                self.entity_cls, page.get_order_by(entity_filter.order_by if entity_filter else None)
+            )
+            bound = f'({values[0]}' if values is not None else ('-inf' if not descending else '+inf')
+            start, num = (0, page.limit) if page.limit > 0 else (None, None)
+            if descending:
+                members = await self._client.zrevrangebyscore(self._ids_key, bound, '-inf', start=start, num=num)
+            else:
+                members = await self._client.zrangebyscore(self._ids_key, bound, '+inf', start=start, num=num)
+        else:
+            end = page.offset + page.limit - 1 if page.limit > 0 else -1
+            if field == 'id':
+                members = await self._client.zrange(self._ids_key, page.offset, end, desc=descending)
+            elif field in self.sorted_indexed_fields:
+                pipeline = self._client.pipeline(transaction=False)
+                await pipeline.zrange(self._sorted_index_key(field), page.offset, end, desc=descending)
+                await pipeline.zcard(self._sorted_index_key(field))
+                await pipeline.zcard(self._ids_key)
+                members, indexed, total = await pipeline.execute()
+                if indexed < total:
+                    return None
+            else:
+                return None
+
+        return _decode_all(members)
+
+    async def _find_indexed(self, entity_filter: T_Filter) -> Optional[list[str]]:
+        """Returns uuids of the entities matching the indexed conditions of the filter,
+        or None if the filter has no indexed conditions. The rest of the conditions are not checked.
+        """
+        uuids: Optional[set[str]] = None
+        pipeline = self._client.pipeline(transaction=False)
+        index_keys: list[str] = []
+        bounds: dict[str, list[str]] = {}
+        for field, operator, value in entity_filter.get_conditions(mode='json'):
+            if operator not in ('eq', 'in'):
+                if field in self.sorted_indexed_fields and _is_number(value) and operator in _SCORE_BOUNDS:
+                    position, exclusive = _SCORE_BOUNDS[operator]
+                    bounds.setdefault(field, ['-inf', '+inf'])[position] = f'({value}' if exclusive else str(value)
+                continue
+            options = [value] if operator == 'eq' else value
+            if not options:
+                uuids = set()
+            elif field == 'uuid':
+                members = {option for option in options if option is not None}
+                uuids = members if uuids is None else uuids & members
+            elif field == 'id':
+                await pipeline.mget([f'{self._prefix}:{option}:uuid' for option in options])
+            elif field in self.indexed_fields:
+                if operator == 'eq':
+                    index_keys.append(self._index_key(field, value))
+                else:
+                    await pipeline.sunion([self._index_key(field, option) for option in options])
+            elif field in self.sorted_indexed_fields and operator == 'eq' and _is_number(value):
+                bounds[field] = [str(value), str(value)]
+        if index_keys:
+            await pipeline.sinter(index_keys)
+        for field, (low, high) in bounds.items():
+            await pipeline.zrangebyscore(self._sorted_index_key(field), low, high)
+
+        if len(pipeline) == 0:
+            return None if uuids is None else list(uuids)
+
+        for result in await pipeline.execute():
+            members = {_decode(member) for member in result if member is not None}
+            uuids = members if uuids is None else uuids & members
+        return list(uuids or ())
+
     def on_add(self, entity: T_Entity) -> dict[Any, Any]:
         return entity.model_dump(mode='json')
 
-    async def model_validate(self, data: str | dict[Any, Any]) -> T_Entity:
+    async def model_validate(self, data: str | bytes | dict[Any, Any]) -> T_Entity:
         if isinstance(data, (str, bytes)):
-            data = json.loads(data)
+            data = decode(data)
         return self.entity_cls.model_validate(data)
 
-    async def models_validate(self, datas: list[dict[Any, Any]]) -> list[T_Entity]:
-        return [await self.model_validate(data) for data in datas]
+    async def models_validate(self, datas: Sequence[str | bytes | dict[Any, Any]]) -> list[T_Entity]:
+        if self.hydration == Hydration.VALIDATE:
+            return [await self.model_validate(data) for data in datas]
+        adapter = get_list_adapter(self.entity_cls)
+        texts = [json_body(data) for data in datas if isinstance(data, (str, bytes))]
+        if len(texts) == len(datas) and None not in texts:
+            # a single json array is parsed and validated by pydantic-core, without the dicts of json.loads
+            chunks = [text.encode() if isinstance(text, str) else text for text in texts if text is not None]
+            return adapter.validate_json(b'[' + b','.join(chunks) + b']')
+        return adapter.validate_python([decode(data) if isinstance(data, (str, bytes)) else data for data in datas])
 
     async def get_update_values(self, entity: T_Entity, model_dump: dict[str, Any]) -> dict[str, Any]:
         model_dump.setdefault('mode', 'json')
         return entity.model_dump(**model_dump)
 
-    async def get(self, obj_id: int | str | UUID) -> Optional[T_Entity]:
+    async def get(self, obj_id: int | str | UUID, fields: Optional[Sequence[str]] = None) -> Optional[T_Entity]:
         if not isinstance(obj_id, (str, int, UUID)):
             raise ValueError(f'Unsupported obj_id type: {type(obj_id)}')
+        if fields is not None:
+            self.entity_cls.check_fields(fields)
 
-        if isinstance(obj_id, int) and (value := await self._client.get(f'{self._prefix}:{obj_id}:uuid')):
-            obj_id = value.decode()
+        if isinstance(obj_id, int):
+            [value] = await self._mget([f'{self._prefix}:{obj_id}:uuid'])
+            if value:
+                obj_id = _decode(value)
 
-        obj_id = str(obj_id)
-        data = await self._client.get(f'{self._prefix}:{obj_id}')
+        [data] = await self._read([f'{self._prefix}:{obj_id}'], fields)
         if not data:
             return None
 
+        if fields is not None:
+            return self._validate_fields(data, fields)
         return await self.model_validate(data)
 
-    async def list(self, page: LimitOffset, entity_filter: Optional[T_Filter] = None) -> list[T_Entity]:
+    async def get_many(self, obj_ids: Sequence[int | UUID]) -> list[Optional[T_Entity]]:
+        if not all(isinstance(obj_id, (int, UUID)) for obj_id in obj_ids):
+            raise ValueError(f'Unsupported obj_id types: {set(type(obj_id) for obj_id in obj_ids)}')
 
-        results: list[T_Entity] = []
-        keys = [key async for key in self._client.scan_iter(match=f'{self._prefix}:*')]
-        for key in keys:
-            await self._pipeline.get(key)
+        ids = list(dict.fromkeys(obj_id for obj_id in obj_ids if isinstance(obj_id, int)))
+        pointers = dict(zip(ids, await self._mget([f'{self._prefix}:{obj_id}:uuid' for obj_id in ids]))) if ids else {}
+        uuids = {
+            obj_id: _decode(pointers[obj_id]) if isinstance(obj_id, int) else str(obj_id)
+            for obj_id in obj_ids
+            if not isinstance(obj_id, int) or pointers.get(obj_id)
+        }
 
-        items = await self._pipeline.execute()
-        i = -1
-        for item in items:
-            if item is None:
-                continue
+        found: dict[str, T_Entity] = {}
+        for chunk in chunked(list(set(uuids.values())), self.bulk_chunk_size):
+            datas = await self._read([f'{self._prefix}:{uuid}' for uuid in chunk])
+            for item in await self._validate_filtered(datas, None):
+                found[str(item.uuid)] = item
+        return [found.get(uuids[obj_id]) if obj_id in uuids else None for obj_id in obj_ids]
 
-            item = await self.model_validate(item)
-            if entity_filter is not None and not self.apply_filter(item, entity_filter):
-                continue
-            i += 1
-            if page.offset > 0 and page.offset > i:
-                continue
-            results.append(item)
-            if 0 < page.limit < len(results):
-                break
+    async def list(
+        self, page: Page, entity_filter: Optional[T_Filter] = None, fields: Optional[Sequence[str]] = None
+    ) -> list[T_Entity]:
+        loaded = self._get_loaded_fields(entity_filter, fields)
+        if (uuids := await self._find_page(page, entity_filter)) is not None:
+            items = await self._get_by_keys([f'{self._prefix}:{uuid}' for uuid in uuids], None, loaded)
+            return self._project(items, fields)
 
-        return self.apply_order_by(results, entity_filter)
+        if entity_filter is not None and (uuids := await self._find_indexed(entity_filter)) is not None:
+            keys = [f'{self._prefix}:{uuid}' for uuid in uuids]
+            results = await self._get_by_keys(keys + self._pending_keys(keys), entity_filter, loaded)
+        elif isinstance(page, LimitOffset) and page.limit > 0 and (entity_filter is None or not entity_filter.order_by):
+            # an unordered page does not need the rest of the entities
+            results = []
+            async for item in self.iter(entity_filter, fields=loaded):
+                results.append(item)
+                if len(results) >= page.offset + page.limit:
+                    break
+        else:
+            results = [item async for item in self.iter(entity_filter, fields=loaded)]
+
+        return self._project(self.paginate(results, page, entity_filter), fields)
+
+    async def list_with_count(
+        self, page: Page, entity_filter: Optional[T_Filter] = None, fields: Optional[Sequence[str]] = None
+    ) -> tuple[List[T_Entity], int]:
+        loaded = self._get_loaded_fields(entity_filter, fields)
+        if (uuids := await self._find_page(page, entity_filter)) is not None:
+            # served by the sorted sets, so the filter has no conditions and the total is the ZCARD of the ids
+            items = await self._get_by_keys([f'{self._prefix}:{uuid}' for uuid in uuids], None, loaded)
+            return self._project(items, fields), await self.count()
+
+        if entity_filter is not None and (uuids := await self._find_indexed(entity_filter)) is not None:
+            keys = [f'{self._prefix}:{uuid}' for uuid in uuids]
+            results = await self._get_by_keys(keys + self._pending_keys(keys), entity_filter, loaded)
+        else:
+            results = [item async for item in self.iter(entity_filter, fields=loaded)]
+        return self._project(self.paginate(results, page, entity_filter), fields), len(results)
+
+    async def _iter_key_batches(
+        self, entity_filter: Optional[T_Filter] = None, batch_size: int = 1000
+    ) -> AsyncIterator[Sequence[bytes | str]]:
+        """Yields batches of the keys of the candidate entities of the filter,
+        the entities written in the current session come last
+        """
+        pending = set(self._pending_keys())
+        if entity_filter is not None and (uuids := await self._find_indexed(entity_filter)) is not None:
+            for chunk in chunked(uuids, batch_size):
+                keys = [f'{self._prefix}:{uuid}' for uuid in chunk]
+                pending.difference_update(keys)
+                yield keys
+        else:
+            batch: list[bytes | str] = []
+            async for key in self._client.scan_iter(match=f'{self._prefix}:*', count=batch_size):
+                if not self.is_entity_key(key):
+                    continue
+                batch.append(key)
+                pending.discard(_decode(key))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        for chunk in chunked(list(pending), batch_size):
+            yield chunk
+
+    async def _iter_batches(
+        self, entity_filter: Optional[T_Filter] = None, batch_size: int = 1000, fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[List[T_Entity]]:
+        async for keys in self._iter_key_batches(entity_filter, batch_size):
+            yield await self._get_by_keys(keys, entity_filter, fields)
+
+    async def iter(
+        self,
+        entity_filter: Optional[T_Filter] = None,
+        batch_size: int = 1000,
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T_Entity]:
+        loaded = self._get_loaded_fields(entity_filter, fields)
+        async for items in self._iter_batches(entity_filter, batch_size, loaded):
+            for item in self._project(items, fields):
+                yield item
 
     async def count(self, entity_filter: Optional[T_Filter] = None) -> int:
+        if entity_filter is not None and not entity_filter.get_conditions():
+            # e.g. only the ordering is set
+            entity_filter = None
+        if entity_filter is None and not self._overlay:
+            if self._ttl is None:
+                await self._build_ids()
+                return await self._client.zcard(self._ids_key)
+            return len(await self._scan_entity_keys())
         if entity_filter is None:
-            keys = [key async for key in self._client.scan_iter(match=f'{self._prefix}:*')]
-            return len(keys)
-        return len(await self.list(LimitOffset().inf, entity_filter))
+            return sum([len(keys) async for keys in self._iter_key_batches(batch_size=self.bulk_chunk_size)])
+        conditions = self._get_script_conditions(entity_filter)
+        if conditions is not None and len(conditions) == len(entity_filter.get_conditions()):
+            # all the conditions are evaluated by the script, so the entities are not sent at all
+            script, args = self._get_script(self._filter_script), [json.dumps(conditions), 'count']
+            total = 0
+            async for keys in self._iter_key_batches(entity_filter, self.bulk_chunk_size):
+                remote, pending = self._split_pending(keys)
+                if remote:
+                    # the values the script can't read, e.g. written by a binary codec, are counted here
+                    matched, *unreadable = await script(keys=remote, args=args)
+                    total += matched + len(await self._validate_filtered(unreadable, entity_filter))
+                total += len(await self._get_by_keys(pending, entity_filter))
+            return total
+        # only the fields of the filter are validated
+        loaded = self._get_loaded_fields(entity_filter, [])
+        return sum([len(items) async for items in self._iter_batches(entity_filter, self.bulk_chunk_size, loaded)])
+
+    async def commit(self) -> None:
+        """Sends the writes of the session, raises `already_exists_err` if any of the added entities exists.
+        The writes of the session are discarded if the duplicates are found before sending.
+        """
+        if self._checkpoints:
+            return
+        created = dict(self._created)
+        if created:
+            pipeline = self._client.pipeline(transaction=False)
+            for key in created:
+                await pipeline.exists(key)
+            duplicates = [key for key, found in zip(created, await pipeline.execute()) if found]
+            if duplicates:
+                await self._discard()
+                raise self._already_exists(duplicates[0])
+
+        results = await self._execute()
+        failed = [key for key, (position, _) in created.items() if not results[position]]
+        if failed:
+            # created concurrently after the check, the id pointers of the failed entities are removed
+            await self._client.delete(*[f'{self._prefix}:{created[key][1]}:uuid' for key in failed])
+            raise self._already_exists(failed[0])
+
+    def _already_exists(self, key: str) -> DomainException:
+        uuid = key[len(self._prefix) + 1 :]  # noqa: E203
+        return self.already_exists_err(f'{self.entity_cls.__name__} already exists: {uuid}')
+
+    async def _queue_add(self, uuid: UUID, data: dict[str, Any]) -> None:
+        key = f'{self._prefix}:{uuid}'
+        if key in self._overlay:
+            raise self._already_exists(key)
+        self._created[key] = (len(self._pipeline), data['id'])
+        await self._set(key, self.codec.encode(data), nx=True)
+        await self._set(f'{self._prefix}:{data["id"]}:uuid', str(uuid))
+        await self._reindex(self._pipeline, uuid, None, data)
+        await self._queue_ids_built(data['id'])
 
     async def add(self, entity: T_Entity) -> T_Entity:
 
@@ -145,10 +720,7 @@ class RedisGenericSimpleRepo(RedisRepo, BaseRepo[T_Entity, T_Filter]):
         obj_id = await self._get_id()
         data['id'] = obj_id
 
-        result = await self._client.set(f'{self._prefix}:{entity.uuid}', json.dumps(data), ex=self._ttl, nx=True)
-        if not result:
-            raise self.already_exists_err(f'{self.entity_cls.__name__} already exists: {entity.uuid}')
-        await self._client.set(f'{self._prefix}:{obj_id}:uuid', str(entity.uuid).encode(), ex=self._ttl)
+        await self._queue_add(entity.uuid, data)
         entity.id = obj_id
 
         return entity
@@ -165,17 +737,310 @@ class RedisGenericSimpleRepo(RedisRepo, BaseRepo[T_Entity, T_Filter]):
 
         model_dump = model_dump or {}
         data = await self.get_update_values(entity, model_dump)
-        result = await self._client.set(f'{self._prefix}:{entity.uuid}', json.dumps(data), ex=self._ttl, xx=True)
-        return 1 if result else 0
+        await self._set(f'{self._prefix}:{entity.uuid}', self.codec.encode(data), xx=True)
+        await self._reindex(self._pipeline, entity.uuid, item.model_dump(mode='json'), data)
+        return 1
 
     async def update_by_filter(self, entity_filter: T_Filter, values: dict[str, Any]) -> int:
-        entities = await self.list(LimitOffset().inf, entity_filter)
-
-        for entity in entities:
+        changes: list[tuple[UUID, dict[str, Any], dict[str, Any]]] = []
+        async for entity in self.iter(entity_filter):
+            old = entity.model_dump(mode='json')
             entity = entity.model_copy(update=values)
-            data = await self.get_update_values(entity, {})
-            await self._pipeline.set(f'{self._prefix}:{entity.uuid}', json.dumps(data), ex=self._ttl, xx=True)
+            changes.append((entity.uuid, old, await self.get_update_values(entity, {})))
+
+        for uuid, old, data in changes:
+            await self._set(f'{self._prefix}:{uuid}', self.codec.encode(data), xx=True)
+            await self._reindex(self._pipeline, uuid, old, data)
+
+        return len(changes)
+
+    async def add_many(self, entities: Sequence[T_Entity], chunk_size: Optional[int] = None) -> List[T_Entity]:
+        for chunk in chunked(entities, chunk_size or self.bulk_chunk_size):
+            ids = await self._get_ids(len(chunk))
+            for entity, obj_id in zip(chunk, ids):
+                await self._queue_add(entity.uuid, {**self.on_add(entity), 'id': obj_id})
+            for entity, obj_id in zip(chunk, ids):
+                entity.id = obj_id
+
+        return list(entities)
+
+    async def update_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
+
+        total = 0
+        for chunk in chunked(entities, chunk_size or self.bulk_chunk_size):
+            keys = [f'{self._prefix}:{entity.uuid}' for entity in chunk]
+            for key, entity, data in zip(keys, chunk, await self._read(keys)):
+                if data is None:
+                    continue
+                old = decode(data)
+                new = {**old, **(await self.get_update_values(entity, dict(model_dump)))}
+                await self._set(key, self.codec.encode(new), xx=True)
+                await self._reindex(self._pipeline, entity.uuid, old, new)
+                total += 1
+        return total
+
+    async def upsert_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[T_Entity]:
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
+
+        results: List[T_Entity] = []
+        for chunk in chunked(entities, chunk_size or self.bulk_chunk_size):
+            keys = [f'{self._prefix}:{entity.uuid}' for entity in chunk]
+            existing = await self._read(keys)
+            ids = iter(await self._get_ids(sum(1 for data in existing if data is None)))
+
+            items: List[dict[str, Any]] = []
+            for key, entity, data in zip(keys, chunk, existing):
+                if data is None:
+                    item = self.on_add(entity)
+                    item['id'] = next(ids)
+                    await self._queue_add(entity.uuid, item)
+                else:
+                    old = decode(data)
+                    item = {**old, **(await self.get_update_values(entity, dict(model_dump)))}
+                    await self._set(key, self.codec.encode(item))
+                    await self._reindex(self._pipeline, entity.uuid, old, item)
+                items.append(item)
+            results.extend(await self.models_validate(items))
+        return results
+
+    async def rebuild_indexes(self, batch_size: int = 1000) -> int:
+        """Adds all the stored entities to the indexes, e.g. after adding indexed fields to the repository.
+        Returns the number of the indexed entities. Stale members are not removed.
+        """
+        total = 0
+        async for chunk in self._iter_batches(batch_size=batch_size):
+            pipeline = self._client.pipeline(transaction=False)
+            for item in chunk:
+                await self._reindex(pipeline, item.uuid, None, item.model_dump(mode='json'))
+            await pipeline.execute()
+            total += len(chunk)
+        return total
+
+
+class _Patch(dict[str, str]):
+    """The fields of an entity set by the updates of the session, applied over the stored hash on read"""
+
+
+class RedisGenericHashRepo(RedisGenericSimpleRepo[T_Entity, T_Filter]):
+    """Implementation of a generic repository for Redis that stores the entities as hashes `{prefix}:{uuid}`
+    of the json values of the fields, so the updates write and the `fields` reads fetch only their fields.
+    `codec` is not used.
+
+    example:
+        class RedisExampleRepo(RedisGenericHashRepo[ExampleEntity, ExampleEntityFilter]):
+            entity_cls = ExampleEntity
+            filter_cls = ExampleEntityFilter
+            already_exists_err = ExampleEntityAlreadyExists
+            indexed_fields = ('status', 'lang')
+    """
+
+    _filter_script = HASH_FILTER_SCRIPT
+
+    @staticmethod
+    def _to_mapping(data: dict[str, Any]) -> dict[str, str]:
+        return {field: json.dumps(value) for field, value in data.items()}
+
+    async def _expire(self, key: str) -> None:
+        if self._ttl is not None:
+            await self._pipeline.expire(key, self._ttl)
+
+    async def _load(
+        self, keys: Sequence[str], fields: Optional[Sequence[str]] = None
+    ) -> list[Optional[dict[str, Any]]]:
+        """Reads the stored hashes, only the `fields` and `id` if given. The writes of the session are not seen"""
+        if not keys:
+            return []
+        names = list(dict.fromkeys(['id', *fields])) if fields is not None else None
+        pipeline = self._client.pipeline(transaction=False)
+        for key in keys:
+            if names is None:
+                await pipeline.hgetall(key)
+            else:
+                await pipeline.hmget(key, names)
+
+        hashes: list[Optional[dict[str, Any]]] = []
+        for result in await pipeline.execute():
+            if names is not None:
+                # `id` is set for every stored entity
+                result = dict(zip(names, result)) if result[0] is not None else {}
+            hashes.append({_decode(field): value for field, value in result.items() if value is not None} or None)
+        return hashes
+
+    async def _read(self, keys: Sequence[bytes | str], fields: Optional[Sequence[str]] = None) -> list[Any]:
+        """Returns the json objects of the entity keys seen by the current session, None for the missing ones.
+        Only the `fields` and `id` are read from Redis if given, the writes of the session are added to them.
+        """
+        names = [_decode(key) for key in keys]
+        remote = [key for key in names if key not in self._overlay or isinstance(self._overlay[key], _Patch)]
+        stored = dict(zip(remote, await self._load(remote, fields)))
+
+        datas: list[Optional[bytes]] = []
+        for key in names:
+            mapping = stored[key] if key in stored else self._overlay[key]
+            if mapping is not None and isinstance(self._overlay.get(key), _Patch):
+                mapping = {**mapping, **self._overlay[key]}
+            datas.append(_hash_to_json(mapping) if mapping is not None else None)
+        return datas
+
+    async def _get_by_keys(
+        self,
+        keys: Sequence[bytes | str],
+        entity_filter: Optional[T_Filter] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T_Entity]:
+        conditions = self._get_script_conditions(entity_filter)
+        remote, pending = self._split_pending(keys)
+        results: list[T_Entity] = []
+        for chunk in chunked(remote, self.bulk_chunk_size):
+            if conditions is not None:
+                # the script returns the matching keys, so only the matching entities are read
+                chunk = await self._get_script(self._filter_script)(keys=chunk, args=[json.dumps(conditions), 'list'])
+            results.extend(await self._validate_filtered(await self._read(chunk, fields), entity_filter, fields))
+        results.extend(await self._validate_filtered(await self._read(pending, fields), entity_filter, fields))
+        return results
+
+    def _get_update_conditions(self, entity_filter: Optional[T_Filter]) -> list[Condition]:
+        """Returns the conditions of the filter checked by the update script on commit"""
+        if entity_filter is None:
+            return []
+        return [
+            condition for condition in entity_filter.get_conditions(mode='json') if _is_script_condition(*condition)
+        ]
+
+    def _get_update_fields(self, entity_filter: Optional[T_Filter]) -> list[str]:
+        """Returns the fields read to update the entities: `uuid` and the fields of the filter"""
+        return self._get_loaded_fields(entity_filter, ['uuid']) or []
+
+    def _get_update_indexes(self, values: dict[str, Any]) -> str:
+        """Returns the json of the prefix and the indexed fields of the values for the update script"""
+        indexes = {
+            'prefix': self._prefix,
+            'indexed': [field for field in self.indexed_fields if field in values],
+            'sorted': [field for field in self.sorted_indexed_fields if field in values],
+        }
+        return json.dumps(indexes)
+
+    async def _queue_update(self, keys: Sequence[str], conditions: list[Condition], values: dict[str, Any]) -> None:
+        """Queues setting the json `values` of the stored entities matching the conditions
+        and updating the indexes of them, the current session sees the values at once
+        """
+        if not values:
+            return
+        mapping = self._to_mapping(values)
+        args = [json.dumps(conditions), self._get_update_indexes(values), *chain.from_iterable(mapping.items())]
+        await self._get_script(HASH_UPDATE_SCRIPT)(keys=keys, args=args, client=self._pipeline)
+        for key in keys:
+            await self._expire(key)
+            # replaced rather than updated in place, the checkpoints of the nested contexts keep the previous writes
+            written = self._overlay.get(key)
+            if written is None or isinstance(written, _Patch):
+                self._overlay[key] = _Patch({**(written or {}), **mapping})
+            else:
+                self._overlay[key] = {**written, **mapping}
+
+    async def _queue_add(self, uuid: UUID, data: dict[str, Any]) -> None:
+        key = f'{self._prefix}:{uuid}'
+        if key in self._overlay:
+            raise self._already_exists(key)
+        mapping = self._to_mapping(data)
+        self._created[key] = (len(self._pipeline), data['id'])
+        await self._get_script(HASH_ADD_SCRIPT)(
+            keys=[key], args=list(chain.from_iterable(mapping.items())), client=self._pipeline
+        )
+        await self._expire(key)
+        self._overlay[key] = mapping
+        await self._set(f'{self._prefix}:{data["id"]}:uuid', str(uuid))
+        await self._reindex(self._pipeline, uuid, None, data)
+        await self._queue_ids_built(data['id'])
+
+    async def update(
+        self,
+        entity: T_Entity,
+        entity_filter: Optional[T_Filter] = None,
+        model_dump: Optional[dict[str, Any]] = None,
+    ) -> int:
+        """Sets the fields of `model_dump`, e.g. `{'include': {'status'}}`, all the fields by default"""
+        key = f'{self._prefix}:{entity.uuid}'
+        values = await self.get_update_values(entity, model_dump or {})
+        loaded = self._get_update_fields(entity_filter)
+        [data] = await self._read([key], loaded)
+        if data is None:
+            return 0
+        if entity_filter is not None and not self.apply_filter(
+            self.entity_cls.model_validate_fields(decode(data), loaded), entity_filter
+        ):
+            return 0
+
+        await self._queue_update([key], self._get_update_conditions(entity_filter), values)
+        return 1
+
+    async def update_by_filter(self, entity_filter: T_Filter, values: dict[str, Any]) -> int:
+        data = self.entity_cls.model_construct_fields(values).model_dump(mode='json')
+        loaded = self._get_update_fields(entity_filter)
+        items = [
+            item async for batch in self._iter_batches(entity_filter, self.bulk_chunk_size, loaded) for item in batch
+        ]
+
+        conditions = self._get_update_conditions(entity_filter)
+        for chunk in chunked(items, self.bulk_chunk_size):
+            await self._queue_update([f'{self._prefix}:{item.uuid}' for item in chunk], conditions, data)
+        return len(items)
+
+    async def update_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
+
+        total = 0
+        for chunk in chunked(entities, chunk_size or self.bulk_chunk_size):
+            keys = [f'{self._prefix}:{entity.uuid}' for entity in chunk]
+            changes = [await self.get_update_values(entity, dict(model_dump)) for entity in chunk]
+            for key, values, data in zip(keys, changes, await self._read(keys, [])):
+                if data is None:
+                    continue
+                await self._queue_update([key], [], values)
+                total += 1
+        return total
+
+    async def upsert_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[T_Entity]:
+        """The stored entities get the fields of `model_dump`, the new ones are added"""
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
 
-        result = await self._pipeline.execute()
+        results: List[T_Entity] = []
+        for chunk in chunked(entities, chunk_size or self.bulk_chunk_size):
+            keys = [f'{self._prefix}:{entity.uuid}' for entity in chunk]
+            existing = await self._read(keys)
+            ids = iter(await self._get_ids(sum(1 for data in existing if data is None)))
 
-        return sum(result)
+            items: List[dict[str, Any]] = []
+            for key, entity, data in zip(keys, chunk, existing):
+                if data is None:
+                    item = self.on_add(entity)
+                    item['id'] = next(ids)
+                    await self._queue_add(entity.uuid, item)
+                else:
+                    values = await self.get_update_values(entity, dict(model_dump))
+                    item = {**decode(data), **values}
+                    await self._queue_update([key], [], values)
+                items.append(item)
+            results.extend(await self.models_validate(items))
+        return results
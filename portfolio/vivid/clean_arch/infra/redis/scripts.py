@@ -0,0 +1,188 @@
+"""
+Lua scripts executed by the Redis repositories. The scripts are registered once per repository
+and called with EVALSHA, falling back to SCRIPT LOAD when Redis doesn't know the script yet.
+"""
+
+_MATCH = """
+local function is_null(value)
+    return value == nil or value == cjson.null
+end
+
+local function match(value, operator, expected)
+    if operator == 'eq' then
+        return value == expected
+    elseif operator == 'isnull' then
+        return is_null(value) == expected
+    elseif is_null(value) then
+        return false
+    elseif operator == 'ne' then
+        return value ~= expected
+    elseif operator == 'in' then
+        for _, option in ipairs(expected) do
+            if value == option then
+                return true
+            end
+        end
+        return false
+    elseif operator == 'startswith' then
+        return type(value) == 'string' and string.sub(value, 1, #expected) == expected
+    elseif type(value) ~= 'number' then
+        return false
+    elseif operator == 'gt' then
+        return value > expected
+    elseif operator == 'gte' then
+        return value >= expected
+    elseif operator == 'lt' then
+        return value < expected
+    elseif operator == 'lte' then
+        return value <= expected
+    end
+    return false
+end
+"""
+"""Lua function `match(value, operator, expected)` of the conditions `[field, operator, value]`,
+see clean_arch.utils.filters
+"""
+
+FILTER_SCRIPT = _MATCH + """
+-- KEYS: entity keys
+-- ARGV[1]: json array of the conditions
+-- ARGV[2]: 'count' to return the number of the matching entities instead of them
+-- The values starting with a codec header are not JSON, they are returned as matching in both modes:
+-- after the matching values, and after the number of the matching values in the 'count' mode.
+local conditions = cjson.decode(ARGV[1])
+local count_only = ARGV[2] == 'count'
+local matched = 0
+local result = {}
+local unreadable = {}
+
+for _, key in ipairs(KEYS) do
+    local data = redis.call('GET', key)
+    if data and string.byte(data, 1) >= 128 then
+        unreadable[#unreadable + 1] = data
+    elseif data then
+        local doc = cjson.decode(data)
+        local ok = true
+        for _, condition in ipairs(conditions) do
+            if not match(doc[condition[1]], condition[2], condition[3]) then
+                ok = false
+                break
+            end
+        end
+        if ok then
+            matched = matched + 1
+            if not count_only then
+                result[matched] = data
+            end
+        end
+    end
+end
+
+if count_only then
+    result = {matched}
+end
+for _, data in ipairs(unreadable) do
+    result[#result + 1] = data
+end
+return result
+"""
+
+_HASH_MATCH = """
+-- the fields of the hashes are json values, `id` tells the stored entities
+local function match_hash(key, conditions)
+    local fields = {'id'}
+    for i, condition in ipairs(conditions) do
+        fields[i + 1] = condition[1]
+    end
+    local values = redis.call('HMGET', key, unpack(fields))
+    if not values[1] then
+        return false
+    end
+    for i, condition in ipairs(conditions) do
+        local value = values[i + 1]
+        if value then
+            value = cjson.decode(value)
+        end
+        if not match(value, condition[2], condition[3]) then
+            return false
+        end
+    end
+    return true
+end
+"""
+
+HASH_FILTER_SCRIPT = _MATCH + _HASH_MATCH + """
+-- KEYS: entity keys of the hashes
+-- ARGV[1]: json array of the conditions
+-- ARGV[2]: 'count' to return {number of the matching entities}, the matching keys otherwise
+local conditions = cjson.decode(ARGV[1])
+local result = {}
+for _, key in ipairs(KEYS) do
+    if match_hash(key, conditions) then
+        result[#result + 1] = key
+    end
+end
+if ARGV[2] == 'count' then
+    return {#result}
+end
+return result
+"""
+
+HASH_ADD_SCRIPT = """
+-- KEYS[1]: entity key of the hash
+-- ARGV: field, json value pairs
+-- Sets the fields only if the entity does not exist, returns 1 if it is added
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+HASH_UPDATE_SCRIPT = _MATCH + _HASH_MATCH + """
+-- KEYS: entity keys of the hashes `{prefix}:{uuid}`
+-- ARGV[1]: json array of the conditions, checked and applied atomically
+-- ARGV[2]: json object {prefix, indexed, sorted} of the set fields indexed by sets and by sorted sets
+-- ARGV[3:]: field, json value pairs
+-- Sets the fields of the stored entities matching the conditions and updates the indexes of them,
+-- returns the number of the updated entities
+local conditions = cjson.decode(ARGV[1])
+local indexes = cjson.decode(ARGV[2])
+local values = {}
+for i = 3, #ARGV, 2 do
+    values[ARGV[i]] = ARGV[i + 1]
+end
+
+-- the index keys are built of the stored json values, the same way as by the repository
+local function reindex(key)
+    local member = string.sub(key, #indexes.prefix + 2)
+    for _, field in ipairs(indexes.indexed) do
+        local old = redis.call('HGET', key, field) or 'null'
+        if old ~= values[field] then
+            redis.call('SREM', indexes.prefix .. ':idx:' .. field .. ':' .. old, member)
+            redis.call('SADD', indexes.prefix .. ':idx:' .. field .. ':' .. values[field], member)
+        end
+    end
+    for _, field in ipairs(indexes.sorted) do
+        local score = values[field]
+        if score == 'null' then
+            redis.call('ZREM', indexes.prefix .. ':zidx:' .. field, member)
+        else
+            if score == 'true' or score == 'false' then
+                score = score == 'true' and 1 or 0
+            end
+            redis.call('ZADD', indexes.prefix .. ':zidx:' .. field, score, member)
+        end
+    end
+end
+
+local updated = 0
+for _, key in ipairs(KEYS) do
+    if match_hash(key, conditions) then
+        reindex(key)
+        redis.call('HSET', key, unpack(ARGV, 3))
+        updated = updated + 1
+    end
+end
+return updated
+"""
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from clean_arch.application.instrumentation import count_round_trip
+
+
+def _count_round_trip(*args: Any) -> None:
+    count_round_trip()
+
+
+def count_sql_round_trips(engine: Engine | AsyncEngine) -> None:
+    """Counts the statements, commits and rollbacks of the engine as the round trips of the instrumented calls"""
+    sync_engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    for name in ('before_cursor_execute', 'commit', 'rollback'):
+        if not event.contains(sync_engine, name, _count_round_trip):
+            event.listen(sync_engine, name, _count_round_trip)
@@ -1,45 +1,135 @@
 from __future__ import annotations
 
-import asyncio
-from typing import Any, Callable, Generic, Optional, Type, TypeVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
 from uuid import UUID
 
-from sqlalchemy import CursorResult, Delete, Select, Update, delete, select, update
+from sqlalchemy import (
+    CursorResult,
+    Delete,
+    Integer,
+    Select,
+    Update,
+    and_,
+    bindparam,
+    delete,
+    insert,
+    or_,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncSessionTransaction
 from sqlalchemy.sql.functions import count
 
 from clean_arch.application.repositories import BaseRepo, ContextManagerRepo, T_Entity, T_Filter
-from clean_arch.domain.entities import LimitOffset
+from clean_arch.domain.entities import KeysetPage, LimitOffset, Page
 from clean_arch.domain.exceptions import DomainException
-from clean_arch.infra.sql.utils import parse_order_by_string
+from clean_arch.infra.sql.utils import (
+    SQL_BOUND_FILTER_OPERATORS,
+    SQL_FILTER_OPERATORS,
+    StatementCache,
+    escape_like,
+    parse_order_by_string,
+)
+from clean_arch.utils.batching import chunked
+from clean_arch.utils.context import TaskLocal
+from clean_arch.utils.sort import parse_order_by
+from clean_arch.utils.validation import Hydration, get_list_adapter
 
 _T = TypeVar('_T', bound='SQLRepo')
 
 
 class SQLRepo(ContextManagerRepo):
-    _session: AsyncSession
+    """Every asyncio task has its own session, the writes of a nested context are wrapped in a SAVEPOINT.
+    With `make_read_session` the reads go to a replica until the session writes.
+    The write methods call `begin_write` before changing the database.
 
-    def __init__(self, make_session: Callable[[], AsyncSession]):
+    example:
+        repo = SQLExampleRepo(async_sessionmaker(primary_engine), make_read_session=async_sessionmaker(replica_engine))
+    """
+
+    _session = TaskLocal[AsyncSession]()
+    _read_session = TaskLocal[Optional[AsyncSession]]()
+    _savepoints = TaskLocal[Tuple[Optional[AsyncSessionTransaction], ...]]()
+    """SAVEPOINTs of the nested contexts, from the outermost, None until the first write of the block.
+    A tuple rebound on change, so the tasks started inside a block don't change the savepoints of their parent.
+    """
+
+    def __init__(
+        self,
+        make_session: Callable[[], AsyncSession],
+        make_read_session: Optional[Callable[[], AsyncSession]] = None,
+    ):
         self._make_session = make_session
-        self._lock = asyncio.Lock()
+        self._make_read_session = make_read_session
+
+    @property
+    def _reader(self) -> AsyncSession:
+        """Session of the reads: the replica session, unless the session has written"""
+        if self._read_session is None or self._session.info.get('written'):
+            return self._session
+        return self._read_session
+
+    async def begin_write(self) -> None:
+        """Marks the session as written, so the reads see the writes,
+        and begins the SAVEPOINTs of the nested contexts, which have not written yet
+        """
+        self._session.info['written'] = True
+        if self._savepoints and self._savepoints[-1] is None:
+            savepoints = list(self._savepoints)
+            for i, savepoint in enumerate(savepoints):
+                if savepoint is None:
+                    savepoints[i] = await self._session.begin_nested()
+            self._savepoints = tuple(savepoints)
 
     async def commit(self) -> None:
+        if self._savepoints:
+            return
         await self._session.commit()
 
     async def __aenter__(self: _T) -> _T:
-        await self._lock.acquire()
         if hasattr(self, '_session'):
-            raise RuntimeError('Already in a session')
+            self._savepoints = (*self._savepoints, None)
+            return self
         self._session = await self._make_session().__aenter__()
+        # the sessions connect on the first query, so a replica session costs nothing until it's used
+        self._read_session = self._make_read_session() if self._make_read_session is not None else None
+        self._savepoints = ()
         return self
 
     async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self._savepoints:
+            self._savepoints, savepoint = self._savepoints[:-1], self._savepoints[-1]
+            if savepoint is not None and savepoint.is_active:
+                if exc_type is None:
+                    await savepoint.commit()
+                else:
+                    await savepoint.rollback()
+            return
         try:
-            await self._session.__aexit__(exc_type, exc, tb)
-            del self._session
+            try:
+                await self._session.__aexit__(exc_type, exc, tb)
+            finally:
+                if self._read_session is not None:
+                    await self._read_session.close()
         finally:
-            self._lock.release()
+            del self._session
+            del self._read_session
+            del self._savepoints
 
 
 T_SQL_Entity = TypeVar('T_SQL_Entity')
@@ -71,40 +161,235 @@ class SQLGenericRepo(Generic[T_SQL_Entity, T_Entity, T_Filter], SQLRepo, BaseRep
     filter_cls: Type[T_Filter]
     already_exists_err: Type[DomainException]
 
+    bulk_chunk_size: int = 1000
+    """Max number of rows sent in a single multi-row statement by the bulk methods"""
+
+    hydration: Hydration = Hydration.VALIDATE
+    """How `models_validate` builds the entities of the rows, `BATCH` and `CONSTRUCT` don't call `model_validate`"""
+
+    statement_cache_size: int = 256
+    """Max number of the query shapes of `get`, `list` and `count` kept with their statements, 0 disables the cache.
+    The cache is shared by the instances of the class, it is not used if the class overrides
+    `get_select`, `apply_filter`, `apply_order_by` or `apply_keyset`.
+    """
+
+    _statement_cache: ClassVar[Optional[StatementCache]]
+
+    @classmethod
+    def get_statement_cache(cls) -> Optional[StatementCache]:
+        """Returns the statement cache of the class, its `stats` count the reused statements"""
+        if '_statement_cache' not in cls.__dict__:
+            overridden = any(
+                getattr(cls, name) is not getattr(SQLGenericRepo, name)
+                for name in ('get_select', 'apply_filter', 'apply_order_by', 'apply_keyset')
+            )
+            enabled = cls.statement_cache_size > 0 and not overridden
+            cls._statement_cache = StatementCache(cls.statement_cache_size) if enabled else None
+        return cls._statement_cache
+
+    def get_statement(
+        self,
+        kind: str,
+        entity_filter: Optional[T_Filter] = None,
+        page: Optional[Page] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[tuple[Any, dict[str, Any]]]:
+        """Returns the statement of `get`, `list` or `count` with bound parameters and the values of the parameters,
+        None if the statement cache is disabled.
+
+        The shape of the query is the kind, the fields, the fields and the operators of the filter, the order
+        and the kind of the page. The values are bound, except the nulls, which change the statement to IS NULL.
+        """
+        cache = self.get_statement_cache()
+        if cache is None:
+            return None
+
+        conditions = entity_filter.get_conditions() if entity_filter else []
+        order_by = entity_filter.order_by if entity_filter and kind != 'count' else None
+        shape: list[Hashable] = [kind, None if fields is None else tuple(fields), order_by]
+        params: dict[str, Any] = {}
+        for i, (field, operator, value) in enumerate(conditions):
+            if operator == 'isnull':
+                shape.append((field, operator, bool(value)))
+            elif value is None:
+                shape.append((field, operator, None))
+            else:
+                shape.append((field, operator))
+                if operator == 'in':
+                    value = list(value)
+                elif operator == 'startswith':
+                    value = escape_like(value)
+                params[f'p{i}'] = value
+
+        keyset_order_by = ''
+        if isinstance(page, KeysetPage):
+            keyset_order_by = page.get_order_by(order_by)
+            values = page.get_cursor_values(self.entity_cls, keyset_order_by)
+            shape.append(('keyset', keyset_order_by, values is not None, page.limit > 0))
+            params.update((f'k{i}', value) for i, value in enumerate(values or ()))
+            params['limit'] = page.limit
+        elif isinstance(page, LimitOffset):
+            shape.append(('offset', page.limit > 0, page.offset > 0))
+            params.update(limit=page.limit, offset=page.offset)
+
+        def build() -> Any:
+            if kind == 'count':
+                query = select(count()).select_from(self.sql_entity_cls)
+            else:
+                query = self.get_select(fields)
+
+            where = []
+            for i, (field, operator, value) in enumerate(conditions):
+                column = getattr(self.sql_entity_cls, field)
+                if f'p{i}' in params:
+                    param = bindparam(f'p{i}', type_=column.type, expanding=operator == 'in')
+                    where.append(SQL_BOUND_FILTER_OPERATORS[operator](column, param))
+                else:
+                    where.append(SQL_FILTER_OPERATORS[operator](column, value))
+            if where:
+                query = query.where(*where)
+
+            limit = bindparam('limit', type_=Integer())
+            if isinstance(page, KeysetPage):
+                cursor = None
+                if page.cursor is not None:
+                    columns = [getattr(self.sql_entity_cls, name) for name, _ in parse_order_by(keyset_order_by)]
+                    cursor = [bindparam(f'k{i}', type_=column.type) for i, column in enumerate(columns)]
+                return self._apply_keyset_values(query, keyset_order_by, cursor, limit if page.limit > 0 else None)
+            if kind != 'count':
+                query = self.apply_order_by(query, entity_filter)
+            if isinstance(page, LimitOffset):
+                if page.limit > 0:
+                    query = query.limit(limit)
+                if page.offset > 0:
+                    query = query.offset(bindparam('offset', type_=Integer()))
+            elif kind == 'get' and fields is not None:
+                query = query.limit(1)
+            return query
+
+        return cache.get(tuple(shape), build), params
+
     def apply_filter(
         self,
-        query: Select[tuple[T_SQL_Entity]] | Select[tuple[int]] | Update | Delete,
+        query: Select[Any] | Update | Delete,
         entity_filter: Optional[T_Filter] = None,
     ) -> Any:
         if entity_filter:
-            return query.filter_by(
-                **entity_filter.model_dump(exclude=entity_filter.get_excluded_for_filter_keys(), exclude_unset=True)
-            )
+            conditions = entity_filter.get_conditions()
+            if conditions:
+                return query.where(
+                    *(
+                        SQL_FILTER_OPERATORS[operator](getattr(self.sql_entity_cls, field), value)
+                        for field, operator, value in conditions
+                    )
+                )
         return query
 
     def apply_order_by(
         self,
-        query: Select[tuple[T_SQL_Entity]] | Select[tuple[int]] | Update | Delete,
+        query: Select[Any] | Update | Delete,
         entity_filter: Optional[T_Filter] = None,
     ) -> Any:
         if isinstance(query, Select) and entity_filter and entity_filter.order_by is not None:
             query = query.order_by(*parse_order_by_string(entity_filter.order_by))
         return query
 
+    def apply_keyset(
+        self,
+        query: Select[Any],
+        page: KeysetPage,
+        entity_filter: Optional[T_Filter] = None,
+    ) -> Any:
+        order_by = page.get_order_by(entity_filter.order_by if entity_filter else None)
+        values = page.get_cursor_values(self.entity_cls, order_by)
+        return self._apply_keyset_values(query, order_by, values, page.limit if page.limit > 0 else None)
+
+    def _apply_keyset_values(
+        self, query: Select[Any], order_by: str, values: Optional[Sequence[Any]], limit: Optional[Any]
+    ) -> Any:
+        """Orders the query by `order_by` and selects the rows after the `values` of the cursor,
+        the `values` and the `limit` are values or bound parameters
+        """
+        columns = [(getattr(self.sql_entity_cls, name), descending) for name, descending in parse_order_by(order_by)]
+        query = query.order_by(*(column.desc() if descending else column.asc() for column, descending in columns))
+
+        if values is not None:
+            if len({descending for _, descending in columns}) == 1:
+                # a single row value comparison is able to use a composite index
+                left, right = tuple_(*(column for column, _ in columns)), tuple_(*values)
+                query = query.where(left < right if columns[0][1] else left > right)
+            else:
+                query = query.where(
+                    or_(
+                        *(
+                            and_(
+                                *(prev == value for (prev, _), value in zip(columns[:i], values)),
+                                column < values[i] if descending else column > values[i],
+                            )
+                            for i, (column, descending) in enumerate(columns)
+                        )
+                    )
+                )
+
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
     def on_add(self, entity: T_Entity) -> T_SQL_Entity:
-        data = entity.model_dump(exclude={'id'})
-        return self.sql_entity_cls(**data)
+        return self.sql_entity_cls(**self.get_add_values(entity))
+
+    def get_add_values(self, entity: T_Entity) -> dict[str, Any]:
+        return entity.model_dump(exclude={'id'})
+
+    def is_already_exists_error(self, err: IntegrityError) -> bool:
+        return (
+            'duplicate key value violates unique constraint' in str(err)
+            or 'asyncpg.exceptions.UniqueViolationError' in str(err.orig)
+            or 'UNIQUE constraint failed' in str(err)
+        )
+
+    def get_dialect_insert(self) -> Optional[Callable[[Type[T_SQL_Entity]], Any]]:
+        """Returns the dialect specific `insert` supporting ON CONFLICT clauses, None for the other dialects"""
+        dialect = self._session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects import postgresql
+
+            return postgresql.insert
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects import sqlite
+
+            return sqlite.insert
+        return None
 
     async def model_validate(self, sql_entity: T_SQL_Entity) -> T_Entity:
         return self.entity_cls.model_validate(sql_entity)
 
     async def models_validate(self, sql_entities: list[T_SQL_Entity]) -> list[T_Entity]:
+        if self.hydration == Hydration.BATCH:
+            return get_list_adapter(self.entity_cls).validate_python(sql_entities, from_attributes=True)
+        if self.hydration == Hydration.CONSTRUCT:
+            fields = [field for field in self.entity_cls.model_fields if hasattr(self.sql_entity_cls, field)]
+            return [
+                self.entity_cls.model_construct(**{field: getattr(sql_entity, field) for field in fields})
+                for sql_entity in sql_entities
+            ]
         return [await self.model_validate(sql_entity) for sql_entity in sql_entities]
 
+    def get_select(self, fields: Optional[Sequence[str]] = None) -> Select[Any]:
+        """Selects the entities, or only the columns of the `fields`"""
+        if fields is None:
+            return select(self.sql_entity_cls)
+        self.entity_cls.check_fields(fields)
+        return select(*(getattr(self.sql_entity_cls, field) for field in fields))
+
+    def rows_validate(self, rows: Sequence[Any], fields: Sequence[str]) -> list[T_Entity]:
+        """Validates the rows of the columns of the `fields` into partial entities"""
+        return [self.entity_cls.model_validate_fields(dict(zip(fields, row)), fields) for row in rows]
+
     async def get_update_values(self, entity: T_Entity, model_dump: dict[str, Any]) -> dict[str, Any]:
         return entity.model_dump(**model_dump)
 
-    async def get(self, obj_id: int | str | UUID) -> Optional[T_Entity]:
+    async def get(self, obj_id: int | str | UUID, fields: Optional[Sequence[str]] = None) -> Optional[T_Entity]:
         if not isinstance(obj_id, (int, str, UUID)):
             raise ValueError(f'Unsupported obj_id type: {type(obj_id)}')
 
@@ -115,28 +400,118 @@ class SQLGenericRepo(Generic[T_SQL_Entity, T_Entity, T_Filter], SQLRepo, BaseRep
         else:
             entity_filter = self.get_filter_for_get_str(obj_id)
 
-        query = select(self.sql_entity_cls)
-        query = self.apply_filter(query, entity_filter)
-        query = self.apply_order_by(query, entity_filter)
-
-        sql_entity = await self._session.scalar(query)
+        if (statement := self.get_statement('get', entity_filter, fields=fields)) is not None:
+            query, params = statement
+        else:
+            query = self.get_select(fields)
+            query = self.apply_filter(query, entity_filter)
+            query = self.apply_order_by(query, entity_filter)
+            if fields is not None:
+                query = query.limit(1)
+            params = {}
+
+        if fields is not None:
+            row = (await self._reader.execute(query, params)).first()
+            return self.rows_validate([row], fields)[0] if row else None
+        sql_entity = await self._reader.scalar(query, params)
         return (await self.model_validate(sql_entity)) if sql_entity else None
 
-    async def list(self, page: LimitOffset, entity_filter: Optional[T_Filter] = None) -> list[T_Entity]:
-        query = page.paginate(select(self.sql_entity_cls))
+    async def get_many(self, obj_ids: Sequence[int | UUID]) -> list[Optional[T_Entity]]:
+        found: dict[int | UUID, T_Entity] = {}
+        for chunk in chunked(list(dict.fromkeys(obj_ids)), self.bulk_chunk_size):
+            if not all(isinstance(obj_id, (int, UUID)) for obj_id in chunk):
+                raise ValueError(f'Unsupported obj_id types: {set(type(obj_id) for obj_id in chunk)}')
+            ids = [obj_id for obj_id in chunk if isinstance(obj_id, int)]
+            uuids = [obj_id for obj_id in chunk if isinstance(obj_id, UUID)]
+            conditions = []
+            if ids:
+                conditions.append(getattr(self.sql_entity_cls, 'id').in_(ids))
+            if uuids:
+                conditions.append(getattr(self.sql_entity_cls, 'uuid').in_(uuids))
+
+            sql_entities = await self._reader.scalars(select(self.sql_entity_cls).where(or_(*conditions)))
+            for entity in await self.models_validate(list(sql_entities)):
+                if entity.id is not None:
+                    found[entity.id] = entity
+                found[entity.uuid] = entity
+        return [found.get(obj_id) for obj_id in obj_ids]
+
+    async def list(
+        self, page: Page, entity_filter: Optional[T_Filter] = None, fields: Optional[Sequence[str]] = None
+    ) -> list[T_Entity]:
+        if (statement := self.get_statement('list', entity_filter, page, fields)) is not None:
+            query, params = statement
+        elif isinstance(page, KeysetPage):
+            query = self.apply_filter(self.get_select(fields), entity_filter)
+            query = self.apply_keyset(query, page, entity_filter)
+            params = {}
+        else:
+            query = page.paginate(self.get_select(fields))
+            query = self.apply_filter(query, entity_filter)
+            query = self.apply_order_by(query, entity_filter)
+            params = {}
+
+        if fields is not None:
+            return self.rows_validate((await self._reader.execute(query, params)).all(), fields)
+
+        sql_entities = await self._reader.scalars(query, params)
+
+        return await self.models_validate(list(sql_entities))
+
+    async def list_with_count(
+        self, page: Page, entity_filter: Optional[T_Filter] = None, fields: Optional[Sequence[str]] = None
+    ) -> tuple[List[T_Entity], int]:
+        query = self.apply_filter(self.get_select(fields), entity_filter)
+        if isinstance(page, KeysetPage):
+            # a window would count only the rows after the cursor
+            total = self.apply_filter(select(count()).select_from(self.sql_entity_cls), entity_filter)
+            query = self.apply_keyset(query.add_columns(total.scalar_subquery()), page, entity_filter)
+            first_page = page.cursor is None
+        else:
+            query = page.paginate(self.apply_order_by(query.add_columns(count().over()), entity_filter))
+            first_page = page.offset == 0
+
+        rows = (await self._reader.execute(query)).all()
+        if not rows:
+            # an empty page has no row to carry the total
+            return [], 0 if first_page else await self.count(entity_filter)
+        if fields is not None:
+            return self.rows_validate(rows, fields), rows[0][-1]
+        return await self.models_validate([row[0] for row in rows]), rows[0][1]
+
+    async def iter(
+        self,
+        entity_filter: Optional[T_Filter] = None,
+        batch_size: int = 1000,
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T_Entity]:
+        query = self.get_select(fields).execution_options(yield_per=batch_size)
         query = self.apply_filter(query, entity_filter)
         query = self.apply_order_by(query, entity_filter)
 
-        sql_entities = await self._session.scalars(query)
+        # server-side cursor, the rows are fetched by batches of `yield_per` rows
+        if fields is not None:
+            rows = await self._reader.stream(query)
+            async for partition in rows.partitions():
+                for entity in self.rows_validate(partition, fields):
+                    yield entity
+            return
 
-        return await self.models_validate(list(sql_entities))
+        result = await self._reader.stream_scalars(query)
+        async for sql_entities in result.partitions():
+            for entity in await self.models_validate(list(sql_entities)):
+                yield entity
 
     async def count(self, entity_filter: Optional[T_Filter] = None) -> int:
-        query = select(count()).select_from(self.sql_entity_cls)
-        query = self.apply_filter(query, entity_filter)
-        return await self._session.scalar(query) or 0
+        if (statement := self.get_statement('count', entity_filter)) is not None:
+            query, params = statement
+        else:
+            query = self.apply_filter(select(count()).select_from(self.sql_entity_cls), entity_filter)
+            params = {}
+        return await self._reader.scalar(query, params) or 0
 
     async def add(self, entity: T_Entity) -> T_Entity:
+        await self.begin_write()
 
         sql_entity = self.on_add(entity)
 
@@ -145,9 +520,7 @@ class SQLGenericRepo(Generic[T_SQL_Entity, T_Entity, T_Filter], SQLRepo, BaseRep
         try:
             await self._session.flush()
         except IntegrityError as err:
-            if 'duplicate key value violates unique constraint' in str(
-                err
-            ) or 'asyncpg.exceptions.UniqueViolationError' in str(err.orig):
+            if self.is_already_exists_error(err):
                 raise self.already_exists_err(
                     f'{self.entity_cls.__name__} already exists: {getattr(sql_entity, "uuid")}'
                 ) from err
@@ -160,12 +533,30 @@ class SQLGenericRepo(Generic[T_SQL_Entity, T_Entity, T_Filter], SQLRepo, BaseRep
             )
         return new_entity
 
+    async def add_many(self, entities: Sequence[T_Entity], chunk_size: Optional[int] = None) -> List[T_Entity]:
+        await self.begin_write()
+        query = insert(self.sql_entity_cls).returning(self.sql_entity_cls, sort_by_parameter_order=True)
+
+        results: List[T_Entity] = []
+        for chunk in chunked(entities, chunk_size or self.bulk_chunk_size):
+            try:
+                sql_entities = await self._session.scalars(query, [self.get_add_values(entity) for entity in chunk])
+            except IntegrityError as err:
+                if self.is_already_exists_error(err):
+                    raise self.already_exists_err(
+                        f'{self.entity_cls.__name__} already exists: one of {len(chunk)} entities from {chunk[0].uuid}'
+                    ) from err
+                raise
+            results.extend(await self.models_validate(list(sql_entities)))
+        return results
+
     async def update(
         self,
         entity: T_Entity,
         entity_filter: Optional[T_Filter] = None,
         model_dump: Optional[dict[str, Any]] = None,
     ) -> int:
+        await self.begin_write()
         model_dump = model_dump or {'exclude': {'id', 'uuid'}}
         query = update(self.sql_entity_cls).filter_by(uuid=entity.uuid)
         query = self.apply_filter(query, entity_filter).values(**(await self.get_update_values(entity, model_dump)))
@@ -173,7 +564,108 @@ class SQLGenericRepo(Generic[T_SQL_Entity, T_Entity, T_Filter], SQLRepo, BaseRep
         assert isinstance(result, CursorResult)
         return result.rowcount or 0
 
+    async def update_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> int:
+        await self.begin_write()
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
+        columns = getattr(self.sql_entity_cls, '__mapper__').columns
+        table = getattr(self.sql_entity_cls, '__table__')
+
+        total = 0
+        for keys, group in (await self._group_by_update_keys(entities, model_dump)).items():
+            # the attributes are mapped to the columns, their names may differ
+            query = (
+                update(table)
+                .where(columns['uuid'] == bindparam('_uuid'))
+                .values({columns[key]: bindparam(f'_v_{key}') for key in keys})
+            )
+            rows = [
+                {'_uuid': entity.uuid, **{f'_v_{key}': value for key, value in values.items()}}
+                for _, entity, values in group
+            ]
+            for chunk in chunked(rows, chunk_size or self.bulk_chunk_size):
+                result = await self._session.execute(query, chunk)
+                assert isinstance(result, CursorResult)
+                # not every driver reports the rowcount of executemany
+                total += result.rowcount if result.rowcount >= 0 else len(chunk)
+        return total
+
+    async def upsert_many(
+        self,
+        entities: Sequence[T_Entity],
+        model_dump: Optional[dict[str, Any]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[T_Entity]:
+        """Uses INSERT ... ON CONFLICT on PostgreSQL and SQLite, other dialects select the existing uuids
+        and then update and insert, so a concurrent insert of the same uuid raises `already_exists_err`
+        """
+        if not entities:
+            return []
+        await self.begin_write()
+        model_dump = model_dump or {'exclude': {'id', 'uuid'}}
+        dialect_insert = self.get_dialect_insert()
+        columns = getattr(self.sql_entity_cls, '__mapper__').columns
+
+        results: List[Optional[T_Entity]] = [None] * len(entities)
+        for keys, group in (await self._group_by_update_keys(entities, model_dump)).items():
+            for chunk in chunked(group, chunk_size or self.bulk_chunk_size):
+                chunk_entities = [entity for _, entity, _ in chunk]
+                try:
+                    if dialect_insert is None:
+                        upserted = await self._upsert_by_select(chunk_entities, model_dump)
+                    else:
+                        query = dialect_insert(self.sql_entity_cls)
+                        query = query.on_conflict_do_update(
+                            index_elements=[columns['uuid']],
+                            set_={columns[key]: query.excluded[columns[key].key] for key in keys},
+                        ).returning(self.sql_entity_cls, sort_by_parameter_order=True)
+                        sql_entities = await self._session.scalars(
+                            query,
+                            [self.get_add_values(entity) for entity in chunk_entities],
+                            execution_options={'populate_existing': True},
+                        )
+                        upserted = await self.models_validate(list(sql_entities))
+                except IntegrityError as err:
+                    if self.is_already_exists_error(err):
+                        raise self.already_exists_err(
+                            f'{self.entity_cls.__name__} already exists: '
+                            f'one of {len(chunk)} entities from {chunk_entities[0].uuid}'
+                        ) from err
+                    raise
+                for (index, _, _), entity in zip(chunk, upserted):
+                    results[index] = entity
+        return [entity for entity in results if entity is not None]
+
+    async def _group_by_update_keys(
+        self, entities: Sequence[T_Entity], model_dump: dict[str, Any]
+    ) -> dict[tuple[str, ...], List[tuple[int, T_Entity, dict[str, Any]]]]:
+        """Groups the entities by the set of updated attributes, so every group is a single executemany statement"""
+        groups: dict[tuple[str, ...], List[tuple[int, T_Entity, dict[str, Any]]]] = {}
+        for index, entity in enumerate(entities):
+            values = await self.get_update_values(entity, dict(model_dump))
+            groups.setdefault(tuple(values), []).append((index, entity, values))
+        return groups
+
+    async def _upsert_by_select(self, entities: List[T_Entity], model_dump: dict[str, Any]) -> List[T_Entity]:
+        """Upsert of the dialects without ON CONFLICT, returns the entities in the order of `entities`"""
+        uuid_column = getattr(self.sql_entity_cls, 'uuid')
+        uuids = [entity.uuid for entity in entities]
+        existing = set(await self._session.scalars(select(uuid_column).where(uuid_column.in_(uuids))))
+        await self.update_many([entity for entity in entities if entity.uuid in existing], model_dump)
+        await self.add_many([entity for entity in entities if entity.uuid not in existing])
+        sql_entities = await self._session.scalars(
+            select(self.sql_entity_cls).where(uuid_column.in_(uuids)),
+            execution_options={'populate_existing': True},
+        )
+        by_uuid = {entity.uuid: entity for entity in await self.models_validate(list(sql_entities))}
+        return [by_uuid[uuid] for uuid in uuids]
+
     async def update_by_filter(self, entity_filter: T_Filter, values: dict[str, Any]) -> int:
+        await self.begin_write()
         query = update(self.sql_entity_cls)
         query = self.apply_filter(query, entity_filter).values(**values)
         result = await self._session.execute(query)
@@ -181,6 +673,7 @@ class SQLGenericRepo(Generic[T_SQL_Entity, T_Entity, T_Filter], SQLRepo, BaseRep
         return result.rowcount or 0
 
     async def remove(self, entity_filter: T_Filter) -> int:
+        await self.begin_write()
         query = delete(self.sql_entity_cls)
         query = self.apply_filter(query, entity_filter)
         result = await self._session.execute(query)
@@ -1,8 +1,73 @@
-from typing import Any
+import operator
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
 
-from sqlalchemy import UnaryExpression, asc, desc
+from sqlalchemy import ColumnElement, UnaryExpression, asc, desc
+
+from clean_arch.application.caching import CacheStats
+
+SQL_FILTER_OPERATORS: dict[str, Callable[[Any, Any], ColumnElement[bool]]] = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'in': lambda column, values: column.in_(values),
+    'isnull': lambda column, value: column.is_(None) if value else column.is_not(None),
+    'startswith': lambda column, value: column.startswith(value, autoescape=True),
+}
+"""SQL expressions of the operators of `clean_arch.utils.filters`, `== None` and `!= None` are rendered as IS NULL"""
+
+SQL_BOUND_FILTER_OPERATORS: dict[str, Callable[[Any, Any], ColumnElement[bool]]] = {
+    **SQL_FILTER_OPERATORS,
+    'startswith': lambda column, param: column.startswith(param, escape='/'),
+}
+"""`SQL_FILTER_OPERATORS` comparing to bound parameters, the values of `startswith` are escaped by `escape_like`"""
+
+
+def escape_like(value: str) -> str:
+    """Escapes the wildcards of a LIKE pattern with '/'
+
+    >>> escape_like('50%_a/b')
+    '50/%/_a//b'
+    """
+    return value.replace('/', '//').replace('%', '/%').replace('_', '/_')
 
 
 def parse_order_by_string(order_by: str) -> list[UnaryExpression[Any]]:
     items = (item.strip().lower() for item in order_by.split(','))
     return [desc(item[1:]) if item.startswith('-') else asc(item) for item in items]
+
+
+class StatementCache:
+    """LRU cache of the statements with bound parameters by the shapes of the queries.
+
+    A query of a known shape skips building the statement, and SQLAlchemy reuses the cache key
+    memoized by the statement, so only the parameters are new.
+    """
+
+    def __init__(self, max_size: int = 256) -> None:
+        if max_size <= 0:
+            raise ValueError('max_size must be positive')
+        self.max_size = max_size
+        self.stats = CacheStats()
+        self._statements: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def get(self, shape: Hashable, build: Callable[[], Any]) -> Any:
+        """Returns the statement of the `shape`, built by `build` if it is not cached"""
+        statement = self._statements.get(shape)
+        if statement is not None:
+            self.stats.hits += 1
+            self._statements.move_to_end(shape)
+            return statement
+
+        self.stats.misses += 1
+        statement = self._statements[shape] = build()
+        while len(self._statements) > self.max_size:
+            self._statements.popitem(last=False)
+            self.stats.evictions += 1
+        return statement
+
+    def clear(self) -> None:
+        self._statements.clear()
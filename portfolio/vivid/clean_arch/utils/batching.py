@@ -0,0 +1,15 @@
+from typing import Iterator, Sequence, TypeVar
+
+_T = TypeVar('_T')
+
+
+def chunked(items: Sequence[_T], size: int) -> Iterator[Sequence[_T]]:
+    """Splits a sequence into consecutive chunks of at most `size` items.
+
+    >>> [list(chunk) for chunk in chunked([1, 2, 3, 4, 5], 2)]
+    [[1, 2], [3, 4], [5]]
+    """
+    if size <= 0:
+        raise ValueError(f'Chunk size must be positive: {size}')
+    for start in range(0, len(items), size):
+        yield items[start : start + size]  # noqa: E203
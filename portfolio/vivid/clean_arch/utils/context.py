@@ -0,0 +1,73 @@
+"""
+This module contains utils for the state bound to the current asyncio task.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import Any, Callable, Generic, Optional, TypeVar, overload
+
+_V = TypeVar('_V')
+_MISSING: Any = object()
+
+
+class TaskLocal(Generic[_V]):
+    """Attribute with a separate value for every asyncio task, stored in a context variable of the instance.
+
+    The tasks created inside a task see the values of the parent task at the moment of creation,
+    the values set by a task are not seen by the other tasks. A missing value raises AttributeError,
+    unless `default_factory` is given, so `hasattr` and `del` work like for the plain attributes.
+    The values are not copied for the tasks, so a value mutated in place by a task is seen by its parent,
+    the state of a single task is kept in immutable values rebound on change.
+
+    >>> import asyncio
+    >>> class Repo:
+    ...     session = TaskLocal[str]()
+    >>> repo = Repo()
+    >>> async def use(name: str) -> str:
+    ...     repo.session = name
+    ...     await asyncio.sleep(0)
+    ...     return repo.session
+    >>> async def main() -> list[str]:
+    ...     return await asyncio.gather(use('a'), use('b'))
+    >>> asyncio.run(main())
+    ['a', 'b']
+    >>> hasattr(repo, 'session')
+    False
+    """
+
+    def __init__(self, default_factory: Optional[Callable[[], _V]] = None) -> None:
+        self._default_factory = default_factory
+        self._name = ''
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self._name = name
+
+    def _get_var(self, instance: Any) -> ContextVar[Any]:
+        key = f'_task_local_{self._name}'
+        if (var := instance.__dict__.get(key)) is None:
+            var = instance.__dict__[key] = ContextVar(f'{type(instance).__name__}.{self._name}', default=_MISSING)
+        return var
+
+    @overload
+    def __get__(self, instance: None, owner: type) -> TaskLocal[_V]:
+        ...
+
+    @overload
+    def __get__(self, instance: object, owner: type) -> _V:
+        ...
+
+    def __get__(self, instance: Any, owner: type) -> TaskLocal[_V] | _V:
+        if instance is None:
+            return self
+        value = self._get_var(instance).get()
+        if value is _MISSING:
+            if self._default_factory is None:
+                raise AttributeError(self._name)
+            return self._default_factory()
+        return value
+
+    def __set__(self, instance: Any, value: _V) -> None:
+        self._get_var(instance).set(value)
+
+    def __delete__(self, instance: Any) -> None:
+        self._get_var(instance).set(_MISSING)
@@ -0,0 +1,84 @@
+"""
+Operators of the filters. A field of a filter named `{field}__{operator}` compares the field of the entities
+by the operator, the rest of the fields are compared by equality. Nulls never match the comparisons,
+like in SQL: `score__gte=1` does not match `score=None`.
+"""
+from __future__ import annotations
+
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Collection, Sequence
+
+Condition = tuple[str, str, Any]
+"""Field, operator and value"""
+
+
+def _in(value: Any, options: Collection[Any]) -> bool:
+    return value is not None and value in options
+
+
+def _startswith(value: Any, prefix: str) -> bool:
+    return isinstance(value, str) and value.startswith(prefix)
+
+
+def _not_null(compare: Callable[[Any, Any], bool]) -> Callable[[Any, Any], bool]:
+    return lambda value, expected: value is not None and compare(value, expected)
+
+
+FILTER_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    'eq': operator.eq,
+    'ne': _not_null(operator.ne),
+    'gt': _not_null(operator.gt),
+    'gte': _not_null(operator.ge),
+    'lt': _not_null(operator.lt),
+    'lte': _not_null(operator.le),
+    'in': _in,
+    'isnull': lambda value, expected: (value is None) == bool(expected),
+    'startswith': _startswith,
+}
+"""Operators by name: (the value of the entity, the value of the filter) -> bool"""
+
+
+@lru_cache(maxsize=1024)
+def parse_filter_key(key: str) -> tuple[str, str]:
+    """Splits a key of a filter into the field and the operator.
+
+    >>> parse_filter_key('score__gte')
+    ('score', 'gte')
+    >>> parse_filter_key('created_at')
+    ('created_at', 'eq')
+    >>> parse_filter_key('parent__name')
+    ('parent__name', 'eq')
+    """
+    field, separator, name = key.rpartition('__')
+    if separator and field and name in FILTER_OPERATORS:
+        return field, name
+    return key, 'eq'
+
+
+def compile_filter(conditions: Sequence[Condition], attrs: bool = True) -> Callable[[Any], bool]:
+    """Compiles the conditions into a predicate of the items, so they are parsed once for all the items.
+
+    :param conditions: (field, operator, value) tuples, see `BaseEntityFilterModel.get_conditions`.
+    :param attrs: True if items are objects, False if items are dictionaries.
+
+    >>> is_adult = compile_filter([('age', 'gte', 18), ('name', 'isnull', False)], attrs=False)
+    >>> [is_adult(item) for item in ({'age': 20, 'name': 'a'}, {'age': 10, 'name': 'b'}, {'age': 30, 'name': None})]
+    [True, False, False]
+    """
+    checks = []
+    for field, name, value in conditions:
+        if name == 'in':
+            try:
+                value = frozenset(value)
+            except TypeError:
+                pass
+        get = operator.attrgetter(field) if attrs else operator.itemgetter(field)
+        checks.append((get, FILTER_OPERATORS[name], value))
+
+    if not checks:
+        return lambda item: True
+    if len(checks) == 1:
+        [(get, compare, value)] = checks
+        return lambda item: compare(get(item), value)
+    return lambda item: all(compare(get(item), value) for get, compare, value in checks)
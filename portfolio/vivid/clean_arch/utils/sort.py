@@ -1,16 +1,39 @@
-from functools import cmp_to_key
+import heapq
+from functools import lru_cache
 from operator import attrgetter, itemgetter
-from typing import Any, Callable
+from typing import Any, Callable, Optional, Sequence
 
 
-def multikeysort(items: list[Any], columns: str, attrs: bool = True) -> list[Any]:
+@lru_cache(maxsize=256)
+def compile_order_by(columns: str, attrs: bool = True) -> tuple[tuple[Callable[[Any], Any], bool], ...]:
+    """Compile comma separated columns into pairs of a getter and a descending flag, cached per columns.
+
+    >>> [descending for _, descending in compile_order_by('name, -created_at')]
+    [False, True]
+    """
+    getter = attrgetter if attrs else itemgetter
+    return tuple((getter(name), descending) for name, descending in parse_order_by(columns))
+
+
+def _nulls_last(fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Wraps a getter to order the null values after the rest of the values"""
+
+    def key(item: Any) -> tuple[bool, Any]:
+        value = fn(item)
+        return value is None, value
+
+    return key
+
+
+def multikeysort(items: list[Any], columns: str, attrs: bool = True, limit: Optional[int] = None) -> list[Any]:
     """Perform a multiple column sort on a list of dictionaries or objects.
 
     :param items: List of dictionaries or objects to be sorted.
     :param columns: Comma separated columns to sort by, optionally preceded by a '-' for descending order.
     :param attrs: True if items are objects, False if items are dictionaries.
+    :param limit: Return only the first `limit` items, without sorting the rest of them.
 
-    :return: Sorted list of items.
+    :return: Sorted list of items. The null values go last, and first in descending order, like in PostgreSQL.
 
     >>> from collections import namedtuple
     >>> Customer = namedtuple('Customer', ['id', 'opens', 'clicks'])
@@ -22,30 +45,81 @@ def multikeysort(items: list[Any], columns: str, attrs: bool = True) -> list[Any
     >>> assert multikeysort(customers, 'opens,-clicks') == [customer1, customer2, customer3]
     >>> assert multikeysort(customers, 'opens,clicks') == [customer2, customer1, customer3]
     >>> assert multikeysort(customers, '-opens,-clicks') == [customer3, customer1, customer2]
+    >>> assert multikeysort(customers, '-opens,clicks', limit=2) == [customer3, customer2]
+    >>> multikeysort([{'a': None}, {'a': 2}, {'a': 1}], 'a', attrs=False)
+    [{'a': 1}, {'a': 2}, {'a': None}]
     """
-    getter = attrgetter if attrs else itemgetter
+    comparers = [
+        (_nulls_last(fn) if any(fn(item) is None for item in items) else fn, descending)
+        for fn, descending in compile_order_by(columns, attrs)
+    ]
+    if limit is not None and limit < len(items):
+        if limit <= 0:
+            return []
+        # only the items up to the `limit`-th value of the first column can get into the result
+        fn, descending = comparers[0]
+        boundary = fn((heapq.nlargest if descending else heapq.nsmallest)(limit, items, key=fn)[-1])
+        if descending:
+            items = [item for item in items if fn(item) >= boundary]
+        else:
+            items = [item for item in items if fn(item) <= boundary]
+
+    # stable sorts by every column starting from the last one
+    results = list(items)
+    for fn, descending in reversed(comparers):
+        results.sort(key=fn, reverse=descending)
+    return results if limit is None else results[:limit]
+
+
+def parse_order_by(columns: str) -> list[tuple[str, bool]]:
+    """Parse comma separated columns into pairs of a column name and a descending flag.
+
+    >>> parse_order_by('name, -created_at')
+    [('name', False), ('created_at', True)]
+    """
+    result: list[tuple[str, bool]] = []
+    for col in columns.split(','):
+        col = col.strip()
+        if col.startswith('-'):
+            result.append((col[1:], True))
+        else:
+            result.append((col, False))
+    return result
+
+
+def keyset_paginate(
+    items: list[Any],
+    columns: str,
+    after: Optional[Sequence[Any]],
+    limit: int,
+    attrs: bool = True,
+) -> list[Any]:
+    """Perform a keyset pagination on a list of dictionaries or objects.
+
+    :param items: List of dictionaries or objects to be paginated.
+    :param columns: Comma separated columns to sort by, the last one should be unique.
+    :param after: Values of the columns of the last item of the previous page, None for the first page.
+    :param limit: Max number of items in the page, non-positive for no limit.
+    :param attrs: True if items are objects, False if items are dictionaries.
+
+    :return: Sorted items following the `after` values.
+
+    >>> items = [{'id': 1, 'score': 5}, {'id': 2, 'score': 7}, {'id': 3, 'score': 5}]
+    >>> keyset_paginate(items, '-score,id', None, 2, attrs=False)
+    [{'id': 2, 'score': 7}, {'id': 1, 'score': 5}]
+    >>> keyset_paginate(items, '-score,id', [5, 1], 2, attrs=False)
+    [{'id': 3, 'score': 5}]
+    """
+    comparers = compile_order_by(columns, attrs)
+
+    def is_after(item: Any) -> bool:
+        assert after is not None
+        for (fn, descending), value in zip(comparers, after):
+            item_value = fn(item)
+            if item_value != value:
+                return bool(item_value < value) if descending else bool(item_value > value)
+        return False
 
-    def get_comparers() -> list[tuple[Callable[[Any], Any], int]]:
-        comparers: list[tuple[Callable[[Any], Any], int]] = []
-
-        for col in columns.split(','):
-            col = col.strip()
-            if col.startswith('-'):  # If descending, strip '-' and create a comparer with reverse order
-                key = getter(col[1:])
-                order = -1
-            else:  # If ascending, use the column directly
-                key = getter(col)
-                order = 1
-
-            comparers.append((key, order))
-        return comparers
-
-    def custom_compare(left: Any, right: Any) -> int:
-        """Custom comparison function to handle multiple keys"""
-        for fn, reverse in get_comparers():
-            result = (fn(left) > fn(right)) - (fn(left) < fn(right))
-            if result != 0:
-                return result * reverse
-        return 0
-
-    return sorted(items, key=cmp_to_key(custom_compare))
+    if after is not None:
+        items = [item for item in items if is_after(item)]
+    return multikeysort(items, columns, attrs, limit=limit if limit > 0 else None)
@@ -3,15 +3,36 @@ This module contains utils for validation of data of inbound requests and entiti
 """
 from __future__ import annotations
 
-from typing import Any, Callable, ClassVar, TypeVar
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, ClassVar, Type, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 DataValidatorType = Callable[[Any, dict[Any, Any]], None]
 _EVT = TypeVar('_EVT', bound=BaseModel)
 EntityValidatorType = Callable[[_EVT, Any, dict[Any, Any]], None]
 
 
+class Hydration(str, Enum):
+    """How the repositories turn the stored rows into entities"""
+
+    VALIDATE = 'validate'
+    """Every row is validated by `model_validate` of the repository, which may be customized"""
+
+    BATCH = 'batch'
+    """The rows are validated at once by a cached `TypeAdapter(list[Entity])`"""
+
+    CONSTRUCT = 'construct'
+    """The rows come from a trusted schema, so the entities are built by `model_construct` without validation"""
+
+
+@lru_cache(maxsize=None)
+def get_list_adapter(model_cls: Type[_EVT]) -> TypeAdapter[list[_EVT]]:
+    """Returns a cached adapter validating lists of the models, building an adapter is expensive"""
+    return TypeAdapter(list[model_cls])  # type: ignore[valid-type]
+
+
 class EntityValidator:
     """A class for validation of data and entities.
 
@@ -0,0 +1,8 @@
+import pytest
+
+from tests.repos import BACKENDS
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request: pytest.FixtureRequest) -> str:
+    return request.param
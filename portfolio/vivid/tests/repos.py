@@ -0,0 +1,124 @@
+"""Entities and repositories of the tests, the same items are stored by the SQL, Redis and mock backends"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+from uuid import UUID, uuid4
+
+import fakeredis
+from sqlalchemy import Integer, String, Uuid, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from clean_arch.domain.entities import EntityFilterModel, EntityModel
+from clean_arch.domain.exceptions import DomainException
+from clean_arch.infra.mock.repositories import MockGenericRepo
+from clean_arch.infra.redis.repositories import RedisGenericHashRepo, RedisGenericSimpleRepo
+from clean_arch.infra.sql.repositories import SQLGenericRepo
+
+BACKENDS = ('sql', 'redis', 'mock')
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class SQLItem(Base):
+    __tablename__ = 'items'
+
+    id: Mapped[int] = mapped_column(Integer(), primary_key=True, autoincrement=True)
+    uuid: Mapped[UUID] = mapped_column(Uuid(), default=uuid4, unique=True)
+    name: Mapped[str] = mapped_column(String())
+    score: Mapped[Optional[int]] = mapped_column(Integer(), nullable=True)
+    status: Mapped[str] = mapped_column(String(), default='new')
+
+
+class Item(EntityModel):
+    name: str
+    score: Optional[int] = None
+    status: str = 'new'
+
+
+class ItemFilter(EntityFilterModel):
+    name: Optional[str] = None
+    name__startswith: Optional[str] = None
+    score: Optional[int] = None
+    score__gte: Optional[int] = None
+    score__lt: Optional[int] = None
+    score__isnull: Optional[bool] = None
+    status: Optional[str] = None
+    status__in: Optional[list[str]] = None
+
+
+class ItemAlreadyExists(DomainException):
+    pass
+
+
+class SQLItemRepo(SQLGenericRepo[SQLItem, Item, ItemFilter]):
+    sql_entity_cls = SQLItem
+    entity_cls = Item
+    filter_cls = ItemFilter
+    already_exists_err = ItemAlreadyExists
+
+
+class RedisItemRepo(RedisGenericSimpleRepo[Item, ItemFilter]):
+    entity_cls = Item
+    filter_cls = ItemFilter
+    already_exists_err = ItemAlreadyExists
+    indexed_fields = ('status',)
+    sorted_indexed_fields = ('score',)
+
+
+class RedisHashItemRepo(RedisGenericHashRepo[Item, ItemFilter]):
+    entity_cls = Item
+    filter_cls = ItemFilter
+    already_exists_err = ItemAlreadyExists
+    indexed_fields = ('status',)
+    sorted_indexed_fields = ('score',)
+
+
+class MockItemRepo(MockGenericRepo[Item, ItemFilter]):
+    entity_cls = Item
+    filter_cls = ItemFilter
+    already_exists_err = ItemAlreadyExists
+    _mock_store = {}
+
+
+def make_sql_engine(url: Optional[str] = None) -> Any:
+    """SQLite in memory by default, BEGIN is emitted by SQLAlchemy, so the SAVEPOINTs of the nested contexts work.
+    The sessions share the connection of a database in memory, so the concurrent sessions need a file.
+    """
+    engine = create_async_engine(url or 'sqlite+aiosqlite:///:memory:')
+
+    @event.listens_for(engine.sync_engine, 'connect')
+    def connect(dbapi_connection: Any, connection_record: Any) -> None:
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, 'begin')
+    def begin(connection: Any) -> None:
+        connection.exec_driver_sql('BEGIN')
+
+    return engine
+
+
+async def make_repo(backend: str, sql_url: Optional[str] = None) -> Any:
+    """Returns an empty repository of the backend: 'sql', 'redis', 'redis_hash' or 'mock'"""
+    if backend == 'sql':
+        engine = make_sql_engine(sql_url)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        return SQLItemRepo(async_sessionmaker(engine, expire_on_commit=False))
+    if backend == 'redis':
+        return RedisItemRepo(fakeredis.FakeAsyncRedis(), prefix='items')
+    if backend == 'redis_hash':
+        return RedisHashItemRepo(fakeredis.FakeAsyncRedis(), prefix='items')
+    if backend == 'mock':
+        return MockItemRepo(store={})
+    raise ValueError(f'Unknown backend: {backend}')
+
+
+async def add_items(repo: Any, *items: Item) -> list[Item]:
+    async with repo:
+        added = await repo.add_many(list(items))
+        await repo.commit()
+    return added
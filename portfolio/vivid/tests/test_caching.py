@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from clean_arch.application.caching import CacheBackend, CachedRepo, LRUCacheBackend
+from clean_arch.domain.entities import LimitOffset
+from clean_arch.infra.redis.cache import RedisCacheBackend
+from tests.repos import Item, ItemFilter, add_items, make_repo
+
+
+def make_cache(cache: str) -> CacheBackend:
+    return LRUCacheBackend() if cache == 'lru' else RedisCacheBackend(fakeredis.FakeAsyncRedis())
+
+
+@pytest.mark.parametrize('cache', ['lru', 'redis'])
+def test_commit_invalidates_the_cached_reads(backend: str, cache: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        a, b = await add_items(repo, Item(name='a'), Item(name='b'))
+        cached = CachedRepo(repo, make_cache(cache))
+
+        async def read() -> tuple[str, list[str], int]:
+            async with cached:
+                entity = await cached.get(a.uuid)
+                assert entity is not None
+                items = await cached.list(LimitOffset(), ItemFilter(status='new'))
+                return entity.name, sorted(item.name for item in items), await cached.count(ItemFilter(status='new'))
+
+        assert await read() == ('a', ['a', 'b'], 2)
+        hits = cached.stats.hits
+        assert await read() == ('a', ['a', 'b'], 2)
+        assert cached.stats.hits == hits + 3
+
+        async with cached:
+            await cached.update(a.model_copy(update={'name': 'a2'}))
+            await cached.commit()
+        assert await read() == ('a2', ['a2', 'b'], 2)
+
+        async with cached:
+            await cached.update_by_filter(ItemFilter(name='a2'), {'name': 'a3', 'status': 'done'})
+            await cached.commit()
+        assert await read() == ('a3', ['b'], 1)
+
+    asyncio.run(main())
+
+
+def test_shared_backend_sees_the_invalidation_of_another_repository(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        (a,) = await add_items(repo, Item(name='a'))
+        client = fakeredis.FakeAsyncRedis()
+        first = CachedRepo(repo, RedisCacheBackend(client), namespace='items')
+        second = CachedRepo(repo, RedisCacheBackend(client), namespace='items')
+
+        async with second:
+            assert await second.count() == 1
+            async with first:
+                await first.update(a.model_copy(update={'name': 'a2'}))
+                await first.add(Item(name='b'))
+                await first.commit()
+            # the session of `second` reads the generations of the keys on every call
+            assert await second.count() == 2
+            assert (await second.get(a.uuid)).name == 'a2'
+
+        # the keys of the replaced generations are deleted
+        generations = {json.loads(await client.get(f'cache:items:gen:{name}')) for name in ('queries', 'entities')}
+        keys = [key.decode().split(':') for key in await client.keys('cache:items:*')]
+        assert {key[2] for key in keys if key[2] != 'gen'} <= generations
+
+    asyncio.run(main())
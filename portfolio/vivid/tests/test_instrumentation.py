@@ -0,0 +1,26 @@
+import asyncio
+from typing import Any
+
+from clean_arch.application.instrumentation import RepoMetrics, count_round_trip, instrument
+
+
+class Target:
+    async def __aenter__(self) -> 'Target':
+        count_round_trip()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        count_round_trip()
+
+
+def test_session_exits_in_a_copy_of_the_context() -> None:
+    async def main() -> None:
+        metrics = RepoMetrics()
+        target = instrument(Target(), metrics, 'target')
+        await target.__aenter__()
+        # a task copies the context, so a token of the entered context can not reset the variable in it
+        await asyncio.ensure_future(target.__aexit__(None, None, None))
+
+        assert metrics.sessions['target'].round_trips == 2
+
+    asyncio.run(main())
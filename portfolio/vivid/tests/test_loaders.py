@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Sequence
+
+import pytest
+
+from clean_arch.application.loaders import EntityLoader
+from tests.repos import Item, add_items, make_repo
+
+
+def test_concurrent_loads_are_coalesced(backend: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        a, b, c = await add_items(repo, Item(name='a'), Item(name='b'), Item(name='c'))
+
+        batches: list[list[Any]] = []
+        get_many = repo.get_many
+
+        async def counting_get_many(obj_ids: Sequence[Any]) -> Any:
+            batches.append(list(obj_ids))
+            return await get_many(obj_ids)
+
+        monkeypatch.setattr(repo, 'get_many', counting_get_many)
+        async with repo:
+            loader = EntityLoader(repo, max_batch_size=3)
+            loaded = await asyncio.gather(
+                loader.load(a.id), loader.load(b.uuid), loader.load(a.id), loader.load(1000), loader.load(c.uuid)
+            )
+            assert [item and item.name for item in loaded] == ['a', 'b', 'a', None, 'c']
+            assert batches == [[a.id, b.uuid, 1000], [c.uuid]]
+
+            assert [item and item.name for item in await loader.load_many([c.id, b.id])] == ['c', 'b']
+            assert len(batches) == 3
+
+    asyncio.run(main())
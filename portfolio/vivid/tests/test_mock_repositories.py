@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from clean_arch.infra.mock.repositories import MockGenericRepo, MockStore
+from tests.repos import Item, ItemFilter, MockItemRepo, add_items
+
+
+@pytest.fixture
+def no_scan(monkeypatch: pytest.MonkeyPatch) -> None:
+    def scan(self: Any) -> Any:
+        raise AssertionError('the store is scanned')
+
+    monkeypatch.setattr(MockGenericRepo, '_iter_entities', scan)
+
+
+def test_declared_plain_dict_store_is_replaced() -> None:
+    assert isinstance(MockItemRepo._mock_store, MockStore)
+
+
+@pytest.mark.parametrize('store', [MockStore, dict])
+def test_get_by_id_and_uuid_does_not_scan(store: type, no_scan: None) -> None:
+    async def main() -> None:
+        repo = MockItemRepo(store=store())
+        first, second = await add_items(repo, Item(name='a'), Item(name='b'))
+        async with repo:
+            assert (await repo.get(second.id)).name == 'b'
+            assert (await repo.get(first.uuid)).name == 'a'
+            assert await repo.get(100) is None
+            assert [item.name for item in await repo.get_many([second.id, first.uuid])] == ['b', 'a']
+            assert await repo.count(ItemFilter(id=first.id)) == 1
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('store', [MockStore, dict])
+def test_index_sees_the_store_replaced_in_place(store: type) -> None:
+    async def main() -> None:
+        items = store()
+        repo = MockItemRepo(store=items)
+        [item] = await add_items(repo, Item(name='a'))
+        items[item.uuid] = item.model_copy(update={'id': 100})
+        async with repo:
+            assert await repo.get(item.id) is None
+            assert (await repo.get(100)).name == 'a'
+
+    asyncio.run(main())
+
+
+def test_session_does_not_copy_the_store() -> None:
+    async def main() -> None:
+        store: MockStore[Item] = MockStore()
+        repo = MockItemRepo(store=store)
+        a, b = await add_items(repo, Item(name='a'), Item(name='b'))
+        stored_a = store[a.uuid]
+
+        async with repo:
+            await repo.update(b.model_copy(update={'name': 'b2'}))
+            # the writes are kept by the journal of the session until commit
+            assert store[b.uuid].name == 'b'
+            await repo.commit()
+
+        assert store[b.uuid].name == 'b2'
+        assert store[a.uuid] is stored_a
+
+    asyncio.run(main())
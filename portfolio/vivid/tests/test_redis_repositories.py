@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from clean_arch.domain.entities import KeysetPage, LimitOffset
+from tests.repos import Item, ItemFilter, add_items, make_repo
+
+
+@pytest.mark.parametrize('backend', ['redis', 'redis_hash'])
+def test_entities_stored_without_the_ids_sorted_set_are_indexed(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        await add_items(repo, Item(name='a', score=1), Item(name='b', score=2))
+        # stored by a version without the sorted set of the ids
+        await repo._client.delete('items:ids', 'items:ids:built', 'items:zidx:score')
+
+        upgraded = type(repo)(repo._client, prefix='items')
+        await add_items(upgraded, Item(name='c', score=3))
+        async with upgraded:
+            assert await upgraded.count() == 3
+            assert await upgraded.count(ItemFilter(order_by='-score')) == 3
+            assert [item.name for item in await upgraded.list(LimitOffset())] == ['a', 'b', 'c']
+            assert [item.name for item in await upgraded.list(KeysetPage(limit=2))] == ['a', 'b']
+            assert [item.name for item in await upgraded.list(LimitOffset(), ItemFilter(order_by='-score'))] == [
+                'c',
+                'b',
+                'a',
+            ]
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('backend', ['redis', 'redis_hash'])
+def test_new_repository_does_not_scan_to_count(backend: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        await add_items(repo, Item(name='a'), Item(name='b'))
+
+        def scan(*args: object, **kwargs: object) -> None:
+            raise AssertionError('the keys are scanned')
+
+        monkeypatch.setattr(repo._client, 'scan_iter', scan)
+        async with type(repo)(repo._client, prefix='items') as other:
+            assert await other.count() == 2
+            assert [item.name for item in await other.list(LimitOffset())] == ['a', 'b']
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('backend', ['redis', 'redis_hash'])
+def test_indexed_filters_do_not_scan(backend: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        await add_items(repo, Item(name='a'), Item(name='b', status='done'), Item(name='c', score=3))
+
+        async def scan() -> None:
+            raise AssertionError('the keys are scanned')
+
+        monkeypatch.setattr(repo, '_scan_entity_keys', scan)
+        async with repo:
+            assert sorted(item.name for item in await repo.list(LimitOffset(), ItemFilter(status='new'))) == ['a', 'c']
+            assert await repo.count(ItemFilter(status='done')) == 1
+            assert [item.name for item in await repo.list(LimitOffset(), ItemFilter(score__gte=2))] == ['c']
+
+    asyncio.run(main())
+
+
+def test_hash_updates_of_different_fields_do_not_overwrite_each_other() -> None:
+    async def main() -> None:
+        repo = await make_repo('redis_hash')
+        (a,) = await add_items(repo, Item(name='a', score=1))
+        # both copies are read before the other update is committed
+        renamed, rescored = a.model_copy(update={'name': 'a2'}), a.model_copy(update={'score': 5, 'status': 'done'})
+
+        async with repo:
+            assert await repo.update(renamed, model_dump={'include': {'name'}}) == 1
+            await repo.commit()
+        async with repo:
+            assert await repo.update_many([rescored], model_dump={'include': {'score', 'status'}}) == 1
+            await repo.commit()
+
+        async with repo:
+            assert (await repo.get(a.uuid)).model_dump(include={'name', 'score', 'status'}) == {
+                'name': 'a2',
+                'score': 5,
+                'status': 'done',
+            }
+            # the indexes follow the partial updates
+            assert [item.name for item in await repo.list(LimitOffset(), ItemFilter(status='done'))] == ['a2']
+            assert [item.name for item in await repo.list(LimitOffset(), ItemFilter(score__gte=5))] == ['a2']
+            assert await repo.count(ItemFilter(status='new')) == 0
+
+    asyncio.run(main())
+
+
+def test_hash_update_by_filter_writes_only_the_values() -> None:
+    async def main() -> None:
+        repo = await make_repo('redis_hash')
+        _, b = await add_items(repo, Item(name='a', score=1), Item(name='b', score=2))
+
+        async with repo:
+            assert len(await repo.list(LimitOffset())) == 2
+            # a concurrent write of another field
+            await repo._client.hset(f'items:{b.uuid}', 'name', '"b2"')
+            assert await repo.update_by_filter(ItemFilter(score__gte=2), {'status': 'done'}) == 1
+            await repo.commit()
+
+        async with repo:
+            assert [
+                item.model_dump(include={'name', 'score', 'status'}) for item in await repo.list(LimitOffset())
+            ] == [
+                {'name': 'a', 'score': 1, 'status': 'new'},
+                {'name': 'b2', 'score': 2, 'status': 'done'},
+            ]
+
+    asyncio.run(main())
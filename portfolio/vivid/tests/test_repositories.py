@@ -0,0 +1,258 @@
+"""The same assertions against the SQL, Redis and mock repositories"""
+
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from clean_arch.domain.entities import KeysetPage, LimitOffset
+from clean_arch.utils.validation import Hydration
+from tests.repos import BACKENDS, Item, ItemFilter, add_items, make_repo
+
+
+def test_iter_fetches_all_the_entities_in_batches(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        await add_items(repo, *(Item(name=f'item-{i}', score=i, status='odd' if i % 2 else 'even') for i in range(7)))
+
+        async with repo:
+            assert sorted([item.score async for item in repo.iter(batch_size=2)]) == list(range(7))
+            assert sorted([item.score async for item in repo.iter(ItemFilter(status='odd'), batch_size=2)]) == [
+                1,
+                3,
+                5,
+            ]
+            assert [item async for item in repo.iter(ItemFilter(status='missing'))] == []
+
+            # the consumer may stop early
+            async for item in repo.iter(batch_size=2):
+                break
+            assert await repo.count() == 7
+
+    asyncio.run(main())
+
+
+def test_filters_follow_the_changes_of_the_entities(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        a, _, _ = await add_items(repo, Item(name='a'), Item(name='b'), Item(name='c', status='done'))
+
+        async def names(entity_filter: ItemFilter) -> list[str]:
+            return sorted(item.name for item in await repo.list(LimitOffset(), entity_filter))
+
+        async with repo:
+            assert await names(ItemFilter(status='new')) == ['a', 'b']
+            await repo.update(a.model_copy(update={'status': 'done'}))
+            await repo.update_by_filter(ItemFilter(name='c'), {'status': 'new'})
+            await repo.commit()
+
+        async with repo:
+            assert await names(ItemFilter(status='new')) == ['b', 'c']
+            assert await names(ItemFilter(status='done')) == ['a']
+            assert await names(ItemFilter(status__in=['done', 'missing'])) == ['a']
+            assert await repo.count(ItemFilter(status='new')) == 2
+
+    asyncio.run(main())
+
+
+def test_session_discards_the_uncommitted_writes(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        (a,) = await add_items(repo, Item(name='a'))
+
+        async with repo:
+            await repo.update(a.model_copy(update={'name': 'a2'}))
+            await repo.add(Item(name='b'))
+            # the session sees its own writes
+            assert sorted(item.name for item in await repo.list(LimitOffset())) == ['a2', 'b']
+
+        async with repo:
+            assert [item.name for item in await repo.list(LimitOffset())] == ['a']
+            assert await repo.count() == 1
+
+    asyncio.run(main())
+
+
+def test_ordered_pages_with_ties(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        await add_items(repo, *(Item(name=f'item-{i}', score=i % 3) for i in range(9)))
+        expected = sorted((f'item-{i}' for i in range(9)), key=lambda name: (-(int(name[5:]) % 3), name))
+
+        async with repo:
+            pages = [
+                await repo.list(LimitOffset(limit=4, offset=offset), ItemFilter(order_by='-score,name'))
+                for offset in (0, 4, 8)
+            ]
+        assert [[item.name for item in page] for page in pages] == [expected[:4], expected[4:8], expected[8:]]
+
+    asyncio.run(main())
+
+
+def test_concurrent_tasks_have_their_own_sessions(backend: str, tmp_path: Path) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend, sql_url=f'sqlite+aiosqlite:///{tmp_path / "items.db"}')
+        added = asyncio.Event()
+
+        async def write() -> None:
+            async with repo:
+                await repo.add(Item(name='a'))
+                added.set()
+                await asyncio.sleep(0.01)
+                await repo.commit()
+
+        async def read() -> int:
+            await added.wait()
+            # the uncommitted write of the other task is not seen
+            async with repo:
+                return await repo.count()
+
+        assert await asyncio.gather(write(), read()) == [None, 0]
+        async with repo:
+            assert await repo.count() == 1
+
+    asyncio.run(main())
+
+
+def test_nested_block_rolls_back_its_writes(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        (a,) = await add_items(repo, Item(name='a'))
+
+        async with repo:
+            await repo.add(Item(name='b'))
+            with pytest.raises(ZeroDivisionError):
+                async with repo:
+                    await repo.update(a.model_copy(update={'name': 'a2'}))
+                    async with repo:
+                        await repo.add(Item(name='c'))
+                    1 / 0
+            async with repo:
+                await repo.add(Item(name='d'))
+                with pytest.raises(ZeroDivisionError):
+                    async with repo:
+                        await repo.add(Item(name='e'))
+                        1 / 0
+            # a block without writes has nothing to roll back
+            with pytest.raises(ZeroDivisionError):
+                async with repo:
+                    await repo.count()
+                    1 / 0
+            assert sorted(item.name for item in await repo.list(LimitOffset())) == ['a', 'b', 'd']
+            await repo.commit()
+
+        async with repo:
+            assert sorted(item.name for item in await repo.list(LimitOffset())) == ['a', 'b', 'd']
+
+    asyncio.run(main())
+
+
+def test_list_with_count_walks_the_cursor_pages_with_ties(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        added = await add_items(repo, *(Item(name=f'item-{i}', score=i % 3, status=f'{i % 2}') for i in range(11)))
+        entity_filter = ItemFilter(status='0', order_by='-score')
+        expected = [
+            item.id for item in sorted(added, key=lambda item: (-(item.score or 0), item.id)) if item.status == '0'
+        ]
+
+        pages, totals = [], set()
+        page: Optional[KeysetPage] = KeysetPage(limit=2)
+        async with repo:
+            while page is not None:
+                items, total = await repo.list_with_count(page, entity_filter)
+                pages.append([item.id for item in items])
+                totals.add(total)
+                page = page.next_page(items, entity_filter.order_by)
+
+            assert await repo.list_with_count(LimitOffset(limit=2, offset=4), entity_filter) == (
+                await repo.list(LimitOffset(limit=2, offset=4), entity_filter),
+                6,
+            )
+        assert sum(pages, []) == expected
+        # a full page is followed by another one
+        assert [len(ids) for ids in pages] == [2, 2, 2, 0]
+        assert totals == {6}
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    'entity_filter, expected',
+    [
+        (ItemFilter(score__gte=2), ['c', 'd']),
+        (ItemFilter(score__lt=2), ['a', 'b_']),
+        (ItemFilter(score__gte=1, score__lt=3), ['b_', 'c']),
+        (ItemFilter(score__isnull=True), ['50%']),
+        (ItemFilter(score__isnull=False, status='new'), ['a', 'b_']),
+        (ItemFilter(status__in=['done', 'missing']), ['c', 'd']),
+        (ItemFilter(name__startswith='b_'), ['b_']),
+        (ItemFilter(name__startswith='50%'), ['50%']),
+        (ItemFilter(name__startswith='%'), []),
+    ],
+)
+@pytest.mark.parametrize('backend', [*BACKENDS, 'redis_hash'])
+def test_operator_filters(backend: str, entity_filter: ItemFilter, expected: list[str]) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        await add_items(
+            repo,
+            Item(name='a', score=0),
+            Item(name='b_', score=1),
+            Item(name='c', score=2, status='done'),
+            Item(name='d', score=3, status='done'),
+            Item(name='50%'),
+        )
+
+        async with repo:
+            assert sorted(item.name for item in await repo.list(LimitOffset(), entity_filter)) == expected
+            assert await repo.count(entity_filter) == len(expected)
+            assert await repo.update_by_filter(entity_filter, {'status': 'matched'}) == len(expected)
+            await repo.commit()
+
+        async with repo:
+            assert (
+                sorted(item.name for item in await repo.list(LimitOffset(), ItemFilter(status='matched'))) == expected
+            )
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('backend', [*BACKENDS, 'redis_hash'])
+def test_fields_load_partial_entities(backend: str) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        a, b = await add_items(repo, Item(name='a', score=1), Item(name='b', score=2, status='done'))
+
+        async with repo:
+            assert (await repo.get(a.uuid, fields=['name'])).model_dump() == {'name': 'a'}
+            assert [
+                item.model_dump()
+                for item in await repo.list(LimitOffset(), ItemFilter(order_by='-score'), fields=['name', 'score'])
+            ] == [{'name': 'b', 'score': 2}, {'name': 'a', 'score': 1}]
+            # the filtered fields need not be loaded
+            assert [item.model_dump() async for item in repo.iter(ItemFilter(status='done'), fields=['id'])] == [
+                {'id': b.id}
+            ]
+            with pytest.raises(ValueError):
+                await repo.list(LimitOffset(), fields=['missing'])
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('hydration', list(Hydration))
+@pytest.mark.parametrize('backend', ['sql', 'redis', 'redis_hash'])
+def test_hydration_modes_return_equal_entities(backend: str, hydration: Hydration) -> None:
+    async def main() -> None:
+        repo = await make_repo(backend)
+        added = await add_items(repo, Item(name='a', score=1), Item(name='b', status='done'))
+        repo.hydration = hydration
+
+        async with repo:
+            assert await repo.list(LimitOffset()) == added
+            assert await repo.get_many([added[1].uuid, added[0].id]) == added[::-1]
+            assert await repo.get(added[0].uuid) == added[0]
+            assert [item async for item in repo.iter(ItemFilter(status='done'))] == added[1:]
+
+    asyncio.run(main())
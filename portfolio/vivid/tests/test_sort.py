@@ -0,0 +1,21 @@
+import random
+from typing import Any, Optional
+
+import pytest
+
+from clean_arch.utils.sort import multikeysort
+
+
+def sort_key(item: dict[str, Any]) -> tuple[Any, ...]:
+    """The order of '-a,b' with the nulls last in ascending and first in descending order"""
+    a: Optional[int] = item['a']
+    return (a is not None, -(a or 0), item['b'] is None, item['b'] or 0)
+
+
+@pytest.mark.parametrize('limit', [None, 0, 1, 5, 50, 200])
+def test_multikeysort_matches_a_full_sort(limit: Optional[int]) -> None:
+    rnd = random.Random(limit)
+    items = [{'a': rnd.choice([None, *range(5)]), 'b': rnd.choice([None, *range(20)]), 'n': n} for n in range(100)]
+    expected = sorted(items, key=sort_key)
+
+    assert multikeysort(items, '-a,b', attrs=False, limit=limit) == expected[:limit]
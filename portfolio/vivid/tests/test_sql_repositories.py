@@ -0,0 +1,141 @@
+import asyncio
+from typing import Any, Callable, Optional, Type
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import Integer, String, Uuid
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Mapped, mapped_column
+
+from clean_arch.domain.entities import EntityFilterModel, EntityModel, LimitOffset
+from clean_arch.infra.sql.repositories import SQLGenericRepo
+from tests.repos import Base, Item, ItemAlreadyExists, ItemFilter, SQLItemRepo, add_items, make_repo, make_sql_engine
+
+
+class SQLRenamedItem(Base):
+    """The names of the columns differ from the attributes"""
+
+    __tablename__ = 'renamed_items'
+
+    id: Mapped[int] = mapped_column('item_id', Integer(), primary_key=True, autoincrement=True)
+    uuid: Mapped[UUID] = mapped_column('item_uuid', Uuid(), default=uuid4, unique=True)
+    name: Mapped[str] = mapped_column('item_name', String())
+    code: Mapped[str] = mapped_column('item_code', String(), unique=True)
+    score: Mapped[Optional[int]] = mapped_column('item_score', Integer(), nullable=True)
+
+
+class RenamedItem(EntityModel):
+    name: str
+    code: str
+    score: Optional[int] = None
+
+
+class RenamedItemFilter(EntityFilterModel):
+    name: Optional[str] = None
+
+
+class SQLRenamedItemRepo(SQLGenericRepo[SQLRenamedItem, RenamedItem, RenamedItemFilter]):
+    sql_entity_cls = SQLRenamedItem
+    entity_cls = RenamedItem
+    filter_cls = RenamedItemFilter
+    already_exists_err = ItemAlreadyExists
+
+
+class SQLRenamedItemNoUpsertRepo(SQLRenamedItemRepo):
+    """A dialect without ON CONFLICT"""
+
+    def get_dialect_insert(self) -> Optional[Callable[[Type[SQLRenamedItem]], Any]]:
+        return None
+
+
+async def make_renamed_repo(repo_cls: Type[SQLRenamedItemRepo] = SQLRenamedItemRepo) -> SQLRenamedItemRepo:
+    engine = make_sql_engine()
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    return repo_cls(async_sessionmaker(engine, expire_on_commit=False))
+
+
+def test_update_many_maps_the_attributes_to_the_columns() -> None:
+    async def main() -> None:
+        repo = await make_renamed_repo()
+        async with repo:
+            a, b = await repo.add_many([RenamedItem(name='a', code='a'), RenamedItem(name='b', code='b')])
+            await repo.commit()
+
+        async with repo:
+            assert await repo.update_many([a.model_copy(update={'name': 'a2', 'score': 1}), b]) == 2
+            await repo.commit()
+
+        async with repo:
+            assert [(item.name, item.score) for item in await repo.list(LimitOffset())] == [('a2', 1), ('b', None)]
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('repo_cls', [SQLRenamedItemRepo, SQLRenamedItemNoUpsertRepo])
+def test_upsert_many_updates_the_keys_of_every_entity(repo_cls: Type[SQLRenamedItemRepo]) -> None:
+    async def main() -> None:
+        repo = await make_renamed_repo(repo_cls)
+        async with repo:
+            a, b = await repo.add_many([RenamedItem(name='a', code='a', score=1), RenamedItem(name='b', code='b')])
+            await repo.commit()
+
+        model_dump = {'exclude_unset': True, 'exclude': {'id', 'uuid'}}
+        async with repo:
+            upserted = await repo.upsert_many(
+                [
+                    RenamedItem(uuid=a.uuid, name='a2', code='a'),
+                    RenamedItem(name='c', code='c'),
+                    RenamedItem(uuid=b.uuid, name='b2', code='b', score=2),
+                ],
+                model_dump=model_dump,
+            )
+            await repo.commit()
+        assert [(item.name, item.score) for item in upserted] == [('a2', 1), ('c', None), ('b2', 2)]
+
+        async with repo:
+            assert [(item.name, item.score) for item in await repo.list(LimitOffset())] == [
+                ('a2', 1),
+                ('b2', 2),
+                ('c', None),
+            ]
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('repo_cls', [SQLRenamedItemRepo, SQLRenamedItemNoUpsertRepo])
+def test_upsert_many_raises_already_exists_on_another_unique_constraint(repo_cls: Type[SQLRenamedItemRepo]) -> None:
+    async def main() -> None:
+        repo = await make_renamed_repo(repo_cls)
+        async with repo:
+            await repo.add(RenamedItem(name='a', code='a'))
+            await repo.commit()
+
+        async with repo:
+            with pytest.raises(ItemAlreadyExists):
+                await repo.upsert_many([RenamedItem(name='b', code='a')])
+
+    asyncio.run(main())
+
+
+def test_reads_go_to_the_primary_after_a_write() -> None:
+    async def main() -> None:
+        primary, replica = await make_repo('sql'), await make_repo('sql')
+        # the replica lags behind the primary
+        await add_items(primary, Item(name='a'), Item(name='b'))
+        await add_items(replica, Item(name='a'))
+        repo = SQLItemRepo(primary._make_session, make_read_session=replica._make_session)
+
+        async with repo:
+            assert await repo.count() == 1
+            assert len(await repo.list(LimitOffset())) == 1
+            await repo.update_by_filter(ItemFilter(name='a'), {'score': 1})
+            assert await repo.count() == 2
+            assert [item.score for item in await repo.list(LimitOffset(), ItemFilter(name='a'))] == [1]
+            await repo.commit()
+
+        # a new session reads from the replica again
+        async with repo:
+            assert await repo.count() == 1
+
+    asyncio.run(main())